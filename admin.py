@@ -9,17 +9,22 @@ from models import (
     HistoryType, 
     History
 )
-from core.db import engine
+from core.db import async_engine, engine
 from fastapi import FastAPI, Depends, Request, HTTPException
-from core.security import get_password_hash
+from core.security import get_password_hash_async
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from wtforms import Form, StringField, BooleanField, PasswordField
 from starlette.responses import RedirectResponse
 from sqladmin.authentication import AuthenticationBackend
-from crud import authenticate
+from crud import authenticate_async
 import jwt
+from anyio import to_thread
 from core.security import ALGORITHM
 from core.config import settings
+from core.counts import read_count
+from core.user_cache import user_cache
+import time
 
 # Function to get a database session
 def get_session():
@@ -33,9 +38,10 @@ class AdminAuth(AuthenticationBackend):
         email = form.get("username")
         password = form.get("password")
         
-        # Validate credentials using existing authentication method
-        with Session(engine) as session:
-            user = authenticate(session=session, email=email, password=password)
+        # Validate credentials using existing authentication method, bcrypt
+        # runs on the password hashing workers instead of the event loop
+        async with AsyncSession(async_engine) as session:
+            user = await authenticate_async(session=session, email=email, password=password)
             
             if not user:
                 return False
@@ -46,6 +52,7 @@ class AdminAuth(AuthenticationBackend):
             
             # Set the user ID in the session
             request.session["user_id"] = str(user.id)
+            request.session["validated_at"] = time.time()
             return True
     
     async def logout(self, request: Request) -> bool:
@@ -59,14 +66,40 @@ class AdminAuth(AuthenticationBackend):
         if not user_id:
             return False
         
+        # The session cookie is signed, trust its user until the revalidation
+        # interval is over or the user was changed (e.g. deactivated)
+        validated_at = request.session.get("validated_at", 0.0)
+        now = time.time()
+        changed_at = user_cache.changed_at(user_id)
+        if now - validated_at < settings.ADMIN_SESSION_REVALIDATE_SECONDS and (
+            changed_at is None or changed_at < validated_at
+        ):
+            return True
+        
         # Validate that the user still exists in the database
-        with Session(engine) as session:
-            user = session.get(User, user_id)
+        async with AsyncSession(async_engine) as session:
+            user = await session.get(User, user_id)
             if not user or not user.is_active or not user.is_superuser:
+                request.session.clear()
                 return False
-            
+        
+        request.session["validated_at"] = now
         return True
 
+class CachedCountMixin:
+    """
+    Use the cached row count for unfiltered list pages, searches still
+    count the matching rows
+    """
+    async def count(self, request: Request, stmt=None) -> int:
+        if stmt is not None:
+            return await super().count(request, stmt)
+        return await to_thread.run_sync(self._cached_count)
+
+    def _cached_count(self) -> int:
+        with Session(engine) as session:
+            return read_count(session, self.model)[0]
+
 def setup_admin(app: FastAPI) -> None:
     """
     Configure and setup SQLAdmin dashboard
@@ -82,7 +115,7 @@ def setup_admin(app: FastAPI) -> None:
         title="QR System Admin"
     )
 
-    class UserAdmin(ModelView, model=User):
+    class UserAdmin(CachedCountMixin, ModelView, model=User):
         column_list = ["id", "email", "is_active", "is_superuser", "full_name"]
         column_searchable_list = ["email", "full_name"]
         column_sortable_list = ["email", "is_active", "is_superuser"]
@@ -115,12 +148,12 @@ def setup_admin(app: FastAPI) -> None:
                 password = data.pop(password_field)
                 if password:
                     # Hash the password and store it in the hashed_password field
-                    model.hashed_password = get_password_hash(password)
+                    model.hashed_password = await get_password_hash_async(password)
             # New users must have a password
             elif is_created and not getattr(model, "hashed_password", None):
                 raise ValueError("Password is required for new users")
 
-    class ItemAdmin(ModelView, model=Item):
+    class ItemAdmin(CachedCountMixin, ModelView, model=Item):
         column_list = ["id", "title", "description", "owner_id"]
         column_searchable_list = ["title", "description"]
         column_sortable_list = ["title"]
@@ -134,11 +167,12 @@ def setup_admin(app: FastAPI) -> None:
         name_plural = "Items"
         
     # New admin views for our models
-    class ApartmentInfoAdmin(ModelView, model=ApartmentInfo):
+    class ApartmentInfoAdmin(CachedCountMixin, ModelView, model=ApartmentInfo):
         column_list = ["id", "building", "floor", "apt_no", "user_id", "area", "meter_price", "full_price"]
         column_searchable_list = ["building", "floor", "apt_no"]
         column_sortable_list = ["building", "floor", "apt_no", "area", "full_price"]
         column_default_sort = [("building", True), ("floor", True), ("apt_no", True)]
+        form_excluded_columns = ["version", "updated_at"]
         can_create = True
         can_edit = True
         can_delete = True
@@ -147,11 +181,12 @@ def setup_admin(app: FastAPI) -> None:
         name = "Apartment"
         name_plural = "Apartments"
         
-    class ClientInfoAdmin(ModelView, model=ClientInfo):
+    class ClientInfoAdmin(CachedCountMixin, ModelView, model=ClientInfo):
         column_list = ["id", "name", "id_no", "phone_number", "job_title", "apt_id"]
         column_searchable_list = ["name", "id_no", "phone_number"]
         column_sortable_list = ["name", "id_no"]
         column_default_sort = [("name", False)]
+        form_excluded_columns = ["version", "updated_at"]
         can_create = True
         can_edit = True
         can_delete = True
@@ -160,7 +195,7 @@ def setup_admin(app: FastAPI) -> None:
         name = "Client"
         name_plural = "Clients"
         
-    class PaymentTypeAdmin(ModelView, model=PaymentType):
+    class PaymentTypeAdmin(CachedCountMixin, ModelView, model=PaymentType):
         column_list = ["id", "name"]
         column_searchable_list = ["name"]
         column_sortable_list = ["name"]
@@ -173,7 +208,7 @@ def setup_admin(app: FastAPI) -> None:
         name = "Payment Type"
         name_plural = "Payment Types"
         
-    class PaymentAdmin(ModelView, model=Payment):
+    class PaymentAdmin(CachedCountMixin, ModelView, model=Payment):
         column_list = ["id", "date_of_payment", "payment_type_id", "amount", "client_id"]
         column_searchable_list = ["client_id", "payment_type_id"]
         column_sortable_list = ["date_of_payment", "amount"]
@@ -186,7 +221,7 @@ def setup_admin(app: FastAPI) -> None:
         name = "Payment"
         name_plural = "Payments"
         
-    class HistoryTypeAdmin(ModelView, model=HistoryType):
+    class HistoryTypeAdmin(CachedCountMixin, ModelView, model=HistoryType):
         column_list = ["id", "name"]
         column_searchable_list = ["name"]
         column_sortable_list = ["name"]
@@ -199,7 +234,7 @@ def setup_admin(app: FastAPI) -> None:
         name = "History Type"
         name_plural = "History Types"
         
-    class HistoryAdmin(ModelView, model=History):
+    class HistoryAdmin(CachedCountMixin, ModelView, model=History):
         column_list = ["id", "type_id", "datetime"]
         column_searchable_list = ["type_id"]
         column_sortable_list = ["datetime"]
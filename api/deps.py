@@ -1,16 +1,19 @@
-from collections.abc import Generator
-from typing import Annotated
+from collections.abc import AsyncGenerator, Generator
+from typing import Annotated, Any
 
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Body, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
+from sqlalchemy.orm import make_transient_to_detached
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from core import security
 from core.config import settings
-from core.db import engine
+from core.db import async_engine, engine
+from core.user_cache import user_cache
 from models import TokenPayload, User
 
 reusable_oauth2 = OAuth2PasswordBearer(
@@ -23,22 +26,32 @@ def get_db() -> Generator[Session, None, None]:
         yield session
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSession(async_engine) as session:
+        yield session
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
+# Body of the bulk create/update endpoints, larger batches get 422
+BulkRows = Annotated[list[dict[str, Any]], Body(max_length=settings.BULK_MAX_ROWS)]
 
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+def decode_token(token: str) -> TokenPayload:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
-        token_data = TokenPayload(**payload)
+        return TokenPayload(**payload)
     except (InvalidTokenError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = session.get(User, token_data.sub)
+
+
+def check_user(user: User | None) -> User:
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
@@ -46,7 +59,45 @@ def get_current_user(session: SessionDep, token: TokenDep) -> User:
     return user
 
 
+def cached_user(user_id: str | None) -> User | None:
+    """
+    The user from the user cache as a detached instance, which is added to
+    the request's session so routes can still change or delete it.
+    """
+    values = user_cache.get(user_id)
+    if values is None:
+        return None
+    user = User(**values)
+    make_transient_to_detached(user)
+    return user
+
+
+def get_current_user(session: SessionDep, token: TokenDep) -> User:
+    token_data = decode_token(token)
+    user = cached_user(token_data.sub)
+    if user is not None:
+        session.add(user)
+        return user
+    generation = user_cache.generation
+    user = check_user(session.get(User, token_data.sub))
+    user_cache.store(user, generation)
+    return user
+
+
+async def get_current_user_async(session: AsyncSessionDep, token: TokenDep) -> User:
+    token_data = decode_token(token)
+    user = cached_user(token_data.sub)
+    if user is not None:
+        session.add(user)
+        return user
+    generation = user_cache.generation
+    user = check_user(await session.get(User, token_data.sub))
+    user_cache.store(user, generation)
+    return user
+
+
 CurrentUser = Annotated[User, Depends(get_current_user)]
+AsyncCurrentUser = Annotated[User, Depends(get_current_user_async)]
 
 
 def get_current_active_superuser(current_user: CurrentUser) -> User:
@@ -12,7 +12,12 @@ from api.routes import (
     payments, 
     history,
     combined_operations,
-    pages
+    pages,
+    reports,
+    imports,
+    exports,
+    sync,
+    events
 )
 from core.config import settings
 
@@ -28,6 +33,11 @@ api_router.include_router(payments.router)
 api_router.include_router(history.router)
 api_router.include_router(combined_operations.router)
 api_router.include_router(pages.router)
+api_router.include_router(reports.router)
+api_router.include_router(imports.router)
+api_router.include_router(exports.router)
+api_router.include_router(sync.router)
+api_router.include_router(events.router)
 
 if settings.ENVIRONMENT == "local":
     api_router.include_router(private.router)
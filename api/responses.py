@@ -0,0 +1,179 @@
+import hashlib
+from collections.abc import Iterable
+from typing import Any, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import Column
+from sqlmodel import SQLModel, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.cache import CachedResponse
+
+# Largest id list accepted by batch reads, one IN query each
+MAX_BATCH_IDS = 500
+
+
+def public_columns(model: type[SQLModel], public_model: type[SQLModel]) -> list[Column]:
+    """
+    Table columns of model for the fields of public_model, in field order.
+    Selecting them returns rows already typed by the column types, so they
+    can be serialized without building and validating model instances.
+    """
+    columns = model.__table__.columns
+    return [columns[name] for name in public_model.model_fields]
+
+
+def select_fields(
+    model: type[SQLModel], public_model: type[SQLModel], fields: Optional[str]
+) -> list[Column]:
+    """
+    Columns for a fields= query parameter, a comma separated list of
+    public_model fields. All public columns when fields is not given.
+    """
+    columns = public_columns(model, public_model)
+    if not fields:
+        return columns
+    by_name = {column.name: column for column in columns}
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in by_name]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields: {', '.join(unknown) or fields}"
+        )
+    return [by_name[name] for name in names]
+
+
+def parse_expand(expand: Optional[str], allowed: Iterable[str]) -> set[str]:
+    """
+    Related resources requested with an expand= query parameter, a comma
+    separated list of names from allowed.
+    """
+    if not expand:
+        return set()
+    names = {name.strip() for name in expand.split(",") if name.strip()}
+    unknown = names - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot expand: {', '.join(sorted(unknown))}, "
+            f"allowed: {', '.join(allowed)}",
+        )
+    return names
+
+
+def object_dict(obj: Any, columns: list[Column]) -> Optional[dict[str, Any]]:
+    """
+    The given columns of a loaded ORM object, for objects serialized
+    together with their expanded relations.
+    """
+    if obj is None:
+        return None
+    return {column.name: getattr(obj, column.name) for column in columns}
+
+
+def parse_ids(ids: str) -> list[int]:
+    """
+    Ids of a comma separated ids= query parameter, without duplicates and
+    in request order.
+    """
+    try:
+        values = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma separated integers")
+    values = list(dict.fromkeys(values))
+    if not values:
+        raise HTTPException(status_code=400, detail="No ids given")
+    if len(values) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_BATCH_IDS} ids can be read at once"
+        )
+    return values
+
+
+async def batch_response(
+    session: AsyncSession, columns: list[Column], ids: list[int]
+) -> ORJSONResponse:
+    """
+    Rows with the given ids, read with one IN query and returned in the
+    order of ids, with the ids that do not exist.
+    """
+    names = [column.name for column in columns]
+    id_column = columns[0].table.c.id
+    result = await session.exec(select(*columns).where(id_column.in_(ids)))
+    rows = {row["id"]: row for row in (dict(zip(names, row)) for row in result)}
+    return ORJSONResponse(
+        {
+            "data": [rows[id] for id in ids if id in rows],
+            "missing": [id for id in ids if id not in rows],
+        }
+    )
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Strong ETag for a response determined by parts, e.g. a row's id,
+    version and updated_at.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Whether the If-None-Match header of request lists etag.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip() for tag in header.split(",")}
+    # If-None-Match uses the weak comparison
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+async def page_etag(request: Request, session: AsyncSession, statement: Any) -> str:
+    """
+    ETag of a list page, from the query parameters and one aggregate row over
+    the page. statement selects id, version and updated_at with the page's
+    filters, ordering and offset/limit.
+    """
+    page = statement.subquery()
+    # Versions count per row, so max(version) alone misses an update of any
+    # other row: sum(version) changes with every update, count and sum(id)
+    # with rows entering or leaving the page
+    aggregate = select(
+        func.count(),
+        func.max(page.c.version),
+        func.sum(page.c.version),
+        func.sum(page.c.id),
+        func.max(page.c.updated_at),
+    )
+    row = (await session.exec(aggregate)).one()
+    return make_etag(str(request.query_params), tuple(row))
+
+
+def cached_response(request: Request, cached: CachedResponse) -> Response:
+    """
+    Response for a cache hit, 304 Not Modified when If-None-Match holds the
+    cached ETag.
+    """
+    if cached.etag is not None and etag_matches(request, cached.etag):
+        return not_modified(cached.etag)
+    headers = {"ETag": cached.etag} if cached.etag else None
+    return Response(cached.body, media_type="application/json", headers=headers)
+
+
+def rows_response(rows: Iterable[Any], columns: list[Column]) -> ORJSONResponse:
+    """
+    JSON list response built straight from the SQL result rows of a select
+    of columns, encoded with orjson.
+    """
+    names = [column.name for column in columns]
+    if len(names) == 1:
+        # sqlmodel returns plain values for single column selects
+        return ORJSONResponse([{names[0]: value} for value in rows])
+    return ORJSONResponse([dict(zip(names, row)) for row in rows])
@@ -1,40 +1,140 @@
 from typing import Any
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
 from sqlmodel import func, select
 
-from api.deps import CurrentUser, SessionDep
+import crud
+from api.deps import AsyncCurrentUser, AsyncSessionDep, BulkRows, CurrentUser, SessionDep
+from api.responses import (
+    batch_response,
+    cached_response,
+    etag_matches,
+    make_etag,
+    not_modified,
+    page_etag,
+    parse_ids,
+    public_columns,
+    rows_response,
+)
+from core.cache import response_cache
 from models import (
     ApartmentInfo,
     ApartmentInfoCreate,
     ApartmentInfoPublic,
     ApartmentInfoUpdate,
+    BulkWriteResult,
     Message,
+    ApartmentsBatchPublic,
 )
 
 router = APIRouter(prefix="/apartments", tags=["apartments"])
 
 
-@router.get("/", response_model=list[ApartmentInfoPublic])
-def read_apartments(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+@router.get("/", response_model=list[ApartmentInfoPublic], response_class=ORJSONResponse)
+async def read_apartments(
+    request: Request,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    skip: int = 0,
+    limit: int = 100,
+) -> Any:
+    """
+    Retrieve apartments, served from the response cache until an apartment
+    changes. Answers 304 Not Modified when If-None-Match holds the ETag of
+    the unchanged page.
+    """
+    key = await response_cache.key(request, current_user, ApartmentInfo)
+    cached = await response_cache.get(key)
+    if cached is not None:
+        return cached_response(request, cached)
+    # The ETag is read before the rows, a write in between only makes the
+    # next conditional request miss
+    versions = select(ApartmentInfo.id, ApartmentInfo.version, ApartmentInfo.updated_at)
+    etag = await page_etag(
+        request, session, versions.order_by(ApartmentInfo.id).offset(skip).limit(limit)
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    columns = public_columns(ApartmentInfo, ApartmentInfoPublic)
+    statement = select(*columns).order_by(ApartmentInfo.id).offset(skip).limit(limit)
+    response = rows_response(await session.exec(statement), columns)
+    response.headers["ETag"] = etag
+    await response_cache.store(key, response)
+    return response
+
+
+@router.post("/bulk", response_model=BulkWriteResult)
+def create_apartments_bulk(
+    *,
+    session: SessionDep,
+    current_user: CurrentUser,
+    rows_in: BulkRows,
+    atomic: bool = False,
 ) -> Any:
     """
-    Retrieve apartments.
+    Create many apartments in one transaction. Invalid rows are reported by
+    index and skipped, or reject the whole batch when atomic is set.
     """
-    statement = select(ApartmentInfo).offset(skip).limit(limit)
-    apartments = session.exec(statement).all()
-    return apartments
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    return crud.bulk_create(
+        session=session, model=ApartmentInfo, create_model=ApartmentInfoCreate, rows=rows_in, atomic=atomic
+    )
+
+
+@router.put("/bulk", response_model=BulkWriteResult)
+def update_apartments_bulk(
+    *,
+    session: SessionDep,
+    current_user: CurrentUser,
+    rows_in: BulkRows,
+    atomic: bool = False,
+) -> Any:
+    """
+    Update many apartments in one transaction. Each row holds the apartment "id"
+    and the fields to change.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    return crud.bulk_update(
+        session=session, model=ApartmentInfo, update_model=ApartmentInfoUpdate, rows=rows_in, atomic=atomic
+    )
+
+
+@router.get("/batch", response_model=ApartmentsBatchPublic, response_class=ORJSONResponse)
+async def read_apartments_batch(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, ids: str
+) -> Any:
+    """
+    Get apartments by a comma separated list of ids, in that order. Ids that
+    do not exist are listed in missing.
+    """
+    columns = public_columns(ApartmentInfo, ApartmentInfoPublic)
+    return await batch_response(session, columns, parse_ids(ids))
 
 
 @router.get("/{id}", response_model=ApartmentInfoPublic)
-def read_apartment(session: SessionDep, current_user: CurrentUser, id: int) -> Any:
+async def read_apartment(
+    request: Request,
+    response: Response,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    id: int,
+) -> Any:
     """
-    Get apartment by ID.
+    Get apartment by ID. Answers 304 Not Modified when If-None-Match holds
+    the ETag of the unchanged apartment.
     """
-    apartment = session.get(ApartmentInfo, id)
+    apartment = await session.get(ApartmentInfo, id)
     if not apartment:
         raise HTTPException(status_code=404, detail="Apartment not found")
+    etag = make_etag(apartment.id, apartment.version, apartment.updated_at)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return apartment
 
 
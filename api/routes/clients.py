@@ -1,37 +1,119 @@
 from typing import Any, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import selectinload
 from sqlmodel import func, select, or_, and_
 
-from api.deps import CurrentUser, SessionDep
+import crud
+from api.deps import AsyncCurrentUser, AsyncSessionDep, BulkRows, CurrentUser, SessionDep
+from api.responses import (
+    batch_response,
+    etag_matches,
+    make_etag,
+    not_modified,
+    object_dict,
+    page_etag,
+    parse_ids,
+    parse_expand,
+    public_columns,
+    rows_response,
+    select_fields,
+)
 from models import (
     ClientInfo,
     ClientInfoCreate,
     ClientInfoPublic,
     ClientInfoUpdate,
+    BulkWriteResult,
     Message,
+    ClientsBatchPublic,
     ApartmentInfo,
+    ApartmentInfoPublic,
+    Payment,
+    PaymentPublic,
 )
 
 router = APIRouter(prefix="/clients", tags=["clients"])
 
+CLIENT_EXPANSIONS = ("apartment", "payments")
+APARTMENT_COLUMNS = public_columns(ApartmentInfo, ApartmentInfoPublic)
+PAYMENT_COLUMNS = public_columns(Payment, PaymentPublic)
+
+
+def client_select(columns: list[Any], expand: set[str]) -> Any:
+    """
+    Select of the requested columns, or of clients with their expanded
+    relations, each loaded with one additional query.
+    """
+    if not expand:
+        return select(*columns)
+    options = []
+    if "apartment" in expand:
+        options.append(selectinload(ClientInfo.apartment))
+    if "payments" in expand:
+        options.append(selectinload(ClientInfo.payments))
+    return select(ClientInfo).options(*options)
+
 
-@router.get("/", response_model=list[ClientInfoPublic])
-def read_clients(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+async def clients_response(
+    session: AsyncSessionDep, statement: Any, columns: list[Any], expand: set[str]
+) -> Any:
+    if not expand:
+        return rows_response(await session.exec(statement), columns)
+    rows = []
+    for client in (await session.exec(statement)).all():
+        row = object_dict(client, columns)
+        if "apartment" in expand:
+            row["apartment"] = object_dict(client.apartment, APARTMENT_COLUMNS)
+        if "payments" in expand:
+            row["payments"] = [
+                object_dict(payment, PAYMENT_COLUMNS) for payment in client.payments
+            ]
+        rows.append(row)
+    return ORJSONResponse(rows)
+
+
+@router.get("/", response_model=list[ClientInfoPublic], response_class=ORJSONResponse)
+async def read_clients(
+    request: Request,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
 ) -> Any:
     """
-    Retrieve clients.
+    Retrieve clients. fields (e.g. "id,name,phone_number") limits the
+    returned columns, expand (apartment, payments) nests the related rows.
+    Without expand, answers 304 Not Modified when If-None-Match holds the
+    ETag of the unchanged page.
     """
-    statement = select(ClientInfo).offset(skip).limit(limit)
-    clients = session.exec(statement).all()
-    return clients
+    columns = select_fields(ClientInfo, ClientInfoPublic, fields)
+    expansions = parse_expand(expand, CLIENT_EXPANSIONS)
+    statement = (
+        client_select(columns, expansions).order_by(ClientInfo.id).offset(skip).limit(limit)
+    )
+    if expansions:
+        # Expanded rows change with their relations, which are not versioned
+        return await clients_response(session, statement, columns, expansions)
 
+    versions = select(ClientInfo.id, ClientInfo.version, ClientInfo.updated_at)
+    etag = await page_etag(
+        request, session, versions.order_by(ClientInfo.id).offset(skip).limit(limit)
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response = await clients_response(session, statement, columns, expansions)
+    response.headers["ETag"] = etag
+    return response
 
-@router.get("/filter", response_model=list[ClientInfoPublic])
-def filter_clients(
-    session: SessionDep,
-    current_user: CurrentUser,
+
+@router.get("/filter", response_model=list[ClientInfoPublic], response_class=ORJSONResponse)
+async def filter_clients(
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
     name: Optional[str] = None,
     id_no: Optional[int] = None,
     phone_number: Optional[str] = None,
@@ -39,13 +121,18 @@ def filter_clients(
     floor: Optional[int] = None,
     apt_no: Optional[int] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
 ) -> Any:
     """
     Filter clients by name, ID number, phone number, and apartment information.
+    fields limits the returned columns, expand nests the related rows.
     """
     # Start with a base query joining ClientInfo with ApartmentInfo
-    query = select(ClientInfo).join(ApartmentInfo, ClientInfo.apt_id == ApartmentInfo.id)
+    columns = select_fields(ClientInfo, ClientInfoPublic, fields)
+    expansions = parse_expand(expand, CLIENT_EXPANSIONS)
+    query = client_select(columns, expansions).join(ApartmentInfo, ClientInfo.apt_id == ApartmentInfo.id)
     
     # Apply filters based on provided parameters
     filters = []
@@ -77,30 +164,102 @@ def filter_clients(
     query = query.offset(skip).limit(limit)
     
     # Execute query and return results
-    clients = session.exec(query).all()
-    return clients
+    return await clients_response(session, query, columns, expansions)
+
+
+@router.get(
+    "/by-apartment/{apt_id}",
+    response_model=list[ClientInfoPublic],
+    response_class=ORJSONResponse,
+)
+async def read_clients_by_apartment(
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    apt_id: int,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+) -> Any:
+    """
+    Get clients by apartment ID. fields limits the returned columns, expand
+    nests the related rows.
+    """
+    columns = select_fields(ClientInfo, ClientInfoPublic, fields)
+    expansions = parse_expand(expand, CLIENT_EXPANSIONS)
+    statement = client_select(columns, expansions).where(ClientInfo.apt_id == apt_id)
+    return await clients_response(session, statement, columns, expansions)
+
+
+@router.post("/bulk", response_model=BulkWriteResult)
+def create_clients_bulk(
+    *,
+    session: SessionDep,
+    current_user: CurrentUser,
+    rows_in: BulkRows,
+    atomic: bool = False,
+) -> Any:
+    """
+    Create many clients in one transaction. Invalid rows are reported by
+    index and skipped, or reject the whole batch when atomic is set.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    return crud.bulk_create(
+        session=session, model=ClientInfo, create_model=ClientInfoCreate, rows=rows_in, atomic=atomic
+    )
+
+
+@router.put("/bulk", response_model=BulkWriteResult)
+def update_clients_bulk(
+    *,
+    session: SessionDep,
+    current_user: CurrentUser,
+    rows_in: BulkRows,
+    atomic: bool = False,
+) -> Any:
+    """
+    Update many clients in one transaction. Each row holds the client "id"
+    and the fields to change.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    return crud.bulk_update(
+        session=session, model=ClientInfo, update_model=ClientInfoUpdate, rows=rows_in, atomic=atomic
+    )
 
 
-@router.get("/by-apartment/{apt_id}", response_model=list[ClientInfoPublic])
-def read_clients_by_apartment(
-    session: SessionDep, current_user: CurrentUser, apt_id: int
+@router.get("/batch", response_model=ClientsBatchPublic, response_class=ORJSONResponse)
+async def read_clients_batch(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, ids: str
 ) -> Any:
     """
-    Get clients by apartment ID.
+    Get clients by a comma separated list of ids, in that order. Ids that
+    do not exist are listed in missing.
     """
-    statement = select(ClientInfo).where(ClientInfo.apt_id == apt_id)
-    clients = session.exec(statement).all()
-    return clients
+    columns = public_columns(ClientInfo, ClientInfoPublic)
+    return await batch_response(session, columns, parse_ids(ids))
 
 
 @router.get("/{id}", response_model=ClientInfoPublic)
-def read_client(session: SessionDep, current_user: CurrentUser, id: int) -> Any:
+async def read_client(
+    request: Request,
+    response: Response,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    id: int,
+) -> Any:
     """
-    Get client by ID.
+    Get client by ID. Answers 304 Not Modified when If-None-Match holds the
+    ETag of the unchanged client.
     """
-    client = session.get(ClientInfo, id)
+    client = await session.get(ClientInfo, id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
+    etag = make_etag(client.id, client.version, client.updated_at)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return client
 
 
@@ -0,0 +1,73 @@
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any, Optional
+
+import orjson
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from api.deps import AsyncCurrentUser
+from core.config import settings
+from core.events import EVENT_TOPICS, OVERFLOW, event_bus
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+
+def parse_topics(topics: Optional[str]) -> set[str]:
+    if not topics:
+        return set(EVENT_TOPICS)
+    names = {name.strip() for name in topics.split(",") if name.strip()}
+    unknown = names - EVENT_TOPICS.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown topics: {', '.join(sorted(unknown))}, "
+            f"available: {', '.join(EVENT_TOPICS)}",
+        )
+    return names
+
+
+async def event_stream(request: Request, topics: set[str]) -> AsyncIterator[bytes]:
+    subscription = event_bus.subscribe(topics)
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(
+                    subscription.queue.get(), settings.EVENTS_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                # Comment line, keeps proxies from closing an idle stream
+                yield b": ping\n\n"
+                continue
+            if item is OVERFLOW:
+                yield b"event: overflow\ndata: {}\n\n"
+                return
+            yield (
+                f"id: {item['seq']}\nevent: {item['topic']}\ndata: ".encode()
+                + orjson.dumps(item)
+                + b"\n\n"
+            )
+    finally:
+        event_bus.unsubscribe(subscription)
+
+
+@router.get("/")
+async def stream_events(
+    request: Request, current_user: AsyncCurrentUser, topics: Optional[str] = None
+) -> Any:
+    """
+    Server-sent events for committed writes to payments, clients and
+    apartments, or the comma separated topics given. Events are not
+    replayed, reload the data after (re)connecting. A client that falls
+    behind gets an overflow event and is disconnected.
+    """
+    names = parse_topics(topics)
+    if event_bus.connections >= settings.EVENTS_MAX_CONNECTIONS:
+        raise HTTPException(status_code=503, detail="Too many event stream connections")
+    return StreamingResponse(
+        event_stream(request, names),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
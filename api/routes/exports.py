@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+import zlib
+from collections.abc import Iterator
+from datetime import date
+from typing import Any, Literal, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Column, select
+
+from api.deps import CurrentUser
+from core.db import engine
+from models import ApartmentInfo, ClientInfo, History, Payment
+
+router = APIRouter(prefix="/exports", tags=["exports"])
+
+EXPORT_TABLES = {
+    "apartments": ApartmentInfo,
+    "clients": ClientInfo,
+    "payments": Payment,
+    "history": History,
+}
+
+# Rows fetched from the server-side cursor and written per response chunk
+EXPORT_BATCH_SIZE = 1000
+
+ExportTable = Literal["apartments", "clients", "payments", "history"]
+ExportFormat = Literal["ndjson", "csv"]
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _export_columns(table: ExportTable, fields: Optional[str]) -> list[Column]:
+    columns = EXPORT_TABLES[table].__table__.columns
+    if not fields:
+        return list(columns)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return [columns[name] for name in names]
+
+
+def _iter_rows(columns: list[Column]) -> Iterator[list[tuple[Any, ...]]]:
+    """
+    Batches of rows read through a server-side cursor, so only one batch is
+    held in memory at a time.
+    """
+    primary_key = columns[0].table.primary_key.columns
+    statement = select(*columns).order_by(*primary_key)
+    with engine.connect() as connection:
+        result = connection.execution_options(
+            stream_results=True, yield_per=EXPORT_BATCH_SIZE
+        ).execute(statement)
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+
+
+def _ndjson_chunks(columns: list[Column]) -> Iterator[bytes]:
+    names = [column.name for column in columns]
+    for rows in _iter_rows(columns):
+        yield "".join(
+            json.dumps(dict(zip(names, row)), default=_json_default) + "\n" for row in rows
+        ).encode()
+
+
+def _csv_chunks(columns: list[Column]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in columns])
+    for rows in _iter_rows(columns):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@router.get("/{table}")
+def export_table(
+    current_user: CurrentUser,
+    table: ExportTable,
+    format: ExportFormat = "ndjson",
+    fields: Optional[str] = None,
+    gzip: bool = False,
+) -> Any:
+    """
+    Stream a whole table as NDJSON or CSV, ordered by id. fields is a comma
+    separated list of columns; gzip=true returns a gzipped file.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    columns = _export_columns(table, fields)
+    chunks = _ndjson_chunks(columns) if format == "ndjson" else _csv_chunks(columns)
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    filename = f"{table}.{format}"
+    if gzip:
+        chunks = _gzip_chunks(chunks)
+        media_type = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
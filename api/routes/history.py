@@ -1,14 +1,25 @@
-from typing import Any
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional
 
-from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+from sqlmodel import func, select, tuple_
+from sqlmodel.sql.expression import SelectOfScalar
 
-from api.deps import CurrentUser, SessionDep
+import crud
+from api.deps import AsyncCurrentUser, AsyncSessionDep, BulkRows, CurrentUser, SessionDep
+from api.responses import cached_response, public_columns, rows_response
+from core.cache import response_cache
+from history_archive import read_history_range
 from models import (
     History,
     HistoryCreate,
+    HistoriesPublic,
     HistoryPublic,
     HistoryUpdate,
+    BulkWriteResult,
     HistoryType,
     HistoryTypeCreate,
     HistoryTypePublic,
@@ -18,26 +29,79 @@ from models import (
 
 router = APIRouter(tags=["history"])
 
+HISTORY_COLUMNS = public_columns(History, HistoryPublic)
+
+
+def encode_cursor(history: History) -> str:
+    data = json.dumps([history.datetime.isoformat(), history.id])
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        value, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(value), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def search_statement(
+    *,
+    type_id: Optional[int] = None,
+    entity_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[tuple[datetime, int]] = None,
+) -> SelectOfScalar[History]:
+    """
+    History entries matching the filters, newest first. after is the
+    (datetime, id) of the last entry of the previous page. Filtering by
+    type_id or entity_id uses their (column, datetime) index.
+    """
+    statement = select(History).order_by(History.datetime.desc(), History.id.desc())
+    if type_id is not None:
+        statement = statement.where(History.type_id == type_id)
+    if entity_id is not None:
+        statement = statement.where(History.entity_id == entity_id)
+    if start:
+        statement = statement.where(History.datetime >= start)
+    if end:
+        statement = statement.where(History.datetime < end)
+    if after:
+        statement = statement.where(tuple_(History.datetime, History.id) < tuple_(*after))
+    return statement
+
 
 # History Types Routes
-@router.get("/history-types", response_model=list[HistoryTypePublic], tags=["history-types"])
-def read_history_types(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+@router.get("/history-types", response_model=list[HistoryTypePublic], response_class=ORJSONResponse, tags=["history-types"])
+async def read_history_types(
+    request: Request,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    skip: int = 0,
+    limit: int = 100,
 ) -> Any:
     """
-    Retrieve history types.
+    Retrieve history types. Served from the response cache until a history
+    type changes.
     """
-    statement = select(HistoryType).offset(skip).limit(limit)
-    history_types = session.exec(statement).all()
-    return history_types
+    key = await response_cache.key(request, current_user, HistoryType)
+    cached = await response_cache.get(key)
+    if cached is not None:
+        return cached_response(request, cached)
+    columns = public_columns(HistoryType, HistoryTypePublic)
+    statement = select(*columns).order_by(HistoryType.id).offset(skip).limit(limit)
+    response = rows_response(await session.exec(statement), columns)
+    await response_cache.store(key, response)
+    return response
 
 
 @router.get("/history-types/{id}", response_model=HistoryTypePublic, tags=["history-types"])
-def read_history_type(session: SessionDep, current_user: CurrentUser, id: int) -> Any:
+async def read_history_type(session: AsyncSessionDep, current_user: AsyncCurrentUser, id: int) -> Any:
     """
     Get history type by ID.
     """
-    history_type = session.get(HistoryType, id)
+    history_type = await session.get(HistoryType, id)
     if not history_type:
         raise HTTPException(status_code=404, detail="History type not found")
     return history_type
@@ -104,36 +168,86 @@ def delete_history_type(session: SessionDep, current_user: CurrentUser, id: int)
 
 
 # History Entries Routes
-@router.get("/history", response_model=list[HistoryPublic], tags=["history-entries"])
-def read_histories(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+@router.get("/history", response_model=list[HistoryPublic], response_class=ORJSONResponse, tags=["history-entries"])
+async def read_histories(
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> Any:
+    """
+    Retrieve history entries. With start and/or end, entries in that time
+    range are returned in datetime order, including archived months.
+    """
+    if start or end:
+        return await read_history_range(
+            session, start=start, end=end, skip=skip, limit=limit
+        )
+    statement = select(*HISTORY_COLUMNS).offset(skip).limit(limit)
+    return rows_response(await session.exec(statement), HISTORY_COLUMNS)
+
+
+@router.get("/history/by-type/{type_id}", response_model=list[HistoryPublic], response_class=ORJSONResponse, tags=["history-entries"])
+async def read_histories_by_type(
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    type_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
 ) -> Any:
     """
-    Retrieve history entries.
+    Get history entries by type ID. With start and/or end, entries in that
+    time range are returned in datetime order, including archived months.
     """
-    statement = select(History).offset(skip).limit(limit)
-    histories = session.exec(statement).all()
-    return histories
+    if start or end:
+        return await read_history_range(
+            session, start=start, end=end, type_id=type_id, skip=skip, limit=limit
+        )
+    statement = (
+        select(*HISTORY_COLUMNS).where(History.type_id == type_id).offset(skip).limit(limit)
+    )
+    return rows_response(await session.exec(statement), HISTORY_COLUMNS)
 
 
-@router.get("/history/by-type/{type_id}", response_model=list[HistoryPublic], tags=["history-entries"])
-def read_histories_by_type(
-    session: SessionDep, current_user: CurrentUser, type_id: int
+@router.get("/history/search", response_model=HistoriesPublic, tags=["history-entries"])
+async def search_histories(
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    type_id: Optional[int] = None,
+    entity_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
 ) -> Any:
     """
-    Get history entries by type ID.
+    Search history entries still in the history table, newest first.
+    Archived months are not searched, read them with start and end on
+    /history. Pass next_cursor from a response as cursor to get the
+    following page.
     """
-    statement = select(History).where(History.type_id == type_id)
-    histories = session.exec(statement).all()
-    return histories
+    statement = search_statement(
+        type_id=type_id,
+        entity_id=entity_id,
+        start=start,
+        end=end,
+        after=decode_cursor(cursor) if cursor else None,
+    )
+    histories = (await session.exec(statement.limit(limit + 1))).all()
+    next_cursor = encode_cursor(histories[limit - 1]) if len(histories) > limit else None
+    return HistoriesPublic(data=histories[:limit], next_cursor=next_cursor)
 
 
 @router.get("/history/{id}", response_model=HistoryPublic, tags=["history-entries"])
-def read_history(session: SessionDep, current_user: CurrentUser, id: int) -> Any:
+async def read_history(session: AsyncSessionDep, current_user: AsyncCurrentUser, id: int) -> Any:
     """
     Get history entry by ID.
     """
-    history = session.get(History, id)
+    history = await session.get(History, id)
     if not history:
         raise HTTPException(status_code=404, detail="History entry not found")
     return history
@@ -156,6 +270,27 @@ def create_history(
     return history
 
 
+@router.post("/history/bulk", response_model=BulkWriteResult, tags=["history-entries"])
+def create_histories_bulk(
+    *,
+    session: SessionDep,
+    current_user: CurrentUser,
+    rows_in: BulkRows,
+    atomic: bool = False,
+) -> Any:
+    """
+    Create many history entries in one transaction. Invalid rows are
+    reported by index and skipped, or reject the whole batch when atomic
+    is set.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    return crud.bulk_create(
+        session=session, model=History, create_model=HistoryCreate, rows=rows_in, atomic=atomic
+    )
+
+
 @router.put("/history/{id}", response_model=HistoryPublic, tags=["history-entries"])
 def update_history(
     *,
@@ -0,0 +1,69 @@
+import shutil
+from typing import Any
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, UploadFile
+from fastapi.responses import FileResponse
+
+import importer
+from api.deps import CurrentUser
+from core.config import settings
+from models import ImportJobPublic
+
+router = APIRouter(prefix="/imports", tags=["imports"])
+
+
+@router.post("/{kind}", response_model=ImportJobPublic, status_code=202)
+def create_import(
+    *,
+    current_user: CurrentUser,
+    background_tasks: BackgroundTasks,
+    kind: importer.ImportKind,
+    file: UploadFile,
+    chunk_size: int = settings.IMPORT_CHUNK_SIZE,
+) -> Any:
+    """
+    Upload a CSV file of apartments, clients or payments. The file is
+    imported in the background, poll the returned job for progress.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be positive")
+
+    job = importer.new_job(kind)
+    path = importer.upload_path(job)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(file.file, f)
+    background_tasks.add_task(importer.run_import_file, job, path, chunk_size)
+    return job
+
+
+@router.get("/{job_id}", response_model=ImportJobPublic)
+def read_import(current_user: CurrentUser, job_id: str) -> Any:
+    """
+    Get the progress of an import.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    job = importer.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return job
+
+
+@router.get("/{job_id}/errors")
+def read_import_errors(current_user: CurrentUser, job_id: str) -> Any:
+    """
+    Download the rejected rows of an import as CSV.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    job = importer.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    if not job.error_file:
+        raise HTTPException(status_code=404, detail="Import has no rejected rows")
+    return FileResponse(
+        job.error_file, media_type="text/csv", filename=f"import-{job.id}-errors.csv"
+    )
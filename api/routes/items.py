@@ -1,10 +1,11 @@
 import uuid
-from typing import Any
+from typing import Any, Literal
 
 from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from sqlmodel import select
 
 from api.deps import CurrentUser, SessionDep
+from core.counts import read_count
 from models import Item, ItemCreate, ItemPublic, ItemsPublic, ItemUpdate, Message
 
 router = APIRouter(prefix="/items", tags=["items"])
@@ -12,24 +13,26 @@ router = APIRouter(prefix="/items", tags=["items"])
 
 @router.get("/", response_model=ItemsPublic)
 def read_items(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+    session: SessionDep,
+    current_user: CurrentUser,
+    skip: int = 0,
+    limit: int = 100,
+    count: Literal["exact", "cached"] = "cached",
 ) -> Any:
     """
-    Retrieve items.
+    Retrieve items. count=cached (default) returns the cached total, which
+    count_exact flags; count=exact counts the table.
     """
 
+    exact = count == "exact"
     if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Item)
-        count = session.exec(count_statement).one()
+        total, count_exact = read_count(session, Item, exact=exact)
         statement = select(Item).offset(skip).limit(limit)
         items = session.exec(statement).all()
     else:
-        count_statement = (
-            select(func.count())
-            .select_from(Item)
-            .where(Item.owner_id == current_user.id)
+        total, count_exact = read_count(
+            session, Item, exact=exact, owner_id=current_user.id
         )
-        count = session.exec(count_statement).one()
         statement = (
             select(Item)
             .where(Item.owner_id == current_user.id)
@@ -38,7 +41,7 @@ def read_items(
         )
         items = session.exec(statement).all()
 
-    return ItemsPublic(data=items, count=count)
+    return ItemsPublic(data=items, count=total, count_exact=count_exact)
 
 
 @router.get("/{id}", response_model=ItemPublic)
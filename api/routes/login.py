@@ -6,7 +6,7 @@ from fastapi.responses import HTMLResponse
 from fastapi.security import OAuth2PasswordRequestForm
 
 import crud
-from api.deps import CurrentUser, SessionDep, get_current_active_superuser
+from api.deps import AsyncSessionDep, CurrentUser, SessionDep, get_current_active_superuser
 from core import security
 from core.config import settings
 from core.security import get_password_hash
@@ -22,13 +22,14 @@ router = APIRouter(tags=["login"])
 
 
 @router.post("/login/access-token")
-def login_access_token(
-    session: SessionDep, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+async def login_access_token(
+    session: AsyncSessionDep, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
 ) -> Token:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = crud.authenticate(
+    # Async so waiting for a password hashing worker holds no request thread
+    user = await crud.authenticate_async(
         session=session, email=form_data.username, password=form_data.password
     )
     if not user:
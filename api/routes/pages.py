@@ -1,5 +1,5 @@
-from typing import Any, Dict
-from core import db
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
 from models import ApartmentInfo, ClientInfo
 from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.templating import Jinja2Templates
@@ -10,119 +10,181 @@ import tempfile
 import os
 import asyncio
 from playwright.async_api import async_playwright
-from api.deps import CurrentUser
-from sqlmodel import Session, select
+from api.deps import AsyncCurrentUser, AsyncSessionDep
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from utils import generate_qr_code_with_data
 
 router = APIRouter(prefix="/pages", tags=["pages"])
 
 templates = Jinja2Templates(directory="templates")
 
-@router.get("/")
-def read_pages(request : Request, no : int, apt_id : int) -> Any:
-    with Session(db.engine) as session:
-        apt_info = session.exec(select(ApartmentInfo).where(ApartmentInfo.id == apt_id)).first()
-        if not apt_info:
-            raise HTTPException(status_code=404, detail="Apartment not found")
-        
-        # Get client information
-        client_info = session.exec(select(ClientInfo).where(ClientInfo.apt_id == apt_id)).first()
-        if not client_info:
+
+@dataclass
+class ContractData:
+    """Records needed to render the pages of one contract"""
+    apartment: ApartmentInfo
+    client: Optional[ClientInfo]
+
+
+async def load_contract(
+    session: AsyncSession,
+    *,
+    client_id: Optional[int] = None,
+    apt_id: Optional[int] = None,
+    require_client: bool = True,
+) -> ContractData:
+    """
+    Load the client and apartment of a contract with a single joined query.
+    Looking up by apt_id picks the first client of the apartment.
+    """
+    if client_id is not None:
+        statement = (
+            select(ClientInfo, ApartmentInfo)
+            .outerjoin(ApartmentInfo, ApartmentInfo.id == ClientInfo.apt_id)
+            .where(ClientInfo.id == client_id)
+        )
+        row = (await session.exec(statement)).first()
+        if not row:
             raise HTTPException(status_code=404, detail="Client not found")
-        
-        # Prepare data for QR code - Client data first in Arabic
-        client_data = {
-            "معرف": client_info.id,
-            "العدد": client_info.no,
-            "الاسم": client_info.name,
-            "رقم الهوية": client_info.id_no,
-            "رقم الهاتف": client_info.phone_number,
-            "المهنة": client_info.job_title,
-            "تاريخ الإصدار": str(client_info.issue_date),
-            "رقم السجل": client_info.registry_no,
-            "رقم الصحيفة": client_info.newspaper_no,
-            "المحلة": client_info.m,
-            "الزقاق": client_info.z,
-            "الدار": client_info.d,
-            "اسم البديل": client_info.alt_name,
-            "صلة القرابة": client_info.alt_kinship,
-            "هاتف البديل": client_info.alt_phone,
-            "تاريخ الإنشاء": str(client_info.created_at)
-        }
-        
-        # Apartment data in Arabic
-        apartment_data = {
-            "معرف": apt_info.id,
-            "العمارة": apt_info.building,
-            "الطابق": apt_info.floor,
-            "رقم الشقة": apt_info.apt_no,
-            "المساحة": apt_info.area,
-            "سعر المتر": apt_info.meter_price,
-            "السعر الكلي": apt_info.area * apt_info.meter_price
-        }
-        
-        # Generate QR code with client data first
-        qr_code_data_uri = generate_qr_code_with_data(client_data, apartment_data)
-        
-        data = {
-            "id": str(no).zfill(3)+ " : " + "العدد",
-            "buildng": str(apt_info.building)+ " | " + "العمارة",
-            "floor": str(apt_info.floor)+ " | " + "الطابق",
-            "apartment": str(apt_info.apt_no)+ " | " + "الشقة",
-            "qr_code": qr_code_data_uri
-        }
+    else:
+        statement = (
+            select(ClientInfo, ApartmentInfo)
+            .select_from(ApartmentInfo)
+            .outerjoin(ClientInfo, ClientInfo.apt_id == ApartmentInfo.id)
+            .where(ApartmentInfo.id == apt_id)
+            .order_by(ClientInfo.id)
+            .limit(1)
+        )
+        row = (await session.exec(statement)).first()
+    client_info, apt_info = row if row else (None, None)
+    if not apt_info:
+        raise HTTPException(status_code=404, detail="Apartment not found")
+    if require_client and not client_info:
+        raise HTTPException(status_code=404, detail="Client not found")
+    return ContractData(apartment=apt_info, client=client_info)
+
+
+def render_page1(request : Request, contract : ContractData, no : int) -> Any:
+    apt_info = contract.apartment
+    client_info = contract.client
+
+    # Prepare data for QR code - Client data first in Arabic
+    client_data = {
+        "معرف": client_info.id,
+        "العدد": client_info.no,
+        "الاسم": client_info.name,
+        "رقم الهوية": client_info.id_no,
+        "رقم الهاتف": client_info.phone_number,
+        "المهنة": client_info.job_title,
+        "تاريخ الإصدار": str(client_info.issue_date),
+        "رقم السجل": client_info.registry_no,
+        "رقم الصحيفة": client_info.newspaper_no,
+        "المحلة": client_info.m,
+        "الزقاق": client_info.z,
+        "الدار": client_info.d,
+        "اسم البديل": client_info.alt_name,
+        "صلة القرابة": client_info.alt_kinship,
+        "هاتف البديل": client_info.alt_phone,
+        "تاريخ الإنشاء": str(client_info.created_at)
+    }
+
+    # Apartment data in Arabic
+    apartment_data = {
+        "معرف": apt_info.id,
+        "العمارة": apt_info.building,
+        "الطابق": apt_info.floor,
+        "رقم الشقة": apt_info.apt_no,
+        "المساحة": apt_info.area,
+        "سعر المتر": apt_info.meter_price,
+        "السعر الكلي": apt_info.area * apt_info.meter_price
+    }
+
+    # Generate QR code with client data first
+    qr_code_data_uri = generate_qr_code_with_data(client_data, apartment_data)
+
+    data = {
+        "id": str(no).zfill(3)+ " : " + "العدد",
+        "buildng": str(apt_info.building)+ " | " + "العمارة",
+        "floor": str(apt_info.floor)+ " | " + "الطابق",
+        "apartment": str(apt_info.apt_no)+ " | " + "الشقة",
+        "qr_code": qr_code_data_uri
+    }
     return templates.TemplateResponse("page/page1.html", {"request": request, "data": data})
 
-@router.get("/page2")
-def read_page2(request : Request, client_id : int) -> Any:
-    with Session(db.engine) as session:
-        client_info = session.exec(select(ClientInfo).where(ClientInfo.id == client_id)).first()
-        if not client_info:
-            raise HTTPException(status_code=404, detail="Client not found")
-        
-        data = {
-            "date": client_info.created_at,
-            "id": str(client_info.no).zfill(3),
-            "customer_name": client_info.name,
-            "unified_card_number": client_info.id_no,
-            "id_number": client_info.id_no,
-            "registry_number": client_info.registry_no,
-            "newspaper_number": client_info.newspaper_no,
-            "issue_date": client_info.issue_date,
-            "district": client_info.m,
-            "street": client_info.z,
-            "house": client_info.d,
-            "alt_district": client_info.m,
-            "alt_street": client_info.z,
-            "alt_house": client_info.d,
-            "phone_number": client_info.phone_number,
-            "job_title": client_info.job_title,
-            "alt_person_name": client_info.alt_name,
-            "relationship": client_info.alt_kinship,
-            "alt_person_number": client_info.alt_phone
+def render_page2(request : Request, contract : ContractData) -> Any:
+    client_info = contract.client
+    data = {
+        "date": client_info.created_at,
+        "id": str(client_info.no).zfill(3),
+        "customer_name": client_info.name,
+        "unified_card_number": client_info.id_no,
+        "id_number": client_info.id_no,
+        "registry_number": client_info.registry_no,
+        "newspaper_number": client_info.newspaper_no,
+        "issue_date": client_info.issue_date,
+        "district": client_info.m,
+        "street": client_info.z,
+        "house": client_info.d,
+        "alt_district": client_info.m,
+        "alt_street": client_info.z,
+        "alt_house": client_info.d,
+        "phone_number": client_info.phone_number,
+        "job_title": client_info.job_title,
+        "alt_person_name": client_info.alt_name,
+        "relationship": client_info.alt_kinship,
+        "alt_person_number": client_info.alt_phone
     }
     return templates.TemplateResponse("page/page2.html", {"request": request, "data": data})
 
-@router.get("/page3")
-def read_page3(request : Request, apt_id : int) -> Any:
-    with Session(db.engine) as session:
-        apartment_info = session.exec(select(ApartmentInfo).where(ApartmentInfo.id == apt_id)).first()
-        if not apartment_info:
-            raise HTTPException(status_code=404, detail="Apartment not found")
-        client_info = session.exec(select(ClientInfo).where(ClientInfo.apt_id == apt_id)).first()
-        if not client_info:
-            raise HTTPException(status_code=404, detail="Client not found")
-        data = {
-            "id": str(client_info.no).zfill(3),
-            "date": client_info.created_at,
-            "apartment_number": apartment_info.apt_no,
-            "building": apartment_info.building,
-            "floor": apartment_info.floor,
-            "apartment": apartment_info.apt_type,
-            "area": apartment_info.area
-        }
+def render_page3(request : Request, contract : ContractData) -> Any:
+    apartment_info = contract.apartment
+    client_info = contract.client
+    data = {
+        "id": str(client_info.no).zfill(3),
+        "date": client_info.created_at,
+        "apartment_number": apartment_info.apt_no,
+        "building": apartment_info.building,
+        "floor": apartment_info.floor,
+        "apartment": apartment_info.apt_type,
+        "area": apartment_info.area
+    }
     return templates.TemplateResponse("page/page3.html", {"request": request, "data": data})
 
+def render_page8(request : Request, contract : ContractData) -> Any:
+    data = {
+        'aptType' : contract.apartment.apt_type
+    }
+    return templates.TemplateResponse("page/page8.html", {"request": request , 'data': data})
+
+def render_page9(request : Request, contract : ContractData) -> Any:
+    data = {
+        'aptType' : contract.apartment.apt_type
+    }
+    return templates.TemplateResponse("page/page9.html", {"request": request , 'data': data})
+
+def render_page10(request : Request, contract : ContractData) -> Any:
+    data = {
+        'price' : contract.apartment.meter_price,
+        'area' : contract.apartment.area
+    }
+    return templates.TemplateResponse("page/page10.html", {"request": request , 'data': data})
+
+@router.get("/")
+async def read_pages(request : Request, session : AsyncSessionDep, no : int, apt_id : int) -> Any:
+    contract = await load_contract(session, apt_id=apt_id)
+    return render_page1(request, contract, no)
+
+@router.get("/page2")
+async def read_page2(request : Request, session : AsyncSessionDep, client_id : int) -> Any:
+    contract = await load_contract(session, client_id=client_id)
+    return render_page2(request, contract)
+
+@router.get("/page3")
+async def read_page3(request : Request, session : AsyncSessionDep, apt_id : int) -> Any:
+    contract = await load_contract(session, apt_id=apt_id)
+    return render_page3(request, contract)
+
 @router.get("/page4")
 def read_page4(request : Request) -> Any:
     return templates.TemplateResponse("page/page4.html", {"request": request})
@@ -140,38 +202,19 @@ def read_page7(request : Request) -> Any:
     return templates.TemplateResponse("page/page7.html", {"request": request})
 
 @router.get("/page8")
-def read_page8(request : Request, apt_id : int) -> Any:
-    with Session(db.engine) as session:
-        apartment_info = session.exec(select(ApartmentInfo).where(ApartmentInfo.id == apt_id)).first()
-        if not apartment_info:
-            raise HTTPException(status_code=404, detail="Apartment not found")
-        data = {
-            'aptType' : apartment_info.apt_type
-        }
-    return templates.TemplateResponse("page/page8.html", {"request": request , 'data': data})
+async def read_page8(request : Request, session : AsyncSessionDep, apt_id : int) -> Any:
+    contract = await load_contract(session, apt_id=apt_id, require_client=False)
+    return render_page8(request, contract)
 
 @router.get("/page9")
-def read_page9(request : Request, apt_id : int) -> Any:
-    with Session(db.engine) as session:
-        apartment_info = session.exec(select(ApartmentInfo).where(ApartmentInfo.id == apt_id)).first()
-        if not apartment_info:
-            raise HTTPException(status_code=404, detail="Apartment not found")
-        data = {
-            'aptType' : apartment_info.apt_type
-        }
-    return templates.TemplateResponse("page/page9.html", {"request": request , 'data': data})
+async def read_page9(request : Request, session : AsyncSessionDep, apt_id : int) -> Any:
+    contract = await load_contract(session, apt_id=apt_id, require_client=False)
+    return render_page9(request, contract)
 
 @router.get("/page10")
-def read_page10(request : Request, apt_id : int) -> Any:
-    with Session(db.engine) as session:
-        apartment_info = session.exec(select(ApartmentInfo).where(ApartmentInfo.id == apt_id)).first()
-        if not apartment_info:
-            raise HTTPException(status_code=404, detail="Apartment not found")
-        data = {
-            'price' : apartment_info.meter_price,
-            'area' : apartment_info.area
-        }
-    return templates.TemplateResponse("page/page10.html", {"request": request , 'data': data})
+async def read_page10(request : Request, session : AsyncSessionDep, apt_id : int) -> Any:
+    contract = await load_contract(session, apt_id=apt_id, require_client=False)
+    return render_page10(request, contract)
 
 # async def capture_page_pdfs(base_url: str, page_endpoints: list[str], output_dir: str) -> list[str]:
 #     """
@@ -296,32 +339,29 @@ def read_page10(request : Request, apt_id : int) -> Any:
 #     return pdf_paths
 
 @router.get("/Generate-pdf/{client_id}")
-async def generate_direct_pdf(request: Request, client_id: int, current_user: CurrentUser) -> Any:
+async def generate_direct_pdf(
+    request: Request, client_id: int, session: AsyncSessionDep, current_user: AsyncCurrentUser
+) -> Any:
     """
     Endpoint that renders templates directly to PDFs.
     Uses in-memory rendering and Playwright to generate PDFs.
     """
-    with Session(db.engine) as session:
-        client_info = session.exec(select(ClientInfo).where(ClientInfo.id == client_id)).first()
-        if not client_info:
-            raise HTTPException(status_code=404, detail="Client not found")
-        apartment_info = session.exec(select(ApartmentInfo).where(ApartmentInfo.id == client_info.apt_id)).first()
-        if not apartment_info:
-            raise HTTPException(status_code=404, detail="Apartment not found")
+    # One query loads everything the page renderers need
+    contract = await load_contract(session, client_id=client_id)
     # Create a temporary directory
     with tempfile.TemporaryDirectory() as temp_dir:
         # List of functions and parameters to render each page
         page_renderers = [
-            (read_pages, {"no": client_info.no, "apt_id": apartment_info.id}),
-            (read_page2, {"client_id": client_info.id}),
-            (read_page3, {"apt_id": apartment_info.id}),
+            (render_page1, {"contract": contract, "no": contract.client.no}),
+            (render_page2, {"contract": contract}),
+            (render_page3, {"contract": contract}),
             (read_page4, {}),
             (read_page5, {}),
             (read_page6, {}),
             (read_page7, {}),
-            (read_page8, {"apt_id": apartment_info.id}),
-            (read_page9, {"apt_id": apartment_info.id}),
-            (read_page10, {"apt_id": apartment_info.id})
+            (render_page8, {"contract": contract}),
+            (render_page9, {"contract": contract}),
+            (render_page10, {"contract": contract})
         ]
         
         # Generate HTML and PDFs for each page
@@ -1,9 +1,12 @@
 from typing import Any
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 from sqlmodel import func, select
 
-from api.deps import CurrentUser, SessionDep
+from api.deps import AsyncCurrentUser, AsyncSessionDep, CurrentUser, SessionDep
+from api.responses import cached_response, public_columns, rows_response
+from core.cache import response_cache
 from models import (
     PaymentType,
     PaymentTypeCreate,
@@ -15,24 +18,35 @@ from models import (
 router = APIRouter(prefix="/payment-types", tags=["payment-types"])
 
 
-@router.get("/", response_model=list[PaymentTypePublic])
-def read_payment_types(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+@router.get("/", response_model=list[PaymentTypePublic], response_class=ORJSONResponse)
+async def read_payment_types(
+    request: Request,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    skip: int = 0,
+    limit: int = 100,
 ) -> Any:
     """
-    Retrieve payment types.
+    Retrieve payment types. Served from the response cache until a payment
+    type changes.
     """
-    statement = select(PaymentType).offset(skip).limit(limit)
-    payment_types = session.exec(statement).all()
-    return payment_types
+    key = await response_cache.key(request, current_user, PaymentType)
+    cached = await response_cache.get(key)
+    if cached is not None:
+        return cached_response(request, cached)
+    columns = public_columns(PaymentType, PaymentTypePublic)
+    statement = select(*columns).order_by(PaymentType.id).offset(skip).limit(limit)
+    response = rows_response(await session.exec(statement), columns)
+    await response_cache.store(key, response)
+    return response
 
 
 @router.get("/{id}", response_model=PaymentTypePublic)
-def read_payment_type(session: SessionDep, current_user: CurrentUser, id: int) -> Any:
+async def read_payment_type(session: AsyncSessionDep, current_user: AsyncCurrentUser, id: int) -> Any:
     """
     Get payment type by ID.
     """
-    payment_type = session.get(PaymentType, id)
+    payment_type = await session.get(PaymentType, id)
     if not payment_type:
         raise HTTPException(status_code=404, detail="Payment type not found")
     return payment_type
@@ -1,50 +1,183 @@
-from typing import Any
+from typing import Any, Optional
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import selectinload
 from sqlmodel import func, select
 
-from api.deps import CurrentUser, SessionDep
+import crud
+from api.deps import AsyncCurrentUser, AsyncSessionDep, BulkRows, CurrentUser, SessionDep
+from api.responses import (
+    batch_response,
+    object_dict,
+    parse_ids,
+    parse_expand,
+    public_columns,
+    rows_response,
+    select_fields,
+)
 from models import (
+    ApartmentInfo,
+    ApartmentInfoPublic,
+    ClientInfo,
+    ClientInfoPublic,
     Payment,
     PaymentCreate,
     PaymentPublic,
     PaymentUpdate,
+    PaymentType,
+    PaymentTypePublic,
+    BulkWriteResult,
     Message,
+    PaymentsBatchPublic,
 )
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
+PAYMENT_EXPANSIONS = ("client", "payment_type", "apartment")
+CLIENT_COLUMNS = public_columns(ClientInfo, ClientInfoPublic)
+APARTMENT_COLUMNS = public_columns(ApartmentInfo, ApartmentInfoPublic)
+PAYMENT_TYPE_COLUMNS = public_columns(PaymentType, PaymentTypePublic)
+
+
+def payment_select(columns: list[Any], expand: set[str]) -> Any:
+    """
+    Select of the requested columns, or of payments with their expanded
+    relations, each loaded with one additional query.
+    """
+    if not expand:
+        return select(*columns)
+    options = []
+    if "client" in expand or "apartment" in expand:
+        loader = selectinload(Payment.client)
+        if "apartment" in expand:
+            loader = loader.selectinload(ClientInfo.apartment)
+        options.append(loader)
+    if "payment_type" in expand:
+        options.append(selectinload(Payment.payment_type))
+    return select(Payment).options(*options)
+
+
+async def payments_response(
+    session: AsyncSessionDep, statement: Any, columns: list[Any], expand: set[str]
+) -> Any:
+    if not expand:
+        return rows_response(await session.exec(statement), columns)
+    rows = []
+    for payment in (await session.exec(statement)).all():
+        row = object_dict(payment, columns)
+        if "client" in expand:
+            row["client"] = object_dict(payment.client, CLIENT_COLUMNS)
+        if "payment_type" in expand:
+            row["payment_type"] = object_dict(payment.payment_type, PAYMENT_TYPE_COLUMNS)
+        if "apartment" in expand:
+            row["apartment"] = object_dict(
+                payment.client and payment.client.apartment, APARTMENT_COLUMNS
+            )
+        rows.append(row)
+    return ORJSONResponse(rows)
+
+
+@router.get("/", response_model=list[PaymentPublic], response_class=ORJSONResponse)
+async def read_payments(
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+) -> Any:
+    """
+    Retrieve payments. fields (e.g. "id,amount,date_of_payment") limits the
+    returned columns, expand (client, payment_type, apartment) nests the
+    related rows.
+    """
+    columns = select_fields(Payment, PaymentPublic, fields)
+    expansions = parse_expand(expand, PAYMENT_EXPANSIONS)
+    statement = payment_select(columns, expansions).offset(skip).limit(limit)
+    return await payments_response(session, statement, columns, expansions)
+
+
+@router.get(
+    "/by-client/{client_id}",
+    response_model=list[PaymentPublic],
+    response_class=ORJSONResponse,
+)
+async def read_payments_by_client(
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    client_id: int,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+) -> Any:
+    """
+    Get payments by client ID. fields limits the returned columns, expand
+    nests the related rows.
+    """
+    columns = select_fields(Payment, PaymentPublic, fields)
+    expansions = parse_expand(expand, PAYMENT_EXPANSIONS)
+    statement = payment_select(columns, expansions).where(Payment.client_id == client_id)
+    return await payments_response(session, statement, columns, expansions)
+
 
-@router.get("/", response_model=list[PaymentPublic])
-def read_payments(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+@router.post("/bulk", response_model=BulkWriteResult)
+def create_payments_bulk(
+    *,
+    session: SessionDep,
+    current_user: CurrentUser,
+    rows_in: BulkRows,
+    atomic: bool = False,
 ) -> Any:
     """
-    Retrieve payments.
+    Create many payments in one transaction. Invalid rows are reported by
+    index and skipped, or reject the whole batch when atomic is set.
     """
-    statement = select(Payment).offset(skip).limit(limit)
-    payments = session.exec(statement).all()
-    return payments
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    return crud.bulk_create(
+        session=session, model=Payment, create_model=PaymentCreate, rows=rows_in, atomic=atomic
+    )
 
 
-@router.get("/by-client/{client_id}", response_model=list[PaymentPublic])
-def read_payments_by_client(
-    session: SessionDep, current_user: CurrentUser, client_id: int
+@router.put("/bulk", response_model=BulkWriteResult)
+def update_payments_bulk(
+    *,
+    session: SessionDep,
+    current_user: CurrentUser,
+    rows_in: BulkRows,
+    atomic: bool = False,
 ) -> Any:
     """
-    Get payments by client ID.
+    Update many payments in one transaction. Each row holds the payment "id"
+    and the fields to change.
     """
-    statement = select(Payment).where(Payment.client_id == client_id)
-    payments = session.exec(statement).all()
-    return payments
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    return crud.bulk_update(
+        session=session, model=Payment, update_model=PaymentUpdate, rows=rows_in, atomic=atomic
+    )
+
+
+@router.get("/batch", response_model=PaymentsBatchPublic, response_class=ORJSONResponse)
+async def read_payments_batch(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, ids: str
+) -> Any:
+    """
+    Get payments by a comma separated list of ids, in that order. Ids that
+    do not exist are listed in missing.
+    """
+    columns = public_columns(Payment, PaymentPublic)
+    return await batch_response(session, columns, parse_ids(ids))
 
 
 @router.get("/{id}", response_model=PaymentPublic)
-def read_payment(session: SessionDep, current_user: CurrentUser, id: int) -> Any:
+async def read_payment(session: AsyncSessionDep, current_user: AsyncCurrentUser, id: int) -> Any:
     """
     Get payment by ID.
     """
-    payment = session.get(Payment, id)
+    payment = await session.get(Payment, id)
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
     return payment
@@ -0,0 +1,171 @@
+from datetime import date, datetime
+from typing import Any, Optional
+
+from fastapi import APIRouter, HTTPException
+from sqlmodel import and_, func, select
+
+import rollups
+from api.deps import AsyncCurrentUser, AsyncSessionDep
+from balances import client_balance_statement
+from models import (
+    ApartmentInfo,
+    BuildingTotalPublic,
+    ClientBalance,
+    ClientBalancePublic,
+    ClientInfo,
+    CollectionBucketPublic,
+    FloorTotalPublic,
+    Payment,
+    PaymentType,
+    PaymentTypeTotalPublic,
+)
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+
+def apartment_totals_statement(*group_by: Any):
+    """
+    Price, collected and outstanding amounts of apartments grouped by the
+    given apartment columns.
+    """
+    # Sum payments per apartment first so apartments with several clients
+    # or payments are only counted once
+    collected_by_apt = (
+        select(
+            ClientInfo.apt_id.label("apt_id"),
+            func.sum(Payment.amount).label("collected"),
+        )
+        .join(Payment, Payment.client_id == ClientInfo.id)
+        .group_by(ClientInfo.apt_id)
+        .subquery()
+    )
+    total_price = func.coalesce(func.sum(ApartmentInfo.area * ApartmentInfo.meter_price), 0)
+    collected = func.coalesce(func.sum(collected_by_apt.c.collected), 0)
+    return (
+        select(
+            *group_by,
+            func.count(ApartmentInfo.id).label("apartment_count"),
+            total_price.label("total_price"),
+            collected.label("collected"),
+            (total_price - collected).label("outstanding"),
+        )
+        .outerjoin(collected_by_apt, collected_by_apt.c.apt_id == ApartmentInfo.id)
+        .group_by(*group_by)
+        .order_by(*group_by)
+    )
+
+
+@router.get("/clients/balances", response_model=list[ClientBalancePublic])
+async def read_client_balances(
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    building: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> Any:
+    """
+    Paid and outstanding amounts for all clients, read from the
+    client_balance summary table.
+    """
+    statement = select(ClientBalance)
+    if building:
+        statement = statement.join(
+            ApartmentInfo, ApartmentInfo.id == ClientBalance.apt_id
+        ).where(ApartmentInfo.building == building)
+    statement = statement.order_by(ClientBalance.client_id).offset(skip).limit(limit)
+    balances = (await session.exec(statement)).all()
+    return balances
+
+
+@router.get("/clients/{client_id}/balance", response_model=ClientBalancePublic)
+async def read_client_balance(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, client_id: int
+) -> Any:
+    """
+    Paid and outstanding amount for one client.
+    """
+    statement = client_balance_statement().where(ClientInfo.id == client_id)
+    row = (await session.exec(statement)).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Client not found")
+    return row._mapping
+
+
+@router.get("/buildings", response_model=list[BuildingTotalPublic])
+async def read_building_totals(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser
+) -> Any:
+    """
+    Collected and outstanding amounts per building.
+    """
+    statement = apartment_totals_statement(ApartmentInfo.building)
+    rows = (await session.exec(statement)).all()
+    return [row._mapping for row in rows]
+
+
+@router.get("/buildings/{building}/floors", response_model=list[FloorTotalPublic])
+async def read_floor_totals(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, building: str
+) -> Any:
+    """
+    Collected and outstanding amounts per floor of a building.
+    """
+    statement = apartment_totals_statement(
+        ApartmentInfo.building, ApartmentInfo.floor
+    ).where(ApartmentInfo.building == building)
+    rows = (await session.exec(statement)).all()
+    return [row._mapping for row in rows]
+
+
+@router.get("/payment-types", response_model=list[PaymentTypeTotalPublic])
+async def read_payment_type_totals(
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    client_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Any:
+    """
+    Number and sum of payments per payment type, optionally for one client
+    and/or a date range (start inclusive, end exclusive).
+    """
+    conditions = [Payment.payment_type_id == PaymentType.id]
+    if client_id is not None:
+        conditions.append(Payment.client_id == client_id)
+    if start:
+        conditions.append(Payment.date_of_payment >= start)
+    if end:
+        conditions.append(Payment.date_of_payment < end)
+    statement = (
+        select(
+            PaymentType.id.label("payment_type_id"),
+            PaymentType.name,
+            func.count(Payment.id).label("payment_count"),
+            func.coalesce(func.sum(Payment.amount), 0).label("total"),
+        )
+        .outerjoin(Payment, and_(*conditions))
+        .group_by(PaymentType.id, PaymentType.name)
+        .order_by(PaymentType.id)
+    )
+    rows = (await session.exec(statement)).all()
+    return [row._mapping for row in rows]
+
+
+@router.get("/collections", response_model=list[CollectionBucketPublic])
+async def read_collections(
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    start: date,
+    end: date,
+    period: rollups.Period = "month",
+    payment_type_id: Optional[int] = None,
+) -> Any:
+    """
+    Collected sums and payment counts per day, week or month and payment
+    type, for the buckets overlapping start..end (both inclusive).
+    """
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    return await session.run_sync(
+        rollups.read_collections, period, start, end, payment_type_id
+    )
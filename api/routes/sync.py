@@ -0,0 +1,84 @@
+import base64
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlmodel import select
+
+from api.deps import AsyncCurrentUser, AsyncSessionDep
+from api.responses import public_columns
+from core.config import settings
+from models import (
+    ApartmentInfo,
+    ApartmentInfoPublic,
+    ClientInfo,
+    ClientInfoPublic,
+    Payment,
+    PaymentPublic,
+    SyncPublic,
+    SyncTombstone,
+)
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+SYNC_TABLES = {
+    "apartments": (ApartmentInfo, ApartmentInfoPublic),
+    "clients": (ClientInfo, ClientInfoPublic),
+    "payments": (Payment, PaymentPublic),
+}
+
+
+def encode_cursor(value: datetime) -> str:
+    return base64.urlsafe_b64encode(value.isoformat().encode()).decode()
+
+
+def decode_cursor(cursor: str) -> datetime:
+    try:
+        return datetime.fromisoformat(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/", response_model=SyncPublic)
+async def sync(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, since: Optional[str] = None
+) -> Any:
+    """
+    Apartments, clients and payments changed since the cursor of a previous
+    sync, and the ids deleted since then; everything without since. Apply
+    deleted before rows, and pass the returned cursor as since next time.
+    Rows changed just before a cursor may be sent twice.
+    """
+    started = datetime.now()
+    changed_since = decode_cursor(since) if since else None
+    retention = timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    if changed_since is not None and changed_since < started - retention:
+        raise HTTPException(status_code=410, detail="Cursor expired, sync again without since")
+
+    # Taken before the queries, so changes made meanwhile are in the next sync
+    data: dict[str, Any] = {
+        "cursor": encode_cursor(started - timedelta(seconds=settings.SYNC_CURSOR_LAG_SECONDS))
+    }
+    for name, (model, public_model) in SYNC_TABLES.items():
+        columns = public_columns(model, public_model)
+        statement = select(*columns).order_by(model.id)
+        deleted: list[int] = []
+        if changed_since is not None:
+            statement = statement.where(model.updated_at > changed_since)
+            deleted = list(
+                (
+                    await session.exec(
+                        select(SyncTombstone.row_id).where(
+                            SyncTombstone.table_name == model.__tablename__,
+                            SyncTombstone.deleted_at > changed_since,
+                        )
+                    )
+                ).all()
+            )
+        data[name] = {
+            "columns": [column.name for column in columns],
+            "rows": [list(row) for row in await session.exec(statement)],
+            "deleted": deleted,
+        }
+    return ORJSONResponse(data)
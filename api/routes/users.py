@@ -1,8 +1,8 @@
 import uuid
-from typing import Any
+from typing import Any, Literal
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import col, delete, func, select
+from sqlmodel import col, delete, select
 
 import crud
 from api.deps import (
@@ -11,6 +11,7 @@ from api.deps import (
     get_current_active_superuser,
 )
 from core.config import settings
+from core.counts import adjust_count, read_count
 from core.security import get_password_hash, verify_password
 from models import (
     Item,
@@ -34,18 +35,23 @@ router = APIRouter(prefix="/users", tags=["users"])
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UsersPublic,
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+def read_users(
+    session: SessionDep,
+    skip: int = 0,
+    limit: int = 100,
+    count: Literal["exact", "cached"] = "cached",
+) -> Any:
     """
-    Retrieve users.
+    Retrieve users. count=cached (default) returns the cached total, which
+    count_exact flags; count=exact counts the table.
     """
 
-    count_statement = select(func.count()).select_from(User)
-    count = session.exec(count_statement).one()
+    total, count_exact = read_count(session, User, exact=count == "exact")
 
     statement = select(User).offset(skip).limit(limit)
     users = session.exec(statement).all()
 
-    return UsersPublic(data=users, count=count)
+    return UsersPublic(data=users, count=total, count_exact=count_exact)
 
 
 @router.post(
@@ -220,7 +226,8 @@ def delete_user(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
     statement = delete(Item).where(col(Item.owner_id) == user_id)
-    session.exec(statement)  # type: ignore
+    result = session.exec(statement)  # type: ignore
+    adjust_count(session.connection(), Item, -result.rowcount, owner_id=user_id)
     session.delete(user)
     session.commit()
     return Message(message="User deleted successfully")
@@ -1,8 +1,22 @@
-from fastapi import APIRouter, Depends
+from pathlib import Path
+
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic.networks import EmailStr
 
+import backup
 from api.deps import get_current_active_superuser
-from models import Message
+from core.cache import response_cache
+from core.events import event_bus
+from core.security import password_hasher
+from core.user_cache import user_cache
+from models import (
+    BackupPublic,
+    BackupVerificationPublic,
+    CacheStatsPublic,
+    EventStatsPublic,
+    Message,
+    PasswordHashStatsPublic,
+)
 from utils import generate_test_email, send_email
 
 router = APIRouter(prefix="/utils", tags=["utils"])
@@ -26,6 +40,100 @@ def test_email(email_to: EmailStr) -> Message:
     return Message(message="Test email sent")
 
 
+@router.post(
+    "/backups/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=BackupPublic,
+    status_code=201,
+)
+def create_backup() -> BackupPublic:
+    """
+    Take a consistent snapshot of the running database.
+    """
+    try:
+        return backup.create_backup()
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get(
+    "/backups/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=list[BackupPublic],
+)
+def read_backups() -> list[BackupPublic]:
+    """
+    List database snapshots, newest first.
+    """
+    return backup.list_backups()
+
+
+@router.post(
+    "/backups/{file}/verify",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=BackupVerificationPublic,
+)
+def verify_backup(file: str) -> BackupVerificationPublic:
+    """
+    Check a snapshot's checksum and that it restores to an intact database.
+    """
+    if Path(file).name != file or not file.endswith(".db.gz"):
+        raise HTTPException(status_code=400, detail="Invalid backup file name")
+    result = backup.verify_backup(backup.backup_dir() / file)
+    if not result.ok and result.detail == "Backup file does not exist":
+        raise HTTPException(status_code=404, detail="Backup not found")
+    return result
+
+
+@router.get(
+    "/cache/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=CacheStatsPublic,
+)
+def read_cache_stats() -> CacheStatsPublic:
+    """
+    Response cache hits, misses and invalidations since startup.
+    """
+    return response_cache.stats()
+
+
+@router.get(
+    "/user-cache/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=CacheStatsPublic,
+)
+def read_user_cache_stats() -> CacheStatsPublic:
+    """
+    Authenticated user cache hits, misses and invalidations since startup.
+    """
+    return user_cache.stats()
+
+
+@router.get(
+    "/events/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=EventStatsPublic,
+)
+def read_event_stats() -> EventStatsPublic:
+    """
+    Open live event connections and events published since startup.
+    """
+    return event_bus.stats()
+
+
+@router.get(
+    "/password-hashing/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=PasswordHashStatsPublic,
+)
+def read_password_hash_stats() -> PasswordHashStatsPublic:
+    """
+    Password hashing and verification timings since startup, including
+    the time spent waiting for a worker.
+    """
+    return password_hasher.stats()
+
+
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
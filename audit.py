@@ -0,0 +1,246 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from sqlalchemy import Connection, event, insert, select
+from sqlalchemy.orm import Session as ORMSession, object_session
+
+from core.cache import response_cache
+from core.config import settings
+from core.counts import adjust_count
+from core.db import engine
+from models import ApartmentInfo, ClientInfo, History, HistoryType, Payment
+
+logger = logging.getLogger(__name__)
+
+# Audited models and the entity name used in their history type names,
+# e.g. "Payment Added" / "Payment Updated" / "Payment Deleted"
+AUDITED_MODELS = {
+    ApartmentInfo: "Apartment",
+    ClientInfo: "Client",
+    Payment: "Payment",
+}
+
+_PENDING_KEY = "audit_pending"
+_STOP = object()
+
+
+class HistoryWriter:
+    """
+    Collects history records in memory and writes them on a background
+    thread, one multi-row INSERT per batch. A batch that fails is retried
+    with exponential backoff, after the last attempt its records are
+    appended to the dead letter file instead of being lost.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float,
+        batch_size: int,
+        attempts: int = 1,
+        backoff: float = 0.0,
+        dead_letter_path: Optional[Path] = None,
+    ) -> None:
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.attempts = max(attempts, 1)
+        self.backoff = backoff
+        self.dead_letter_path = dead_letter_path
+        self._queue: queue.Queue[Any] = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._type_ids: dict[str, int] = {}
+
+    def enqueue(self, records: list[dict[str, Any]]) -> None:
+        for record in records:
+            self._queue.put(record)
+        self.start()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="history-writer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Write everything still queued and stop the writer thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        # Records enqueued while the thread was shutting down
+        batch = [record for record in self._drain() if record is not _STOP]
+        if batch:
+            self._write(batch)
+
+    def _drain(self) -> list[Any]:
+        records = []
+        while True:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                return records
+
+    def _run(self) -> None:
+        batch: list[dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                record = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                record = None
+            if record is _STOP:
+                batch.extend(r for r in self._drain() if r is not _STOP)
+                for start in range(0, len(batch), self.batch_size):
+                    self._write(batch[start : start + self.batch_size])
+                return
+            if record is not None:
+                batch.append(record)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._write(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _resolve_type_ids(
+        self, connection: Connection, names: set[str]
+    ) -> tuple[dict[str, int], int]:
+        # Also returns the number of history types inserted
+        missing = names - self._type_ids.keys()
+        new_names: set[str] = set()
+        if missing:
+            table = HistoryType.__table__
+            rows = connection.execute(
+                select(table.c.id, table.c.name).where(table.c.name.in_(missing))
+            )
+            self._type_ids.update({name: id for id, name in rows})
+            new_names = missing - self._type_ids.keys()
+            for name in sorted(new_names):
+                result = connection.execute(insert(table).values(name=name))
+                self._type_ids[name] = result.inserted_primary_key[0]
+            adjust_count(connection, HistoryType, len(new_names))
+        return self._type_ids, len(new_names)
+
+    def _write(self, batch: list[dict[str, Any]]) -> None:
+        for attempt in range(1, self.attempts + 1):
+            try:
+                self._insert(batch)
+                return
+            except Exception:
+                # Type ids may be stale if history types were edited meanwhile
+                self._type_ids.clear()
+                logger.exception(
+                    f"Failed to write {len(batch)} history records "
+                    f"(attempt {attempt} of {self.attempts})"
+                )
+            if attempt < self.attempts:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+        self._dead_letter(batch)
+
+    def _insert(self, batch: list[dict[str, Any]]) -> None:
+        with engine.begin() as connection:
+            type_ids, new_types = self._resolve_type_ids(
+                connection, {record["type"] for record in batch}
+            )
+            connection.execute(
+                insert(History.__table__).values(
+                    [
+                        {
+                            "type_id": type_ids[record["type"]],
+                            "entity_id": record["entity_id"],
+                            "datetime": record["datetime"],
+                        }
+                        for record in batch
+                    ]
+                )
+            )
+            adjust_count(connection, History, len(batch))
+        if new_types:
+            response_cache.invalidate(HistoryType)
+
+    def _dead_letter(self, batch: list[dict[str, Any]]) -> None:
+        if self.dead_letter_path is None:
+            logger.error(f"Dropped {len(batch)} history records")
+            return
+        try:
+            self.dead_letter_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for record in batch:
+                    f.write(
+                        json.dumps({**record, "datetime": record["datetime"].isoformat()})
+                        + "\n"
+                    )
+        except OSError:
+            logger.exception(f"Dropped {len(batch)} history records")
+            return
+        logger.error(f"Wrote {len(batch)} history records to {self.dead_letter_path}")
+
+
+history_writer = HistoryWriter(
+    flush_interval=settings.HISTORY_FLUSH_INTERVAL_SECONDS,
+    batch_size=settings.HISTORY_FLUSH_BATCH_SIZE,
+    attempts=settings.HISTORY_WRITE_ATTEMPTS,
+    backoff=settings.HISTORY_WRITE_BACKOFF_SECONDS,
+    dead_letter_path=Path(settings.HISTORY_DEAD_LETTER_FILE),
+)
+atexit.register(history_writer.stop)
+
+
+def _record(target: Any, action: str) -> None:
+    session = object_session(target)
+    if session is None:
+        return
+    session.info.setdefault(_PENDING_KEY, []).append(
+        {
+            "type": f"{AUDITED_MODELS[type(target)]} {action}",
+            "entity_id": target.id,
+            "datetime": datetime.now(),
+        }
+    )
+
+
+def _after_insert(mapper: Any, connection: Connection, target: Any) -> None:
+    _record(target, "Added")
+
+
+def _after_update(mapper: Any, connection: Connection, target: Any) -> None:
+    # after_update also fires for objects that were dirty without net changes
+    session = object_session(target)
+    if session is not None and session.is_modified(target, include_collections=False):
+        _record(target, "Updated")
+
+
+def _after_delete(mapper: Any, connection: Connection, target: Any) -> None:
+    _record(target, "Deleted")
+
+
+if settings.AUDIT_HISTORY_ENABLED:
+    for model in AUDITED_MODELS:
+        event.listen(model, "after_insert", _after_insert)
+        event.listen(model, "after_update", _after_update)
+        event.listen(model, "after_delete", _after_delete)
+
+
+@event.listens_for(ORMSession, "after_commit")
+def _enqueue_committed(session: ORMSession) -> None:
+    # Only changes that were actually committed end up in the history
+    records = session.info.pop(_PENDING_KEY, None)
+    if records:
+        history_writer.enqueue(records)
+
+
+@event.listens_for(ORMSession, "after_rollback")
+def _discard_rolled_back(session: ORMSession) -> None:
+    session.info.pop(_PENDING_KEY, None)
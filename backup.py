@@ -0,0 +1,225 @@
+import argparse
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from core.config import settings
+from models import BackupPublic, BackupVerificationPublic
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def backup_dir() -> Path:
+    path = Path(settings.BACKUP_DIR)
+    return path if path.is_absolute() else BASE_DIR / path
+
+
+def database_path() -> Path:
+    if settings.DATABASE_BACKEND != "sqlite":
+        raise RuntimeError("Online backups are only supported on SQLite, use pg_dump")
+    from core.db import engine
+
+    return Path(engine.url.database or "")
+
+
+def _checksum_path(path: Path) -> Path:
+    return path.with_name(path.name + ".sha256")
+
+
+def _begin_snapshot(connection: sqlite3.Connection) -> None:
+    """
+    Switch the database to WAL mode and open a read transaction, so a backup
+    through connection copies one snapshot. Without WAL a write committed by
+    another connection restarts the backup, which then does not finish while
+    the application keeps writing.
+    """
+    # Already set on startup (core.db.enable_wal), switching needs a moment
+    # without writers
+    try:
+        (mode,) = connection.execute("PRAGMA journal_mode=WAL").fetchone()
+    except sqlite3.OperationalError as e:
+        raise RuntimeError(f"Could not switch the database to WAL mode: {e}") from None
+    if mode != "wal":
+        raise RuntimeError(
+            f"Online backups need the database in WAL mode, it stayed in {mode} mode"
+        )
+    connection.execute("BEGIN")
+    connection.execute("SELECT count(*) FROM sqlite_master").fetchone()
+
+
+def _integrity_errors(path: Path) -> list[str]:
+    connection = sqlite3.connect(path)
+    try:
+        rows = connection.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        connection.close()
+    return [row[0] for row in rows if row[0] != "ok"]
+
+
+class _HashingWriter:
+    """
+    File wrapper that hashes everything written through it.
+    """
+
+    def __init__(self, file, digest) -> None:  # type: ignore[no-untyped-def]
+        self.file = file
+        self.digest = digest
+
+    def write(self, data: bytes) -> int:
+        self.digest.update(data)
+        return self.file.write(data)
+
+    def flush(self) -> None:
+        self.file.flush()
+
+
+def create_backup(
+    pages: int = settings.BACKUP_PAGES_PER_STEP,
+    sleep: float = settings.BACKUP_STEP_SLEEP_SECONDS,
+) -> BackupPublic:
+    """
+    Copy the live database with SQLite's online backup API, pages pages at a
+    time with a pause in between, then check and gzip the copy and record
+    its sha256 next to it. The copy is read from one snapshot of the
+    database in WAL mode, writers keep committing while it runs.
+    """
+    source_path = database_path()
+    created_at = datetime.now()
+    target = backup_dir() / f"{source_path.stem}-{created_at:%Y%m%d-%H%M%S}.db.gz"
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        logger.debug(f"Backup: {total - remaining} of {total} pages copied")
+        if remaining:
+            # The backup API itself only waits while the source is locked
+            time.sleep(sleep)
+
+    with tempfile.TemporaryDirectory(dir=target.parent) as tmp_dir:
+        snapshot = Path(tmp_dir) / source_path.name
+        source = sqlite3.connect(source_path, timeout=settings.DB_STATEMENT_TIMEOUT_MS / 1000)
+        destination = sqlite3.connect(snapshot)
+        try:
+            _begin_snapshot(source)
+            source.backup(destination, pages=pages, progress=progress)
+        finally:
+            destination.close()
+            source.close()
+        errors = _integrity_errors(snapshot)
+        if errors:
+            raise RuntimeError(f"Backup failed the integrity check: {errors[:5]}")
+
+        digest = hashlib.sha256()
+        tmp_target = target.with_suffix(".tmp")
+        with open(snapshot, "rb") as f, open(tmp_target, "wb") as raw:
+            with gzip.GzipFile(fileobj=_HashingWriter(raw, digest), mode="wb") as out:
+                shutil.copyfileobj(f, out, 1024 * 1024)
+        os.replace(tmp_target, target)
+
+    sha256 = digest.hexdigest()
+    _checksum_path(target).write_text(f"{sha256}  {target.name}\n")
+    backup = BackupPublic(
+        file=target.name, size=target.stat().st_size, sha256=sha256, created_at=created_at
+    )
+    logger.info(f"Wrote backup {target} ({backup.size} bytes)")
+    return backup
+
+
+def list_backups() -> list[BackupPublic]:
+    backups = []
+    for path in sorted(backup_dir().glob("*.db.gz"), reverse=True):
+        checksum = _checksum_path(path)
+        stat = path.stat()
+        backups.append(
+            BackupPublic(
+                file=path.name,
+                size=stat.st_size,
+                sha256=checksum.read_text().split()[0] if checksum.exists() else "",
+                created_at=datetime.fromtimestamp(stat.st_mtime),
+            )
+        )
+    return backups
+
+
+def verify_backup(path: Path) -> BackupVerificationPublic:
+    """
+    Check a backup's checksum, restore it into a temporary file and run
+    SQLite's integrity check on the restored database.
+    """
+    result = BackupVerificationPublic(file=path.name, ok=False)
+    checksum = _checksum_path(path)
+    if not path.exists():
+        result.detail = "Backup file does not exist"
+        return result
+    if not checksum.exists():
+        result.detail = "Checksum file is missing"
+        return result
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    if digest.hexdigest() != checksum.read_text().split()[0]:
+        result.detail = "Checksum does not match"
+        return result
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        restored = Path(tmp_dir) / "restored.db"
+        try:
+            with gzip.open(path, "rb") as f, open(restored, "wb") as out:
+                shutil.copyfileobj(f, out, 1024 * 1024)
+            errors = _integrity_errors(restored)
+            connection = sqlite3.connect(restored)
+            try:
+                tables = [
+                    name
+                    for (name,) in connection.execute(
+                        "SELECT name FROM sqlite_master WHERE type = 'table'"
+                        " AND name NOT LIKE 'sqlite_%' ORDER BY name"
+                    )
+                ]
+                result.tables = {
+                    name: connection.execute(f'SELECT count(*) FROM "{name}"').fetchone()[0]
+                    for name in tables
+                }
+            finally:
+                connection.close()
+        except (OSError, EOFError, sqlite3.DatabaseError) as e:
+            result.detail = f"Restore failed: {e}"
+            return result
+    if errors:
+        result.detail = f"Integrity check failed: {errors[:5]}"
+        return result
+    result.ok = True
+    return result
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Online backups of the SQLite database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    create = subparsers.add_parser("create")
+    create.add_argument("--pages", type=int, default=settings.BACKUP_PAGES_PER_STEP)
+    create.add_argument("--sleep", type=float, default=settings.BACKUP_STEP_SLEEP_SECONDS)
+    verify = subparsers.add_parser("verify")
+    verify.add_argument("path", type=Path)
+    args = parser.parse_args()
+    if args.command == "create":
+        backup = create_backup(args.pages, args.sleep)
+        args.path = backup_dir() / backup.file
+    result = verify_backup(args.path)
+    if not result.ok:
+        logger.error(f"Backup {args.path} is not usable: {result.detail}")
+        raise SystemExit(1)
+    logger.info(f"Backup {args.path} restores cleanly: {result.tables}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import logging
+from collections.abc import Iterable
+from typing import Any
+
+from sqlalchemy import Connection, delete, event, insert, inspect
+from sqlalchemy.orm import Session as ORMSession
+from sqlmodel import Session, func, select
+
+from crud import chunks
+from models import ApartmentInfo, ClientBalance, ClientInfo, Payment
+
+logger = logging.getLogger(__name__)
+
+BALANCE_COLUMNS = [
+    "client_id",
+    "apt_id",
+    "price",
+    "total_paid",
+    "payment_count",
+    "last_payment_date",
+    "outstanding",
+]
+
+
+def client_balance_statement():
+    """
+    Paid and outstanding amount per client, computed from the payments table.
+    Columns are in the order of BALANCE_COLUMNS.
+    """
+    price = ApartmentInfo.area * ApartmentInfo.meter_price
+    total_paid = func.coalesce(func.sum(Payment.amount), 0)
+    return (
+        select(
+            ClientInfo.id.label("client_id"),
+            ClientInfo.apt_id,
+            price.label("price"),
+            total_paid.label("total_paid"),
+            func.count(Payment.id).label("payment_count"),
+            func.max(Payment.date_of_payment).label("last_payment_date"),
+            (price - total_paid).label("outstanding"),
+        )
+        .join(ApartmentInfo, ApartmentInfo.id == ClientInfo.apt_id)
+        .outerjoin(Payment, Payment.client_id == ClientInfo.id)
+        .group_by(
+            ClientInfo.id, ClientInfo.apt_id, ApartmentInfo.area, ApartmentInfo.meter_price
+        )
+    )
+
+
+def refresh_client_balances(
+    connection: Connection,
+    *,
+    client_ids: Iterable[int] = (),
+    apt_ids: Iterable[int] = (),
+) -> None:
+    """
+    Recompute the client_balance rows of the given clients and of all
+    clients of the given apartments, inside the caller's transaction.
+    """
+    client_ids = set(client_ids)
+    for chunk in chunks(list(apt_ids)):
+        statement = select(ClientInfo.id).where(ClientInfo.apt_id.in_(chunk))
+        client_ids.update(connection.execute(statement).scalars())
+    for chunk in chunks(sorted(client_ids)):
+        connection.execute(
+            delete(ClientBalance.__table__).where(ClientBalance.client_id.in_(chunk))
+        )
+        statement = client_balance_statement().where(ClientInfo.id.in_(chunk))
+        connection.execute(
+            insert(ClientBalance.__table__).from_select(BALANCE_COLUMNS, statement)
+        )
+
+
+def rebuild_client_balances(session: Session) -> int:
+    """
+    Rebuild the whole client_balance table from the payments table.
+    """
+    connection = session.connection()
+    connection.execute(delete(ClientBalance.__table__))
+    connection.execute(
+        insert(ClientBalance.__table__).from_select(
+            BALANCE_COLUMNS, client_balance_statement()
+        )
+    )
+    session.commit()
+    count = session.exec(select(func.count()).select_from(ClientBalance)).one()
+    logger.info(f"Rebuilt {count} client balances")
+    return count
+
+
+def check_client_balances(session: Session) -> list[int]:
+    """
+    Compare client_balance with a fresh computation and return the ids of
+    clients whose stored balance is missing, stale or orphaned.
+    """
+    expected = {
+        row.client_id: tuple(row) for row in session.exec(client_balance_statement())
+    }
+    columns = [getattr(ClientBalance, name) for name in BALANCE_COLUMNS]
+    stored = {row.client_id: tuple(row) for row in session.exec(select(*columns))}
+    return sorted(
+        client_id
+        for client_id in expected.keys() | stored.keys()
+        if expected.get(client_id) != stored.get(client_id)
+    )
+
+
+def ensure_client_balances(session: Session) -> None:
+    """
+    Populate client_balance for databases created before the table existed.
+    """
+    has_balances = session.exec(select(ClientBalance.client_id).limit(1)).first()
+    has_clients = session.exec(select(ClientInfo.id).limit(1)).first()
+    if has_clients is not None and has_balances is None:
+        rebuild_client_balances(session)
+
+
+def _changed(obj: Any, *attrs: str) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+
+def _previous(obj: Any, attr: str) -> list[Any]:
+    return [value for value in inspect(obj).attrs[attr].history.deleted if value is not None]
+
+
+@event.listens_for(Payment.client_id, "set", active_history=True)
+def _load_previous_client(target: Any, value: Any, oldvalue: Any, initiator: Any) -> None:
+    # active_history loads the previous client of an expired payment when it
+    # is moved, so the balances of both clients are refreshed
+    pass
+
+
+@event.listens_for(ORMSession, "after_flush")
+def _refresh_after_flush(session: ORMSession, flush_context: Any) -> None:
+    # Runs for every ORM session (API routes, SQLAdmin, scripts), so the
+    # summary is written in the same transaction as the payment change
+    client_ids: set[int] = set()
+    apt_ids: set[int] = set()
+    for obj in session.new:
+        if isinstance(obj, (Payment, ClientInfo)):
+            client_ids.add(obj.client_id if isinstance(obj, Payment) else obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Payment) and _changed(
+            obj, "amount", "client_id", "date_of_payment"
+        ):
+            client_ids.add(obj.client_id)
+            client_ids.update(_previous(obj, "client_id"))
+        elif isinstance(obj, ClientInfo) and _changed(obj, "apt_id"):
+            client_ids.add(obj.id)
+        elif isinstance(obj, ApartmentInfo) and _changed(obj, "area", "meter_price"):
+            apt_ids.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, Payment):
+            client_ids.add(obj.client_id)
+        elif isinstance(obj, ClientInfo):
+            client_ids.add(obj.id)
+        elif isinstance(obj, ApartmentInfo):
+            apt_ids.add(obj.id)
+    client_ids.discard(None)
+    refresh_client_balances(session.connection(), client_ids=client_ids, apt_ids=apt_ids)
+
+
+def main() -> None:
+    from core.db import engine
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Maintain the client_balance table")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args()
+    ClientBalance.__table__.create(engine, checkfirst=True)
+    with Session(engine) as session:
+        if args.command == "rebuild":
+            rebuild_client_balances(session)
+            return
+        mismatched = check_client_balances(session)
+        if mismatched:
+            logger.error(f"{len(mismatched)} inconsistent client balances: {mismatched}")
+            raise SystemExit(1)
+        logger.info("Client balances are consistent")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compare writing many payments on a SQLite database file:
+
+- single: one INSERT and commit per row, as POST /payments/ does for each
+  row sent to it
+- bulk: crud.bulk_create, the batch is checked with one IN query per
+  foreign key and unique column and inserted in one transaction
+  (POST /payments/bulk)
+
+Run from the project root:
+
+    python benchmarks/bulk_write.py --rows 1000 --repeat 3
+"""
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import Engine  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine, delete  # noqa: E402
+
+import crud  # noqa: E402
+from models import (  # noqa: E402
+    ApartmentInfo,
+    ClientInfo,
+    Payment,
+    PaymentCreate,
+    PaymentType,
+)
+
+
+def seed(engine: Engine) -> dict[str, int]:
+    with Session(engine) as session:
+        apartment = ApartmentInfo(
+            building="1", floor=1, apt_no=101, area=120, meter_price=1500, apt_type="A1"
+        )
+        payment_type = PaymentType(name="Cash")
+        session.add_all([apartment, payment_type])
+        session.flush()
+        client = ClientInfo(
+            name="Client",
+            id_no=1234567,
+            issue_date=datetime.now().date(),
+            no=1,
+            m="Cairo",
+            z="Zone A",
+            d="District 1",
+            phone_number="+20100000000",
+            registry_no="1",
+            newspaper_no="1",
+            job_title="Engineer",
+            alt_name="Alternative",
+            alt_kinship="Spouse",
+            alt_phone="+20100000001",
+            alt_m=1,
+            alt_z=2,
+            alt_d=3,
+            apt_id=apartment.id,
+        )
+        session.add(client)
+        session.commit()
+        return {"client_id": client.id, "payment_type_id": payment_type.id}
+
+
+def make_rows(rows: int, ids: dict[str, int]) -> list[dict[str, Any]]:
+    now = datetime.now()
+    return [
+        {
+            "date_of_payment": (now - timedelta(days=i)).isoformat(),
+            "amount": 1000 + i,
+            **ids,
+        }
+        for i in range(rows)
+    ]
+
+
+def single_path(engine: Engine, rows: list[dict[str, Any]]) -> None:
+    with Session(engine) as session:
+        for row in rows:
+            payment = Payment.model_validate(PaymentCreate.model_validate(row))
+            session.add(payment)
+            session.commit()
+            session.refresh(payment)
+
+
+def bulk_path(engine: Engine, rows: list[dict[str, Any]]) -> None:
+    with Session(engine) as session:
+        result = crud.bulk_create(
+            session=session, model=Payment, create_model=PaymentCreate, rows=rows
+        )
+        assert not result.errors, result.errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per request")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/bulk.db")
+        SQLModel.metadata.create_all(engine)
+        rows = make_rows(args.rows, seed(engine))
+        timings = []
+        for path in (single_path, bulk_path):
+            best = float("inf")
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                path(engine, rows)
+                best = min(best, time.perf_counter() - started)
+                with Session(engine) as session:
+                    session.exec(delete(Payment))  # type: ignore
+                    session.commit()
+            timings.append(best)
+        engine.dispose()
+
+    single, bulk = timings
+    print(f"{'rows':<8}{'single (ms)':>14}{'bulk (ms)':>12}{'speedup':>10}")
+    print(f"{args.rows:<8}{single * 1000:>14.1f}{bulk * 1000:>12.1f}{single / bulk:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
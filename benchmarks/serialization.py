@@ -0,0 +1,130 @@
+"""
+Compare the response paths of the list endpoints on an in-memory SQLite
+database:
+
+- orm: select the model, validate every instance through the response model
+  and encode it with the standard json module (FastAPI's response_model path)
+- rows: select the public columns and encode the rows with orjson
+  (api.responses.rows_response)
+
+Run from the project root:
+
+    python benchmarks/serialization.py --rows 100 --repeat 200
+"""
+import argparse
+import random
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine, select  # noqa: E402
+
+from api.responses import public_columns, rows_response  # noqa: E402
+from models import (  # noqa: E402
+    ApartmentInfo,
+    ClientInfo,
+    ClientInfoPublic,
+    History,
+    HistoryPublic,
+    HistoryType,
+    Payment,
+    PaymentPublic,
+    PaymentType,
+)
+
+ENDPOINTS = {
+    "/clients/": (ClientInfo, ClientInfoPublic),
+    "/payments/": (Payment, PaymentPublic),
+    "/history": (History, HistoryPublic),
+}
+
+
+def seed(session: Session, rows: int) -> None:
+    apartment = ApartmentInfo(
+        building="1", floor=1, apt_no=101, area=120, meter_price=1500, apt_type="A1"
+    )
+    payment_type = PaymentType(name="Cash")
+    history_type = HistoryType(name="Payment Added")
+    session.add_all([apartment, payment_type, history_type])
+    session.flush()
+    for i in range(rows):
+        client = ClientInfo(
+            name=f"Client {i}",
+            id_no=random.randint(1000000, 9999999),
+            issue_date=date.today() - timedelta(days=i),
+            no=i,
+            m="Cairo",
+            z="Zone A",
+            d="District 1",
+            phone_number=f"+201{random.randint(10000000, 99999999)}",
+            registry_no=str(i),
+            newspaper_no=str(i),
+            job_title="Engineer",
+            alt_name=f"Alternative {i}",
+            alt_kinship="Spouse",
+            alt_phone=f"+201{random.randint(10000000, 99999999)}",
+            alt_m=1,
+            alt_z=2,
+            alt_d=3,
+            apt_id=apartment.id,
+        )
+        session.add(client)
+        session.flush()
+        session.add(
+            Payment(
+                date_of_payment=datetime.now() - timedelta(days=i),
+                payment_type_id=payment_type.id,
+                amount=random.randint(1000, 10000),
+                client_id=client.id,
+            )
+        )
+        session.add(
+            History(type_id=history_type.id, entity_id=client.id, datetime=datetime.now())
+        )
+    session.commit()
+
+
+def orm_path(
+    session: Session, model: type[SQLModel], public_model: type[SQLModel], rows: int
+) -> bytes:
+    adapter = TypeAdapter(list[public_model])  # type: ignore[valid-type]
+    objects = session.exec(select(model).limit(rows)).all()
+    validated = adapter.validate_python(objects, from_attributes=True)
+    session.expunge_all()
+    return JSONResponse(adapter.dump_python(validated, mode="json")).body
+
+
+def rows_path(
+    session: Session, model: type[SQLModel], public_model: type[SQLModel], rows: int
+) -> bytes:
+    columns = public_columns(model, public_model)
+    return rows_response(session.exec(select(*columns).limit(rows)), columns).body
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100, help="Rows per page")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, args.rows)
+        print(f"{'endpoint':<12}{'orm (ms)':>12}{'rows (ms)':>12}{'speedup':>10}")
+        for endpoint, (model, public_model) in ENDPOINTS.items():
+            timings = []
+            for path in (orm_path, rows_path):
+                timer = timeit.Timer(lambda: path(session, model, public_model, args.rows))
+                timings.append(min(timer.repeat(repeat=5, number=args.repeat)) / args.repeat)
+            orm, rows = timings
+            print(f"{endpoint:<12}{orm * 1000:>12.3f}{rows * 1000:>12.3f}{orm / rows:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import threading
+from typing import Any, Callable, NamedTuple, Optional
+from urllib.parse import urlencode
+
+from anyio import to_thread
+from cachetools import TTLCache
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session as ORMSession
+from sqlmodel import SQLModel
+
+from core.config import settings
+from models import ApartmentInfo, CacheStatsPublic, HistoryType, PaymentType
+
+# Tables whose list responses are cached. Committing a write to one of them
+# moves it to a new generation, which is part of every cache key that
+# depends on it, so older responses are never served again.
+CACHED_MODELS = (ApartmentInfo, HistoryType, PaymentType)
+
+_PENDING_KEY = "cache_invalidate"
+
+
+class CachedResponse(NamedTuple):
+    etag: Optional[str]
+    body: bytes
+
+
+class CountingTTLCache(TTLCache):
+    """
+    TTLCache that counts the entries it drops to stay within maxsize, the
+    least recently used first.
+    """
+
+    evictions = 0
+
+    def popitem(self) -> Any:
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+class MemoryBackend:
+    """
+    Per process cache, at most max_entries responses kept for ttl seconds.
+    Other workers do not see its invalidations, their entries expire after
+    the TTL.
+    """
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self, max_entries: int, ttl: int) -> None:
+        self._entries = CountingTTLCache(maxsize=max_entries, ttl=ttl)
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def store(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._entries[key] = value
+
+    def generations(self, tables: list[str]) -> list[int]:
+        return [self._generations.get(table, 0) for table in tables]
+
+    def bump(self, tables: set[str]) -> None:
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+    @property
+    def entries(self) -> Optional[int]:
+        return len(self._entries)
+
+    @property
+    def evictions(self) -> int:
+        return self._entries.evictions
+
+
+class RedisBackend:
+    """
+    Cache shared by all workers, generations are redis counters so a write
+    in one worker invalidates the responses cached by every worker. Entries
+    expire after ttl seconds; size is bounded by redis' maxmemory policy
+    (allkeys-lru). Its calls wait on the network, ResponseCache runs the
+    lookups in worker threads when called from the event loop.
+    """
+
+    name = "redis"
+    blocking = True
+    entries = None
+    evictions = 0
+
+    def __init__(self, url: str, ttl: int) -> None:
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package") from None
+        self._redis = redis.Redis.from_url(url)
+        self._ttl = ttl
+        self._prefix = f"{settings.PROJECT_NAME}:cache:"
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._redis.get(self._prefix + key)
+
+    def store(self, key: str, value: bytes) -> None:
+        self._redis.set(self._prefix + key, value, ex=self._ttl)
+
+    def generations(self, tables: list[str]) -> list[int]:
+        values = self._redis.mget([f"{self._prefix}generation:{table}" for table in tables])
+        return [int(value or 0) for value in values]
+
+    def bump(self, tables: set[str]) -> None:
+        pipeline = self._redis.pipeline()
+        for table in tables:
+            pipeline.incr(f"{self._prefix}generation:{table}")
+        pipeline.execute()
+
+
+class ResponseCache:
+    """
+    Serialized read responses keyed by path, query, user scope and the
+    generations of the tables they were read from.
+    """
+
+    def __init__(self, backend: Any, enabled: bool = True) -> None:
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def key(self, request: Request, user: Any, *models: type[SQLModel]) -> str:
+        # Scope by role, none of the cached responses depend on the user
+        scope = "superuser" if user.is_superuser else "user"
+        tables = [model.__tablename__ for model in models]
+        generations = await self._call(self.backend.generations, tables)
+        query = urlencode(sorted(request.query_params.multi_items()))
+        versions = ",".join(f"{table}={gen}" for table, gen in zip(tables, generations))
+        return f"{scope}:{request.url.path}?{query}:{versions}"
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        value = await self._call(self.backend.get, key) if self.enabled else None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        etag, body = value.split(b"\n", 1)
+        return CachedResponse(etag.decode() or None, body)
+
+    async def store(self, key: str, response: Response) -> None:
+        if self.enabled:
+            etag = response.headers.get("etag", "")
+            await self._call(self.backend.store, key, etag.encode() + b"\n" + response.body)
+
+    async def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.backend.blocking:
+            return await to_thread.run_sync(fn, *args)
+        return fn(*args)
+
+    def invalidate(self, *models: type[SQLModel]) -> None:
+        """
+        Drop the cached responses read from models, for writes made outside
+        the ORM (Core inserts).
+        """
+        self._bump({model.__tablename__ for model in models})
+
+    def _bump(self, tables: set[str]) -> None:
+        # Also synchronous when an AsyncSession commits on the event loop, so
+        # a read sent once the write returned never sees the old generation.
+        # With redis that holds the loop for one round trip per commit that
+        # wrote to a cached table, which are rare.
+        self.invalidations += len(tables)
+        self.backend.bump(tables)
+
+    def stats(self) -> CacheStatsPublic:
+        lookups = self.hits + self.misses
+        return CacheStatsPublic(
+            backend=self.backend.name,
+            enabled=self.enabled,
+            hits=self.hits,
+            misses=self.misses,
+            hit_ratio=self.hits / lookups if lookups else 0.0,
+            invalidations=self.invalidations,
+            evictions=self.backend.evictions,
+            entries=self.backend.entries,
+        )
+
+
+def _make_backend() -> Any:
+    if settings.CACHE_BACKEND == "redis":
+        return RedisBackend(settings.CACHE_REDIS_URL, settings.CACHE_TTL_SECONDS)
+    return MemoryBackend(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS)
+
+
+response_cache = ResponseCache(_make_backend(), enabled=settings.CACHE_ENABLED)
+
+
+@event.listens_for(ORMSession, "after_flush")
+def _collect_written_tables(session: ORMSession, flush_context: Any) -> None:
+    tables = {
+        type(obj).__tablename__
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, CACHED_MODELS)
+    }
+    if tables:
+        session.info.setdefault(_PENDING_KEY, set()).update(tables)
+
+
+@event.listens_for(ORMSession, "after_commit")
+def _invalidate_committed(session: ORMSession) -> None:
+    # API routes and SQLAdmin both write through ORM sessions
+    tables = session.info.pop(_PENDING_KEY, None)
+    if tables:
+        response_cache._bump(tables)
+
+
+@event.listens_for(ORMSession, "after_rollback")
+def _discard_rolled_back(session: ORMSession) -> None:
+    session.info.pop(_PENDING_KEY, None)
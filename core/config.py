@@ -10,6 +10,7 @@ from pydantic import (
     model_validator,
     computed_field,
 )
+from pydantic_core import MultiHostUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing_extensions import Self
 
@@ -50,17 +51,137 @@ class Settings(BaseSettings):
     PROJECT_NAME: str
     SENTRY_DSN: HttpUrl | None = None
     
+    # Database backend, SQLite stays the default for local setups
+    DATABASE_BACKEND: Literal["sqlite", "postgresql"] = "sqlite"
+
     # SQLite settings
     SQLITE_DB_NAME: str = "sql_app.db"
 
+    # PostgreSQL settings, only used when DATABASE_BACKEND is "postgresql"
+    POSTGRES_SERVER: str = "localhost"
+    POSTGRES_PORT: int = 5432
+    POSTGRES_USER: str = "postgres"
+    POSTGRES_PASSWORD: str = ""
+    POSTGRES_DB: str = "qrsys"
+
+    # Connection pool settings (QueuePool, client/server backends only)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    # Recycle connections before server-side idle timeouts drop them
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Per-statement timeout on PostgreSQL, lock wait timeout on SQLite
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+
     @computed_field  # type: ignore[prop-decorator]
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
+        if self.DATABASE_BACKEND == "postgresql":
+            return str(
+                MultiHostUrl.build(
+                    scheme="postgresql+psycopg",
+                    username=self.POSTGRES_USER,
+                    password=self.POSTGRES_PASSWORD,
+                    host=self.POSTGRES_SERVER,
+                    port=self.POSTGRES_PORT,
+                    path=self.POSTGRES_DB,
+                )
+            )
         # Get the absolute path to the project directory
         base_dir = Path(__file__).resolve().parent.parent
         db_path = base_dir / self.SQLITE_DB_NAME
         return f"sqlite:///{db_path}"
 
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def SQLALCHEMY_ASYNC_DATABASE_URI(self) -> str:
+        # Same database as SQLALCHEMY_DATABASE_URI through an asyncio driver
+        if self.DATABASE_BACKEND == "postgresql":
+            return self.SQLALCHEMY_DATABASE_URI.replace(
+                "postgresql+psycopg://", "postgresql+asyncpg://", 1
+            )
+        return self.SQLALCHEMY_DATABASE_URI.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+    # Audit history written in batches by a background writer
+    AUDIT_HISTORY_ENABLED: bool = True
+    HISTORY_FLUSH_INTERVAL_SECONDS: float = 1.0
+    HISTORY_FLUSH_BATCH_SIZE: int = 500
+    # A failed batch is retried HISTORY_WRITE_ATTEMPTS times in total, waiting
+    # HISTORY_WRITE_BACKOFF_SECONDS doubled after each failure, then written
+    # to HISTORY_DEAD_LETTER_FILE as JSON lines
+    HISTORY_WRITE_ATTEMPTS: int = 5
+    HISTORY_WRITE_BACKOFF_SECONDS: float = 0.5
+    HISTORY_DEAD_LETTER_FILE: str = "archive/history-dead-letter.jsonl"
+    # Months of history kept in the history table, older months are moved
+    # to compressed monthly archive files
+    HISTORY_RETENTION_MONTHS: int = 12
+    HISTORY_ARCHIVE_DIR: str = "archive/history"
+
+    # Rows accepted by one bulk create/update request, written in one
+    # transaction
+    BULK_MAX_ROWS: int = 1000
+
+    # CSV imports are committed every IMPORT_CHUNK_SIZE rows, uploads and
+    # error files are kept in IMPORT_DIR
+    IMPORT_CHUNK_SIZE: int = 500
+    IMPORT_DIR: str = "imports"
+
+    # Online SQLite backups copy BACKUP_PAGES_PER_STEP pages at a time and
+    # pause in between; the database is switched to WAL mode so writers are
+    # not blocked and do not restart them
+    BACKUP_DIR: str = "backups"
+    BACKUP_PAGES_PER_STEP: int = 256
+    BACKUP_STEP_SLEEP_SECONDS: float = 0.05
+
+    # Row count changes are spread over ROW_COUNT_SHARDS rows per count so
+    # concurrent writers rarely update the same row; cached counts are
+    # checked against count(*) every COUNT_RECONCILE_INTERVAL_SECONDS
+    ROW_COUNT_SHARDS: int = 8
+    COUNT_RECONCILE_INTERVAL_SECONDS: int = 3600
+
+    # Closed collection report buckets are rolled up on startup and then
+    # every ROLLUP_REFRESH_INTERVAL_SECONDS, later ones are computed live
+    ROLLUP_REFRESH_INTERVAL_SECONDS: int = 900
+
+    # Response cache of reference data reads (apartments, payment and
+    # history types). Use the redis backend with several workers so a write
+    # invalidates the responses cached by all of them.
+    CACHE_ENABLED: bool = True
+    CACHE_BACKEND: Literal["memory", "redis"] = "memory"
+    CACHE_TTL_SECONDS: int = 300
+    CACHE_MAX_ENTRIES: int = 1024
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+
+    # /sync cursors lag SYNC_CURSOR_LAG_SECONDS behind the sync so rows
+    # committed shortly after being stamped are not missed, they are sent
+    # again by the next sync. Deletes are kept for the retention period.
+    SYNC_CURSOR_LAG_SECONDS: int = 5
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 90
+
+    # Live events (/events/), a connection more than EVENTS_QUEUE_SIZE
+    # events behind is dropped and has to reconnect
+    EVENTS_QUEUE_SIZE: int = 100
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    EVENTS_MAX_CONNECTIONS: int = 500
+
+    # Authenticated users are cached for up to USER_CACHE_TTL_SECONDS, the
+    # longest another worker may use a user after it was changed (0 disables)
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 1024
+
+    # bcrypt runs on PASSWORD_HASH_WORKERS dedicated processes (or threads),
+    # requests waiting longer than PASSWORD_HASH_TIMEOUT_SECONDS get a 503.
+    # Raising the rounds rehashes stored passwords on the next login.
+    PASSWORD_HASH_EXECUTOR: Literal["process", "thread"] = "process"
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = 10.0
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+
+    # Admin sessions recheck their user in the database at most this often,
+    # and right away after the user was changed in the same process
+    ADMIN_SESSION_REVALIDATE_SECONDS: int = 60
+
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
     SMTP_PORT: int = 587
@@ -102,6 +223,8 @@ class Settings(BaseSettings):
     def _enforce_non_default_secrets(self) -> Self:
         self._check_default_secret("SECRET_KEY", self.SECRET_KEY)
         self._check_default_secret("FIRST_SUPERUSER_PASSWORD", self.FIRST_SUPERUSER_PASSWORD)
+        if self.DATABASE_BACKEND == "postgresql":
+            self._check_default_secret("POSTGRES_PASSWORD", self.POSTGRES_PASSWORD)
 
         return self
 
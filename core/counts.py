@@ -0,0 +1,209 @@
+import logging
+import random
+from collections import Counter
+from typing import Any
+
+from sqlalchemy import Connection, Engine, delete, event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session as ORMSession
+from sqlmodel import Session, SQLModel, func, select
+
+from core.config import settings
+from models import (
+    ApartmentInfo,
+    ClientInfo,
+    History,
+    HistoryType,
+    Item,
+    Payment,
+    PaymentType,
+    RowCount,
+    RowCountDelta,
+    User,
+)
+
+logger = logging.getLogger(__name__)
+
+# Tables whose row counts are cached, with the columns that paginated
+# lists filter on (a count is cached per value of those columns)
+COUNTED_MODELS: dict[type[SQLModel], tuple[str, ...]] = {
+    User: (),
+    Item: ("owner_id",),
+    ApartmentInfo: (),
+    ClientInfo: (),
+    PaymentType: (),
+    Payment: (),
+    HistoryType: (),
+    History: (),
+}
+
+
+def count_key(model: type[SQLModel], **filters: Any) -> str:
+    key = model.__tablename__
+    for name, value in sorted(filters.items()):
+        key += f":{name}={value}"
+    return key
+
+
+def read_count(
+    session: Session, model: type[SQLModel], *, exact: bool = False, **filters: Any
+) -> tuple[int, bool]:
+    """
+    Number of rows of model matching filters (column == value), and whether
+    it was counted now rather than read from the row_count cache. Counting
+    and caching run on a connection of their own, the session is left as it
+    was.
+    """
+    key = count_key(model, **filters)
+    with session.get_bind().connect() as connection:
+        if not exact:
+            cached = connection.execute(
+                select(RowCount.count + _pending(key)).where(RowCount.key == key)
+            ).scalar_one_or_none()
+            if cached is not None:
+                return cached, False
+        count = _store_count(connection, key, model, filters)
+        connection.commit()
+    return count, True
+
+
+def reconcile_counts(engine: Engine) -> int:
+    """
+    Count every cached count again and correct the ones that drifted, e.g.
+    after rows were written outside the application. Returns the number of
+    corrected counts.
+    """
+    models = {model.__tablename__: model for model in COUNTED_MODELS}
+    corrected = 0
+    with engine.connect() as connection:
+        for key, cached in connection.execute(
+            select(RowCount.key, RowCount.count + _pending(RowCount.key))
+        ).all():
+            table, *conditions = key.split(":")
+            model = models.get(table)
+            if model is None:
+                continue
+            filters = dict(condition.split("=", 1) for condition in conditions)
+            if _store_count(connection, key, model, filters) != cached:
+                corrected += 1
+                logger.warning(f"Corrected drifted row count {key}")
+            connection.commit()
+    return corrected
+
+
+def adjust_count(
+    connection: Connection, model: type[SQLModel], delta: int, **filters: Any
+) -> None:
+    """
+    Apply a row count change made outside the ORM (Core inserts/deletes) to
+    the count of model and to its count per filter value, e.g. the rows
+    deleted for one owner_id.
+    """
+    deltas = Counter({count_key(model): delta})
+    for name, value in filters.items():
+        deltas[count_key(model, **{name: value})] += delta
+    _apply(connection, deltas)
+
+
+def reset_counts(session: Session) -> None:
+    """
+    Drop all cached counts, they are counted again on first use.
+    """
+    session.exec(delete(RowCount))  # type: ignore
+    session.exec(delete(RowCountDelta))  # type: ignore
+    session.commit()
+
+
+def _pending(key: Any) -> Any:
+    # Sum of the deltas of key, added to its cached count
+    return (
+        select(func.coalesce(func.sum(RowCountDelta.delta), 0))
+        .where(RowCountDelta.key == key)
+        .scalar_subquery()
+    )
+
+
+def _insert(connection: Connection) -> Any:
+    return postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+
+
+def _store_count(
+    connection: Connection, key: str, model: type[SQLModel], filters: dict[str, Any]
+) -> int:
+    """
+    Count model and cache the count of key as the difference to its deltas.
+    Both are read by one statement, so they see the same committed rows;
+    writes that were not committed yet add their deltas once they are, so
+    the cached count stays right.
+    """
+    statement = select(func.count()).select_from(model)
+    for name, value in filters.items():
+        statement = statement.where(getattr(model, name) == value)
+    count, pending = connection.execute(
+        select(statement.scalar_subquery(), _pending(key))
+    ).one()
+    insert = _insert(connection)
+    connection.execute(
+        insert(RowCount.__table__)
+        .values(key=key, count=count - pending)
+        .on_conflict_do_update(index_elements=["key"], set_={"count": count - pending})
+    )
+    return count
+
+
+def _apply(connection: Connection, deltas: Counter[str]) -> None:
+    # One random shard per flush, sorted keys keep the row lock order the
+    # same for every writer
+    shard = random.randrange(settings.ROW_COUNT_SHARDS)
+    rows = [
+        {"key": key, "shard": shard, "delta": delta}
+        for key, delta in sorted(deltas.items())
+        if delta
+    ]
+    if rows:
+        statement = _insert(connection)(RowCountDelta.__table__)
+        connection.execute(
+            statement.on_conflict_do_update(
+                index_elements=["key", "shard"],
+                set_={"delta": RowCountDelta.delta + statement.excluded.delta},
+            ),
+            rows,
+        )
+
+
+def _keys(obj: Any, columns: tuple[str, ...]) -> list[str]:
+    model = type(obj)
+    return [
+        count_key(model),
+        *(count_key(model, **{name: getattr(obj, name)}) for name in columns),
+    ]
+
+
+@event.listens_for(ORMSession, "after_flush")
+def _count_after_flush(session: ORMSession, flush_context: Any) -> None:
+    deltas: Counter[str] = Counter()
+    for obj in session.new:
+        columns = COUNTED_MODELS.get(type(obj))
+        if columns is not None:
+            for key in _keys(obj, columns):
+                deltas[key] += 1
+    for obj in session.deleted:
+        columns = COUNTED_MODELS.get(type(obj))
+        if columns is not None:
+            for key in _keys(obj, columns):
+                deltas[key] -= 1
+    for obj in session.dirty:
+        columns = COUNTED_MODELS.get(type(obj))
+        if not columns:
+            continue
+        # Rows moving between filter values, e.g. an item changing owner
+        state = inspect(obj)
+        for name in columns:
+            history = state.attrs[name].history
+            if history.has_changes():
+                for value in history.deleted:
+                    deltas[count_key(type(obj), **{name: value})] -= 1
+                for value in history.added:
+                    deltas[count_key(type(obj), **{name: value})] += 1
+    if deltas:
+        _apply(session.connection(), deltas)
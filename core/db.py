@@ -1,13 +1,58 @@
+from typing import Any
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.schema import CreateColumn
 from sqlmodel import Session, create_engine, select, SQLModel
 
 import crud
+# cache, events, user_cache and versions register their session listeners
+from core import cache, counts, events, user_cache, versions  # noqa: F401
 from core.config import settings
 from models import User, UserCreate
 
-# Create SQLite engine with check_same_thread=False to allow multi-threading
-engine = create_engine(
-    str(settings.SQLALCHEMY_DATABASE_URI), 
-    connect_args={"check_same_thread": False}
+
+def get_engine_options(*, is_async: bool = False) -> dict[str, Any]:
+    """
+    Engine keyword arguments for the configured database backend.
+    """
+    if settings.DATABASE_BACKEND == "postgresql":
+        options: dict[str, Any] = {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        }
+        if is_async:
+            # asyncpg takes server settings directly, the async engine
+            # already defaults to an asyncio-aware QueuePool
+            options["connect_args"] = {
+                "server_settings": {
+                    "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)
+                }
+            }
+        else:
+            options["poolclass"] = QueuePool
+            options["connect_args"] = {
+                "options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+            }
+        return options
+    # SQLite: check_same_thread=False to allow multi-threading
+    return {
+        "connect_args": {
+            "check_same_thread": False,
+            "timeout": settings.DB_STATEMENT_TIMEOUT_MS / 1000,
+        }
+    }
+
+
+engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI), **get_engine_options())
+
+# Async engine on the same database, used by the non-blocking read routes
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_ASYNC_DATABASE_URI), **get_engine_options(is_async=True)
 )
 
 
@@ -16,9 +61,49 @@ engine = create_engine(
 # for more details: https://github.com/fastapi/full-stack-fastapi-template/issues/28
 
 
+def create_missing_indexes() -> None:
+    # create_all only creates indexes together with new tables, so indexes
+    # added to existing tables are created here
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def add_missing_columns() -> None:
+    # create_all does not alter existing tables, so columns added to a model
+    # later are added here. They must be nullable or have a server default.
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    definition = CreateColumn(column).compile(dialect=engine.dialect)
+                    connection.execute(
+                        text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {definition}")
+                    )
+
+
+def enable_wal() -> None:
+    # Readers and online backups (backup.py) run alongside writers in WAL
+    # mode. The mode is stored in the database file.
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+
 def init_db(session: Session) -> None:
+    enable_wal()
     # Create tables directly with SQLModel
     SQLModel.metadata.create_all(engine)
+    add_missing_columns()
+    create_missing_indexes()
+    # Counts cached by a previous run may miss changes made while it was down
+    counts.reset_counts(session)
+    versions.prune_tombstones(session)
 
     user = session.exec(
         select(User).where(User.email == settings.FIRST_SUPERUSER)
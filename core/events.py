@@ -0,0 +1,167 @@
+import asyncio
+import threading
+from collections import Counter
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as ORMSession
+from sqlmodel import SQLModel
+
+from core.config import settings
+from models import (
+    ApartmentInfo,
+    ApartmentInfoPublic,
+    ClientInfo,
+    ClientInfoPublic,
+    EventStatsPublic,
+    Payment,
+    PaymentPublic,
+)
+
+# Models whose committed writes are published, by topic
+EVENT_TOPICS: dict[str, tuple[type[SQLModel], type[SQLModel]]] = {
+    "payments": (Payment, PaymentPublic),
+    "clients": (ClientInfo, ClientInfoPublic),
+    "apartments": (ApartmentInfo, ApartmentInfoPublic),
+}
+
+# Put on a subscription's queue in place of the events it could not take
+OVERFLOW = object()
+
+_TOPIC_BY_MODEL = {model: topic for topic, (model, _) in EVENT_TOPICS.items()}
+_PENDING_KEY = "events_pending"
+
+
+class Subscription:
+    """
+    Bounded queue of events for one connection. A consumer that falls
+    queue_size events behind is sent OVERFLOW and dropped rather than
+    buffering without limit; it reconnects and reloads.
+    """
+
+    def __init__(self, topics: set[str], queue_size: int) -> None:
+        self.topics = topics
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def _deliver(self, events: list[dict[str, Any]]) -> None:
+        # Runs on the subscriber's event loop
+        for item in events:
+            if self.overflowed:
+                return
+            try:
+                self.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self.overflowed = True
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait(OVERFLOW)
+                event_bus.dropped += 1
+
+
+class EventBus:
+    """
+    In-process publish/subscribe of committed writes. Publishing does not
+    block: events are handed to each subscriber's event loop.
+    """
+
+    def __init__(self, queue_size: int) -> None:
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self._subscriptions: set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    def subscribe(self, topics: set[str]) -> Subscription:
+        subscription = Subscription(topics, self.queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def connections(self) -> int:
+        return len(self._subscriptions)
+
+    def publish(self, events: list[dict[str, Any]]) -> None:
+        """
+        Send events to the subscribers of their topics, from any thread.
+        """
+        with self._lock:
+            for item in events:
+                self._sequence += 1
+                item["seq"] = self._sequence
+            subscriptions = list(self._subscriptions)
+        self.published += len(events)
+        for subscription in subscriptions:
+            matching = [item for item in events if item["topic"] in subscription.topics]
+            if matching:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription._deliver, matching)
+                except RuntimeError:
+                    # The subscriber's loop was closed
+                    self.unsubscribe(subscription)
+
+    def stats(self) -> EventStatsPublic:
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        by_topic: Counter[str] = Counter()
+        for subscription in subscriptions:
+            by_topic.update(subscription.topics)
+        return EventStatsPublic(
+            connections=len(subscriptions),
+            connections_by_topic=dict(by_topic),
+            published=self.published,
+            dropped=self.dropped,
+        )
+
+
+event_bus = EventBus(settings.EVENTS_QUEUE_SIZE)
+
+
+def _event(obj: Any, action: str) -> Optional[dict[str, Any]]:
+    topic = _TOPIC_BY_MODEL.get(type(obj))
+    if topic is None:
+        return None
+    item: dict[str, Any] = {"topic": topic, "action": action, "id": obj.id}
+    if action != "deleted":
+        public_model = EVENT_TOPICS[topic][1]
+        item["data"] = {name: getattr(obj, name) for name in public_model.model_fields}
+    return item
+
+
+@event.listens_for(ORMSession, "after_flush")
+def _collect_events(session: ORMSession, flush_context: Any) -> None:
+    if not event_bus.connections:
+        return
+    # Values are read here, the objects are expired once committed
+    events = [
+        *(_event(obj, "created") for obj in session.new),
+        *(
+            _event(obj, "updated")
+            for obj in session.dirty
+            if type(obj) in _TOPIC_BY_MODEL
+            and session.is_modified(obj, include_collections=False)
+        ),
+        *(_event(obj, "deleted") for obj in session.deleted),
+    ]
+    events = [item for item in events if item is not None]
+    if events:
+        session.info.setdefault(_PENDING_KEY, []).extend(events)
+
+
+@event.listens_for(ORMSession, "after_commit")
+def _publish_committed(session: ORMSession) -> None:
+    events = session.info.pop(_PENDING_KEY, None)
+    if events:
+        event_bus.publish(events)
+
+
+@event.listens_for(ORMSession, "after_rollback")
+def _discard_rolled_back(session: ORMSession) -> None:
+    session.info.pop(_PENDING_KEY, None)
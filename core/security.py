@@ -1,17 +1,37 @@
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Callable, Optional
 
 import jwt
 from passlib.context import CryptContext
 
 from core.config import settings
+from models import PasswordHashStatsPublic
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Hashes with fewer rounds than bcrypt__rounds are replaced on the next login
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS
+)
 
 
 ALGORITHM = "HS256"
 
 
+class PasswordHasherBusy(Exception):
+    """
+    No password hashing worker became free within
+    PASSWORD_HASH_TIMEOUT_SECONDS.
+    """
+
+
 def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
     expire = datetime.now(timezone.utc) + expires_delta
     to_encode = {"exp": expire, "sub": str(subject)}
@@ -19,9 +39,167 @@ def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
     return encoded_jwt
 
 
+# Run in the hashing workers, they also return how long the hashing took
+def _hash(password: str) -> tuple[str, float]:
+    started = time.perf_counter()
+    return pwd_context.hash(password), time.perf_counter() - started
+
+
+def _verify_and_update(
+    plain_password: str, hashed_password: str
+) -> tuple[tuple[bool, Optional[str]], float]:
+    started = time.perf_counter()
+    result = pwd_context.verify_and_update(plain_password, hashed_password)
+    return result, time.perf_counter() - started
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated pool of PASSWORD_HASH_WORKERS processes (or
+    threads), so bursts of logins neither use up the request threadpool nor
+    block the event loop. Work that has not started within
+    PASSWORD_HASH_TIMEOUT_SECONDS is cancelled with PasswordHasherBusy.
+    """
+
+    def __init__(self, kind: str, workers: int, timeout: float) -> None:
+        self.kind = kind
+        self.workers = workers
+        self.timeout = timeout
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.operations = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.total_queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    # spawn, forking a process that runs threads is unsafe
+                    self._executor = ProcessPoolExecutor(
+                        self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix="password-hasher"
+                    )
+        return self._executor.submit(fn, *args)
+
+    def _record(self, name: str, started: float, hash_seconds: float) -> None:
+        elapsed = time.perf_counter() - started
+        queued = max(elapsed - hash_seconds, 0.0)
+        with self._lock:
+            self.operations += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            self.total_queue_seconds += queued
+            self.max_queue_seconds = max(self.max_queue_seconds, queued)
+        logger.debug(
+            f"Password {name}: {elapsed * 1000:.1f} ms, {queued * 1000:.1f} ms queued"
+        )
+
+    def _record_rehash(self) -> None:
+        with self._lock:
+            self.rehashed += 1
+
+    def _reject(self, future: Future) -> bool:
+        # Work that already started is waited for, it finishes shortly
+        if future.cancel():
+            with self._lock:
+                self.rejected += 1
+            return True
+        return False
+
+    def run(self, name: str, fn: Callable[..., Any], *args: Any) -> Any:
+        started = time.perf_counter()
+        future = self._submit(fn, *args)
+        try:
+            result, seconds = future.result(timeout=self.timeout)
+        except TimeoutError:
+            if self._reject(future):
+                raise PasswordHasherBusy()
+            result, seconds = future.result()
+        self._record(name, started, seconds)
+        return result
+
+    async def run_async(self, name: str, fn: Callable[..., Any], *args: Any) -> Any:
+        started = time.perf_counter()
+        future = self._submit(fn, *args)
+        waiter = asyncio.wrap_future(future)
+        try:
+            result, seconds = await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except asyncio.TimeoutError:
+            if self._reject(future):
+                raise PasswordHasherBusy()
+            result, seconds = await waiter
+        self._record(name, started, seconds)
+        return result
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    def stats(self) -> PasswordHashStatsPublic:
+        with self._lock:
+            operations = self.operations or 1
+            return PasswordHashStatsPublic(
+                executor=self.kind,
+                workers=self.workers,
+                operations=self.operations,
+                rejected=self.rejected,
+                rehashed=self.rehashed,
+                avg_ms=self.total_seconds / operations * 1000,
+                max_ms=self.max_seconds * 1000,
+                avg_queue_ms=self.total_queue_seconds / operations * 1000,
+                max_queue_ms=self.max_queue_seconds * 1000,
+            )
+
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_EXECUTOR,
+    settings.PASSWORD_HASH_WORKERS,
+    settings.PASSWORD_HASH_TIMEOUT_SECONDS,
+)
+atexit.register(password_hasher.shutdown)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.run("verify", _verify_and_update, plain_password, hashed_password)[0]
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """
+    Whether the password matches, and a new hash to store when the stored
+    one uses an outdated scheme or work factor.
+    """
+    result = password_hasher.run("verify", _verify_and_update, plain_password, hashed_password)
+    if result[1] is not None:
+        password_hasher._record_rehash()
+    return result
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    result = await password_hasher.run_async(
+        "verify", _verify_and_update, plain_password, hashed_password
+    )
+    if result[1] is not None:
+        password_hasher._record_rehash()
+    return result
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.run("hash", _hash, password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.run_async("hash", _hash, password)
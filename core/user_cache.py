@@ -0,0 +1,115 @@
+import threading
+import time
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as ORMSession
+
+from cachetools import TTLCache
+
+from core.cache import CountingTTLCache
+from core.config import settings
+from models import CacheStatsPublic, User
+
+_PENDING_KEY = "user_cache_invalidate"
+
+# Users changed within the admin revalidation interval, older changes are
+# caught by the periodic revalidation anyway
+MAX_CHANGED_USERS = 10_000
+
+
+class UserCache:
+    """
+    Column values of recently authenticated active users by id, so
+    get_current_user can skip the user lookup. Entries are dropped when a
+    commit changes or deletes the user, and live at most ttl seconds, which
+    bounds how long other worker processes can use a stale user.
+    """
+
+    def __init__(self, max_size: int, ttl: int) -> None:
+        self._entries = CountingTTLCache(maxsize=max_size, ttl=ttl)
+        self._lock = threading.Lock()
+        self.enabled = ttl > 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Moves on every invalidation, so a user read before a change is not
+        # stored after it
+        self.generation = 0
+        self._changed: TTLCache = TTLCache(
+            maxsize=MAX_CHANGED_USERS, ttl=settings.ADMIN_SESSION_REVALIDATE_SECONDS
+        )
+
+    def get(self, user_id: Optional[str]) -> Optional[dict[str, Any]]:
+        with self._lock:
+            values = self._entries.get(user_id)
+        if values is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return values
+
+    def store(self, user: User, generation: int) -> None:
+        if not self.enabled or not user.is_active:
+            return
+        values = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        with self._lock:
+            if generation == self.generation:
+                self._entries[user.id] = values
+
+    def invalidate(self, user_ids: set[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self.generation += 1
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+                self._changed[user_id] = now
+        self.invalidations += len(user_ids)
+
+    def changed_at(self, user_id: str) -> Optional[float]:
+        """
+        When this process last committed a change to the user, if that was
+        within ADMIN_SESSION_REVALIDATE_SECONDS.
+        """
+        with self._lock:
+            return self._changed.get(user_id)
+
+    def stats(self) -> CacheStatsPublic:
+        lookups = self.hits + self.misses
+        return CacheStatsPublic(
+            backend="memory",
+            enabled=self.enabled,
+            hits=self.hits,
+            misses=self.misses,
+            hit_ratio=self.hits / lookups if lookups else 0.0,
+            invalidations=self.invalidations,
+            evictions=self._entries.evictions,
+            entries=len(self._entries),
+        )
+
+
+user_cache = UserCache(settings.USER_CACHE_MAX_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(ORMSession, "after_flush")
+def _collect_changed_users(session: ORMSession, flush_context: Any) -> None:
+    # The users routes and SQLAdmin's UserAdmin all write through the ORM
+    user_ids = {
+        obj.id
+        for obj in (*session.dirty, *session.deleted)
+        if isinstance(obj, User)
+    }
+    if user_ids:
+        session.info.setdefault(_PENDING_KEY, set()).update(user_ids)
+
+
+@event.listens_for(ORMSession, "after_commit")
+def _invalidate_committed(session: ORMSession) -> None:
+    user_ids = session.info.pop(_PENDING_KEY, None)
+    if user_ids:
+        user_cache.invalidate(user_ids)
+
+
+@event.listens_for(ORMSession, "after_rollback")
+def _discard_rolled_back(session: ORMSession) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import delete, event, insert
+from sqlalchemy.orm import Session as ORMSession
+from sqlmodel import Session
+
+from core.config import settings
+from models import ApartmentInfo, ClientInfo, Payment, SyncTombstone
+
+# Models with a version counter and updated_at timestamp, used for ETags and
+# /sync. Deleting one of them leaves a tombstone.
+VERSIONED_MODELS = (ApartmentInfo, ClientInfo, Payment)
+
+
+def prune_tombstones(session: Session) -> None:
+    """
+    Drop tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS, clients with
+    an older cursor have to sync everything again.
+    """
+    cutoff = datetime.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    session.exec(delete(SyncTombstone).where(SyncTombstone.deleted_at < cutoff))  # type: ignore
+    session.commit()
+
+
+@event.listens_for(ORMSession, "before_flush")
+def _stamp_versions(session: ORMSession, flush_context: Any, instances: Any) -> None:
+    # Every ORM write path (API routes, bulk endpoints, imports, SQLAdmin)
+    # goes through the flush, so versions cannot be missed
+    now = datetime.now()
+    for obj in session.new:
+        if isinstance(obj, VERSIONED_MODELS):
+            obj.version = 1
+            obj.updated_at = now
+    for obj in session.dirty:
+        if isinstance(obj, VERSIONED_MODELS) and session.is_modified(
+            obj, include_collections=False
+        ):
+            obj.version = (obj.version or 0) + 1
+            obj.updated_at = now
+
+
+@event.listens_for(ORMSession, "after_flush")
+def _record_tombstones(session: ORMSession, flush_context: Any) -> None:
+    now = datetime.now()
+    tombstones = [
+        {"table_name": type(obj).__tablename__, "row_id": obj.id, "deleted_at": now}
+        for obj in session.deleted
+        if isinstance(obj, VERSIONED_MODELS)
+    ]
+    if tombstones:
+        session.connection().execute(insert(SyncTombstone.__table__), tombstones)
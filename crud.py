@@ -1,10 +1,30 @@
 import uuid
-from typing import Any, Optional
+from collections import defaultdict
+from typing import Any, Callable, Optional
 
-from sqlmodel import Session, select
+from pydantic import ValidationError
+from sqlalchemy import UniqueConstraint
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from core.security import get_password_hash, verify_password
-from models import Item, ItemCreate, User, UserCreate, UserUpdate
+from core.security import (
+    get_password_hash,
+    verify_and_update_password,
+    verify_and_update_password_async,
+)
+from models import (
+    BulkRowError,
+    BulkWriteResult,
+    Item,
+    ItemCreate,
+    User,
+    UserCreate,
+    UserUpdate,
+)
+
+# Keeps IN (...) lists below SQLite's bound parameter limit
+IN_CHUNK_SIZE = 500
 
 
 def create_user(*, session: Session, user_create: UserCreate) -> User:
@@ -41,8 +61,35 @@ def authenticate(*, session: Session, email: str, password: str) -> Optional[Use
     db_user = get_user_by_email(session=session, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.hashed_password):
+    verified, new_hash = verify_and_update_password(password, db_user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        # Stored with an outdated work factor
+        db_user.hashed_password = new_hash
+        session.add(db_user)
+        session.commit()
+        session.refresh(db_user)
+    return db_user
+
+
+async def authenticate_async(
+    *, session: AsyncSession, email: str, password: str
+) -> Optional[User]:
+    db_user = (await session.exec(select(User).where(User.email == email))).first()
+    if not db_user:
+        return None
+    verified, new_hash = await verify_and_update_password_async(
+        password, db_user.hashed_password
+    )
+    if not verified:
+        return None
+    if new_hash:
+        # Stored with an outdated work factor
+        db_user.hashed_password = new_hash
+        session.add(db_user)
+        await session.commit()
+        await session.refresh(db_user)
     return db_user
 
 
@@ -52,3 +99,275 @@ def create_item(*, session: Session, item_in: ItemCreate, owner_id: uuid.UUID) -
     session.commit()
     session.refresh(db_item)
     return db_item
+
+
+def chunks(values: list[Any], size: int = IN_CHUNK_SIZE) -> list[list[Any]]:
+    return [values[start : start + size] for start in range(0, len(values), size)]
+
+
+def _validation_errors(error: ValidationError) -> list[dict[str, Any]]:
+    return error.errors(include_url=False, include_context=False, include_input=False)
+
+
+def get_foreign_key_errors(
+    *, session: Session, model: type[SQLModel], rows: dict[int, dict[str, Any]]
+) -> dict[int, list[dict[str, Any]]]:
+    """
+    Check the foreign keys of many rows with one IN query per referenced
+    table and return the errors per row index.
+    """
+    errors: dict[int, list[dict[str, Any]]] = defaultdict(list)
+    for foreign_key in model.__table__.foreign_keys:
+        name = foreign_key.parent.name
+        target = foreign_key.column
+        values = list({row[name] for row in rows.values() if row.get(name) is not None})
+        existing = set()
+        for chunk in chunks(values):
+            existing.update(session.exec(select(target).where(target.in_(chunk))).all())
+        for index, row in rows.items():
+            value = row.get(name)
+            if value is not None and value not in existing:
+                errors[index].append(
+                    {
+                        "loc": [name],
+                        "msg": f"{target.table.name} {value} does not exist",
+                        "type": "foreign_key",
+                    }
+                )
+    return errors
+
+
+def unique_columns(model: type[SQLModel]) -> list[str]:
+    """
+    Columns of model with a single column unique constraint or index.
+    """
+    table = model.__table__
+    names = {column.name for column in table.columns if column.unique}
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint) and len(constraint.columns) == 1:
+            names.update(column.name for column in constraint.columns)
+    for index in table.indexes:
+        if index.unique and len(index.columns) == 1:
+            names.update(column.name for column in index.columns)
+    return sorted(names)
+
+
+def get_unique_errors(
+    *,
+    session: Session,
+    model: type[SQLModel],
+    rows: dict[int, dict[str, Any]],
+    ids: Optional[dict[int, int]] = None,
+) -> dict[int, list[dict[str, Any]]]:
+    """
+    Check the unique columns of many rows, against the other rows of the
+    batch and with one IN query per column against the table, and return
+    the errors per row index. ids maps the rows that update an existing row
+    to its id, that row may keep its own value.
+    """
+    errors: dict[int, list[dict[str, Any]]] = defaultdict(list)
+    ids = ids or {}
+    for name in unique_columns(model):
+        column = getattr(model, name)
+        first: dict[Any, int] = {}
+        for index, row in rows.items():
+            value = row.get(name)
+            if value is None:
+                continue
+            if value in first:
+                errors[index].append(
+                    {
+                        "loc": [name],
+                        "msg": f"{name} {value} is repeated from row {first[value]}",
+                        "type": "unique",
+                    }
+                )
+            else:
+                first[value] = index
+        existing: dict[Any, int] = {}
+        for chunk in chunks(list(first)):
+            existing.update(
+                session.exec(select(column, model.id).where(column.in_(chunk))).all()
+            )
+        for value, index in first.items():
+            if value in existing and existing[value] != ids.get(index):
+                errors[index].append(
+                    {
+                        "loc": [name],
+                        "msg": f"{model.__tablename__} with {name} {value} already exists",
+                        "type": "unique",
+                    }
+                )
+    return errors
+
+
+def _write_rows(
+    *,
+    session: Session,
+    write: Callable[[int], SQLModel],
+    indexes: list[int],
+    errors: dict[int, list[dict[str, Any]]],
+    atomic: bool,
+) -> dict[int, int]:
+    """
+    Write the rows in one flush and commit, and return their ids by index.
+    A constraint violation the checks missed (e.g. a concurrent insert of
+    the same unique value) rolls the batch back; the rows are then written
+    again in one savepoint each, so only the offending rows are rejected.
+    """
+    try:
+        objects = {index: write(index) for index in indexes}
+        session.flush()
+        ids = {index: obj.id for index, obj in objects.items()}
+        session.commit()
+        return ids
+    except IntegrityError:
+        session.rollback()
+
+    connection = session.connection()
+    dbapi_connection = connection.connection.dbapi_connection
+    if connection.dialect.name == "sqlite" and not dbapi_connection.in_transaction:
+        # pysqlite only begins before DML, a SAVEPOINT sent first would open
+        # the transaction itself and releasing it would commit the row
+        connection.exec_driver_sql("BEGIN")
+    ids = {}
+    rejected = False
+    for index in indexes:
+        try:
+            with session.begin_nested():
+                obj = write(index)
+            ids[index] = obj.id
+        except IntegrityError as e:
+            errors[index] = [{"loc": [], "msg": str(e.orig), "type": "integrity"}]
+            rejected = True
+    if atomic and rejected:
+        session.rollback()
+        return {}
+    session.commit()
+    return ids
+
+
+def bulk_create(
+    *,
+    session: Session,
+    model: type[SQLModel],
+    create_model: type[SQLModel],
+    rows: list[dict[str, Any]],
+    atomic: bool = False,
+) -> BulkWriteResult:
+    """
+    Validate and insert many rows in one transaction. The unit of work sends
+    them as one batched INSERT per table. Invalid rows, including foreign
+    keys that do not exist and repeated unique values, are reported per
+    index and skipped, or reject the whole batch when atomic is set.
+    """
+    ids: list[Optional[int]] = [None] * len(rows)
+    errors: dict[int, list[dict[str, Any]]] = {}
+    valid: dict[int, dict[str, Any]] = {}
+    for index, row in enumerate(rows):
+        try:
+            valid[index] = create_model.model_validate(row).model_dump()
+        except ValidationError as e:
+            errors[index] = _validation_errors(e)
+    for index, row_errors in get_foreign_key_errors(
+        session=session, model=model, rows=valid
+    ).items():
+        errors[index] = row_errors
+        del valid[index]
+
+    for index, row_errors in get_unique_errors(
+        session=session, model=model, rows=valid
+    ).items():
+        errors[index] = row_errors
+        del valid[index]
+
+    if valid and not (atomic and errors):
+
+        def write(index: int) -> SQLModel:
+            obj = model.model_validate(valid[index])
+            session.add(obj)
+            return obj
+
+        for index, id in _write_rows(
+            session=session, write=write, indexes=list(valid), errors=errors, atomic=atomic
+        ).items():
+            ids[index] = id
+    return BulkWriteResult(
+        ids=ids,
+        errors=[BulkRowError(index=index, errors=errors[index]) for index in sorted(errors)],
+    )
+
+
+def bulk_update(
+    *,
+    session: Session,
+    model: type[SQLModel],
+    update_model: type[SQLModel],
+    rows: list[dict[str, Any]],
+    atomic: bool = False,
+) -> BulkWriteResult:
+    """
+    Apply partial updates to many rows, each identified by its "id", in one
+    transaction. Rows are loaded with one IN query and checked like in
+    bulk_create.
+    """
+    ids: list[Optional[int]] = [None] * len(rows)
+    errors: dict[int, list[dict[str, Any]]] = {}
+    valid: dict[int, tuple[int, dict[str, Any]]] = {}
+    for index, row in enumerate(rows):
+        if not isinstance(row.get("id"), int):
+            errors[index] = [{"loc": ["id"], "msg": "Field required", "type": "missing"}]
+            continue
+        try:
+            data = update_model.model_validate(row).model_dump(exclude_unset=True)
+        except ValidationError as e:
+            errors[index] = _validation_errors(e)
+            continue
+        valid[index] = (row["id"], data)
+
+    existing = {}
+    for chunk in chunks(list({id for id, _ in valid.values()})):
+        existing.update(
+            (obj.id, obj) for obj in session.exec(select(model).where(model.id.in_(chunk)))
+        )
+    for index, (id, _) in list(valid.items()):
+        if id not in existing:
+            errors[index] = [
+                {
+                    "loc": ["id"],
+                    "msg": f"{model.__tablename__} {id} does not exist",
+                    "type": "not_found",
+                }
+            ]
+            del valid[index]
+    for index, row_errors in get_foreign_key_errors(
+        session=session, model=model, rows={index: data for index, (_, data) in valid.items()}
+    ).items():
+        errors[index] = row_errors
+        del valid[index]
+    for index, row_errors in get_unique_errors(
+        session=session,
+        model=model,
+        rows={index: data for index, (_, data) in valid.items()},
+        ids={index: id for index, (id, _) in valid.items()},
+    ).items():
+        errors[index] = row_errors
+        del valid[index]
+
+    if valid and not (atomic and errors):
+
+        def write(index: int) -> SQLModel:
+            id, data = valid[index]
+            obj = existing[id]
+            obj.sqlmodel_update(data)
+            session.add(obj)
+            return obj
+
+        for index, id in _write_rows(
+            session=session, write=write, indexes=list(valid), errors=errors, atomic=atomic
+        ).items():
+            ids[index] = id
+    return BulkWriteResult(
+        ids=ids,
+        errors=[BulkRowError(index=index, errors=errors[index]) for index in sorted(errors)],
+    )
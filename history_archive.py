@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import os
+from collections.abc import Iterator
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Any, Optional
+
+from sqlmodel import Session, delete, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from core.counts import adjust_count
+from models import History, HistoryArchive, HistoryPublic
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def archive_dir() -> Path:
+    path = Path(settings.HISTORY_ARCHIVE_DIR)
+    return path if path.is_absolute() else BASE_DIR / path
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _at(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def _iter_file(path: Path) -> Iterator[dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            row["datetime"] = datetime.fromisoformat(row["datetime"])
+            yield row
+
+
+def _write_file(path: Path, rows: list[dict[str, Any]]) -> str:
+    """
+    Write rows as gzipped JSON lines and return the file's sha256.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps({**row, "datetime": row["datetime"].isoformat()}) + "\n")
+    os.replace(tmp_path, path)
+    return file_sha256(path)
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def archive_month(session: Session, month: date) -> Optional[HistoryArchive]:
+    """
+    Move the history entries of one month from the history table into the
+    month's archive file.
+    """
+    statement = (
+        select(History)
+        .where(History.datetime >= _at(month), History.datetime < _at(next_month(month)))
+        .order_by(History.datetime, History.id)
+    )
+    rows = [
+        history.model_dump(include={"id", "type_id", "entity_id", "datetime"})
+        for history in session.exec(statement)
+    ]
+    if not rows:
+        return None
+    archive = session.get(HistoryArchive, month)
+    path = archive_dir() / f"history-{month:%Y-%m}.jsonl.gz"
+    if archive:
+        # Entries added for an already archived month are merged into its file
+        rows = sorted(
+            [*_iter_file(archive_dir() / archive.path), *rows],
+            key=lambda row: (row["datetime"], row["id"]),
+        )
+    else:
+        archive = HistoryArchive(
+            month=month, path=path.name, row_count=0, sha256="", archived_at=datetime.now()
+        )
+    archive.sha256 = _write_file(path, rows)
+    archive.row_count = len(rows)
+    archive.archived_at = datetime.now()
+    session.add(archive)
+    result = session.exec(  # type: ignore
+        delete(History).where(
+            History.datetime >= _at(month), History.datetime < _at(next_month(month))
+        )
+    )
+    adjust_count(session.connection(), History, -result.rowcount)
+    session.commit()
+    logger.info(f"Archived {len(rows)} history entries for {month:%Y-%m}")
+    return archive
+
+
+def archive_history(
+    session: Session, retention_months: int, today: Optional[date] = None
+) -> list[HistoryArchive]:
+    """
+    Archive every month that ended more than retention_months ago.
+    """
+    cutoff = add_months(month_start(today or date.today()), -retention_months)
+    oldest = session.exec(
+        select(func.min(History.datetime)).where(History.datetime < _at(cutoff))
+    ).one()
+    archives = []
+    month = month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        archive = archive_month(session, month)
+        if archive:
+            archives.append(archive)
+        month = next_month(month)
+    return archives
+
+
+def verify_archives(session: Session) -> list[date]:
+    """
+    Return the months whose archive file is missing or does not match the
+    recorded checksum and row count.
+    """
+    broken = []
+    for archive in session.exec(select(HistoryArchive).order_by(HistoryArchive.month)):
+        path = archive_dir() / archive.path
+        if (
+            not path.exists()
+            or file_sha256(path) != archive.sha256
+            or sum(1 for _ in _iter_file(path)) != archive.row_count
+        ):
+            broken.append(archive.month)
+    return broken
+
+
+def _read_archives(
+    archives: list[HistoryArchive],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    type_id: Optional[int],
+    limit: int,
+) -> list[dict[str, Any]]:
+    rows: list[dict[str, Any]] = []
+    for archive in archives:
+        for row in _iter_file(archive_dir() / archive.path):
+            if start and row["datetime"] < start:
+                continue
+            if end and row["datetime"] >= end:
+                break
+            if type_id is not None and row["type_id"] != type_id:
+                continue
+            rows.append(row)
+            if len(rows) >= limit:
+                return rows
+    return rows
+
+
+async def read_history_range(
+    session: AsyncSession,
+    *,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    type_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> list[HistoryPublic]:
+    """
+    History entries in [start, end) ordered by datetime. Only the archive
+    months overlapping the range are read. The history table is always
+    read too, it may hold entries of archived months added since they were
+    archived.
+    """
+    statement = select(HistoryArchive).order_by(HistoryArchive.month)
+    if start:
+        statement = statement.where(HistoryArchive.month >= month_start(start.date()))
+    if end:
+        last_day = end.date() if end.time() != time.min else end.date() - timedelta(days=1)
+        statement = statement.where(HistoryArchive.month <= last_day)
+    archives = (await session.exec(statement)).all()
+    archived = await asyncio.to_thread(
+        _read_archives, list(archives), start, end, type_id, skip + limit
+    )
+
+    statement = select(History).order_by(History.datetime, History.id)
+    if start:
+        statement = statement.where(History.datetime >= start)
+    if end:
+        statement = statement.where(History.datetime < end)
+    if type_id is not None:
+        statement = statement.where(History.type_id == type_id)
+    hot = (await session.exec(statement.limit(skip + limit))).all()
+
+    # Both are sorted, the page is taken from their merge
+    entries = heapq.merge(
+        (HistoryPublic.model_validate(row) for row in archived),
+        (HistoryPublic.model_validate(history) for history in hot),
+        key=lambda entry: (entry.datetime, entry.id),
+    )
+    return list(islice(entries, skip, skip + limit))
+
+
+def main() -> None:
+    from core.db import engine
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Archive old history entries")
+    parser.add_argument("command", choices=["archive", "verify"])
+    parser.add_argument(
+        "--retention-months", type=int, default=settings.HISTORY_RETENTION_MONTHS
+    )
+    args = parser.parse_args()
+    HistoryArchive.__table__.create(engine, checkfirst=True)
+    with Session(engine) as session:
+        if args.command == "archive":
+            archives = archive_history(session, args.retention_months)
+            logger.info(f"Archived {len(archives)} months")
+            return
+        broken = verify_archives(session)
+        if broken:
+            logger.error(f"Broken history archives: {[f'{m:%Y-%m}' for m in broken]}")
+            raise SystemExit(1)
+        logger.info("History archives are intact")
+
+
+if __name__ == "__main__":
+    main()
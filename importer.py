@@ -0,0 +1,336 @@
+import argparse
+import csv
+import logging
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Literal, Optional, TextIO
+
+from sqlmodel import Session, SQLModel, delete, select
+
+import audit  # noqa: F401, registers the audit history listeners
+import balances  # noqa: F401, registers the client balance listener
+import crud
+import rollups  # noqa: F401, registers the rollup maintenance listener
+from core.config import settings
+from core.db import engine
+from models import (
+    ApartmentInfo,
+    ApartmentInfoCreate,
+    ClientInfo,
+    ClientInfoCreate,
+    ImportJob,
+    Payment,
+    PaymentCreate,
+    PaymentType,
+)
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent
+
+ImportKind = Literal["apartments", "clients", "payments"]
+
+IMPORT_MODELS: dict[str, tuple[type[SQLModel], type[SQLModel]]] = {
+    "apartments": (ApartmentInfo, ApartmentInfoCreate),
+    "clients": (ClientInfo, ClientInfoCreate),
+    "payments": (Payment, PaymentCreate),
+}
+
+# Only the most recent jobs are kept for progress and error file lookups
+MAX_JOBS = 100
+
+
+def import_dir() -> Path:
+    path = Path(settings.IMPORT_DIR)
+    return path if path.is_absolute() else BASE_DIR / path
+
+
+def new_job(kind: ImportKind) -> ImportJob:
+    job = ImportJob(id=uuid.uuid4().hex, kind=kind, started_at=datetime.now())
+    save_job(job)
+    with Session(engine) as session:
+        stale = select(ImportJob.id).order_by(ImportJob.started_at.desc()).offset(MAX_JOBS)
+        session.exec(delete(ImportJob).where(ImportJob.id.in_(stale)))  # type: ignore
+        session.commit()
+    return job
+
+
+def save_job(job: ImportJob) -> None:
+    """
+    Store the progress of a job, the job itself stays detached.
+    """
+    with Session(engine) as session:
+        session.merge(job)
+        session.commit()
+
+
+def get_job(job_id: str) -> Optional[ImportJob]:
+    with Session(engine) as session:
+        return session.get(ImportJob, job_id)
+
+
+def upload_path(job: ImportJob) -> Path:
+    return import_dir() / f"{job.id}.csv"
+
+
+def error_path(job: ImportJob) -> Path:
+    return import_dir() / f"{job.id}-errors.csv"
+
+
+def load_lookups(session: Session, kind: ImportKind) -> dict[str, dict[Any, int]]:
+    """
+    Natural keys that import files may use instead of ids, mapped to the
+    referenced row ids. Loaded once per import.
+    """
+    lookups: dict[str, dict[Any, int]] = {}
+    if kind == "clients":
+        statement = select(
+            ApartmentInfo.id, ApartmentInfo.building, ApartmentInfo.floor, ApartmentInfo.apt_no
+        )
+        lookups["apartments"] = {
+            (building, floor, apt_no): id
+            for id, building, floor, apt_no in session.exec(statement)
+        }
+    if kind == "payments":
+        lookups["clients"] = {
+            no: id for id, no in session.exec(select(ClientInfo.id, ClientInfo.no))
+        }
+        lookups["payment_types"] = {
+            name: id for id, name in session.exec(select(PaymentType.id, PaymentType.name))
+        }
+    return lookups
+
+
+def _clean(create_model: type[SQLModel], row: dict[Optional[str], Any]) -> dict[str, Any]:
+    # Empty cells fall back to the field's default, except for text fields
+    data = {}
+    for name, value in row.items():
+        if name is None or value is None:
+            continue
+        value = value.strip()
+        field = create_model.model_fields.get(name)
+        if value == "" and (field is None or field.annotation is not str):
+            continue
+        data[name] = value
+    return data
+
+
+def _lookup_error(loc: list[str], msg: str) -> dict[str, Any]:
+    return {"loc": loc, "msg": msg, "type": "lookup"}
+
+
+def _resolve(
+    kind: ImportKind, data: dict[str, Any], lookups: dict[str, dict[Any, int]]
+) -> list[dict[str, Any]]:
+    """
+    Replace natural keys by ids: building/floor/apt_no for clients,
+    client_no and payment_type (name) for payments.
+    """
+    errors = []
+    if kind == "clients" and "apt_id" not in data and "building" in data:
+        loc = ["building", "floor", "apt_no"]
+        try:
+            key = (data["building"], int(data.get("floor", "")), int(data.get("apt_no", "")))
+        except ValueError:
+            errors.append(_lookup_error(loc, "floor and apt_no must be integers"))
+        else:
+            if key in lookups["apartments"]:
+                data["apt_id"] = lookups["apartments"][key]
+            else:
+                errors.append(_lookup_error(loc, f"Apartment {key} does not exist"))
+    if kind == "payments" and "client_id" not in data and "client_no" in data:
+        try:
+            client_id = lookups["clients"].get(int(data["client_no"]))
+        except ValueError:
+            client_id = None
+        if client_id is None:
+            errors.append(
+                _lookup_error(["client_no"], f"Client {data['client_no']} does not exist")
+            )
+        else:
+            data["client_id"] = client_id
+    if kind == "payments" and "payment_type_id" not in data and "payment_type" in data:
+        payment_type_id = lookups["payment_types"].get(data["payment_type"])
+        if payment_type_id is None:
+            errors.append(
+                _lookup_error(
+                    ["payment_type"], f"Payment type {data['payment_type']} does not exist"
+                )
+            )
+        else:
+            data["payment_type_id"] = payment_type_id
+    return errors
+
+
+class ErrorFile:
+    """
+    CSV of the rejected rows: line number, errors and the original cells.
+    The file is only created once the first row is rejected.
+    """
+
+    def __init__(self, path: Optional[Path], fieldnames: list[str]) -> None:
+        self.path = path
+        self.fieldnames = fieldnames
+        self._file: Optional[TextIO] = None
+        self._writer: Any = None
+
+    def write(
+        self, line: int, row: dict[Optional[str], Any], errors: list[dict[str, Any]]
+    ) -> None:
+        if self.path is None:
+            return
+        if self._writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "w", encoding="utf-8", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["line", "errors", *self.fieldnames])
+        messages = "; ".join(
+            ": ".join(
+                part
+                for part in (".".join(str(loc) for loc in error["loc"]), error["msg"])
+                if part
+            )
+            for error in errors
+        )
+        self._writer.writerow(
+            [line, messages, *(row.get(name, "") for name in self.fieldnames)]
+        )
+
+    @property
+    def written(self) -> bool:
+        return self._writer is not None
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+
+
+def _insert_chunk(
+    session: Session, kind: ImportKind, rows: list[dict[str, Any]]
+) -> tuple[int, dict[int, list[dict[str, Any]]]]:
+    """
+    Insert a chunk in one transaction and return the number of created rows
+    and the errors per row index.
+    """
+    model, create_model = IMPORT_MODELS[kind]
+    result = crud.bulk_create(session=session, model=model, create_model=create_model, rows=rows)
+    return (
+        sum(1 for id in result.ids if id is not None),
+        {error.index: error.errors for error in result.errors},
+    )
+
+
+def run_import(
+    session: Session,
+    kind: ImportKind,
+    source: TextIO,
+    *,
+    chunk_size: int = settings.IMPORT_CHUNK_SIZE,
+    error_file_path: Optional[Path] = None,
+    job: Optional[ImportJob] = None,
+) -> ImportJob:
+    """
+    Import a CSV file chunk by chunk. Each chunk is validated, checked and
+    inserted through crud.bulk_create and committed on its own, so memory
+    use does not grow with the file size. Rejected rows are written to
+    error_file_path.
+    """
+    _, create_model = IMPORT_MODELS[kind]
+    job = job or new_job(kind)
+    job.status = "running"
+    save_job(job)
+    lookups = load_lookups(session, kind)
+    reader = csv.DictReader(source)
+    error_file = ErrorFile(error_file_path, list(reader.fieldnames or []))
+    chunk: list[tuple[int, dict[Optional[str], Any], dict[str, Any]]] = []
+
+    def flush() -> None:
+        created, errors = _insert_chunk(session, kind, [data for _, _, data in chunk])
+        for index, row_errors in sorted(errors.items()):
+            line, row, _ = chunk[index]
+            error_file.write(line, row, row_errors)
+        job.created += created
+        job.failed += len(errors)
+        job.processed += len(chunk)
+        save_job(job)
+        chunk.clear()
+        # Committed rows are not needed anymore
+        session.expunge_all()
+        logger.info(
+            f"Import {job.id}: {job.processed} rows processed, "
+            f"{job.created} created, {job.failed} rejected"
+        )
+
+    try:
+        for row in reader:
+            data = _clean(create_model, row)
+            errors = _resolve(kind, data, lookups)
+            if errors:
+                error_file.write(reader.line_num, row, errors)
+                job.failed += 1
+                job.processed += 1
+                continue
+            chunk.append((reader.line_num, row, data))
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+    finally:
+        error_file.close()
+    if error_file.written:
+        job.error_file = str(error_file_path)
+    job.status = "finished"
+    job.finished_at = datetime.now()
+    save_job(job)
+    return job
+
+
+def run_import_file(job: ImportJob, path: Path, chunk_size: int) -> None:
+    """
+    Import an uploaded file in the background and remove it afterwards.
+    """
+    try:
+        with Session(engine) as session, open(path, encoding="utf-8-sig", newline="") as f:
+            run_import(
+                session,
+                job.kind,  # type: ignore[arg-type]
+                f,
+                chunk_size=chunk_size,
+                error_file_path=error_path(job),
+                job=job,
+            )
+    except Exception as e:
+        logger.exception(f"Import {job.id} failed")
+        job.status = "failed"
+        job.detail = str(e)
+        job.finished_at = datetime.now()
+        save_job(job)
+    finally:
+        path.unlink(missing_ok=True)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Import apartments, clients or payments")
+    parser.add_argument("kind", choices=list(IMPORT_MODELS))
+    parser.add_argument("path", type=Path, help="CSV file with a header row")
+    parser.add_argument("--chunk-size", type=int, default=settings.IMPORT_CHUNK_SIZE)
+    parser.add_argument(
+        "--errors", type=Path, help="Where to write rejected rows (default: <path>.errors.csv)"
+    )
+    args = parser.parse_args()
+    errors = args.errors or args.path.with_suffix(".errors.csv")
+    ImportJob.__table__.create(engine, checkfirst=True)
+    with Session(engine) as session, open(args.path, encoding="utf-8-sig", newline="") as f:
+        job = run_import(
+            session, args.kind, f, chunk_size=args.chunk_size, error_file_path=errors
+        )
+    logger.info(f"Imported {job.created} of {job.processed} rows")
+    if job.failed:
+        logger.error(f"{job.failed} rows were rejected, see {errors}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ from models import (
     History,
     User
 )
+import rollups  # noqa: F401, registers the rollup maintenance listener
+from balances import ensure_client_balances
 from crud import create_user
 from models import UserCreate
 
@@ -25,6 +27,7 @@ def init() -> None:
     with Session(engine) as session:
         # Initialize the database (creates tables and admin user)
         init_db(session)
+        ensure_client_balances(session)
         
         # Check if we already have seeded data
         apartment_count = session.exec(select(ApartmentInfo)).all()
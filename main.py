@@ -1,13 +1,24 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+
+from anyio import to_thread
+from fastapi import FastAPI, Request
 from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.cors import CORSMiddleware
-from starlette.responses import RedirectResponse
+from starlette.responses import JSONResponse, RedirectResponse
 
 from api.main import api_router
 from core.config import settings
 from admin import setup_admin
+from audit import history_writer
+from core.counts import reconcile_counts
+from core.db import async_engine, engine
+from core.security import PasswordHasherBusy
 from initial_data import init as init_data
+from rollups import refresh_rollups
+
+logger = logging.getLogger(__name__)
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -39,10 +50,53 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 setup_admin(app)
 
 
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    """Too many logins or password changes queued for the hashing workers"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
+async def reconcile_counts_periodically() -> None:
+    """Correct cached row counts that drifted from the tables"""
+    while True:
+        await asyncio.sleep(settings.COUNT_RECONCILE_INTERVAL_SECONDS)
+        try:
+            await to_thread.run_sync(reconcile_counts, engine)
+        except Exception:
+            logger.exception("Failed to reconcile row counts")
+
+
+async def refresh_rollups_periodically() -> None:
+    """Roll up the collection report buckets closed since the last refresh"""
+    while True:
+        try:
+            await to_thread.run_sync(refresh_rollups, engine)
+        except Exception:
+            logger.exception("Failed to refresh payment rollups")
+        await asyncio.sleep(settings.ROLLUP_REFRESH_INTERVAL_SECONDS)
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize the database on startup"""
     init_data()
+    app.state.background_tasks = {
+        asyncio.create_task(reconcile_counts_periodically()),
+        asyncio.create_task(refresh_rollups_periodically()),
+    }
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Write pending audit history and close pooled async database connections"""
+    for task in app.state.background_tasks:
+        task.cancel()
+    history_writer.stop()
+    await async_engine.dispose()
 
 
 @app.get("/", include_in_schema=False)
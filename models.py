@@ -1,8 +1,9 @@
 import uuid
 from datetime import date, datetime
-from typing import Union, List, Optional
+from typing import Any, Dict, Union, List, Optional
 
 from pydantic import EmailStr
+from sqlalchemy import Index, text
 from sqlmodel import Field, Relationship, SQLModel
 
 
@@ -56,6 +57,7 @@ class UserPublic(UserBase):
 class UsersPublic(SQLModel):
     data: List[UserPublic]
     count: int
+    count_exact: bool = True
 
 
 # Shared properties
@@ -90,6 +92,7 @@ class ItemPublic(ItemBase):
 class ItemsPublic(SQLModel):
     data: List[ItemPublic]
     count: int
+    count_exact: bool = True
 
 
 # Generic message
@@ -97,6 +100,90 @@ class Message(SQLModel):
     message: str
 
 
+# Result of a bulk create/update, ids are in request order and None for
+# rows that were rejected
+class BulkRowError(SQLModel):
+    index: int
+    errors: List[Dict[str, Any]]
+
+
+class BulkWriteResult(SQLModel):
+    ids: List[Optional[int]]
+    errors: List[BulkRowError]
+
+
+# Progress of a CSV import, error_file is set once rows were rejected. Jobs
+# are stored so every worker process can report them.
+class ImportJobBase(SQLModel):
+    kind: str = Field(max_length=20)
+    status: str = Field(default="pending", max_length=20)
+    processed: int = 0
+    created: int = 0
+    failed: int = 0
+    error_file: Optional[str] = None
+    detail: Optional[str] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class ImportJob(ImportJobBase, table=True):
+    __tablename__ = "import_job"
+    id: str = Field(primary_key=True, max_length=32)
+
+
+class ImportJobPublic(ImportJobBase):
+    id: str
+
+
+# Compressed database snapshot, sha256 is the checksum of the .gz file
+class BackupPublic(SQLModel):
+    file: str
+    size: int
+    sha256: str
+    created_at: datetime
+
+
+class BackupVerificationPublic(SQLModel):
+    file: str
+    ok: bool
+    detail: Optional[str] = None
+    tables: Dict[str, int] = {}
+
+
+# Response cache counters since startup, see core/cache.py. entries is not
+# known for the shared redis backend.
+class CacheStatsPublic(SQLModel):
+    backend: str
+    enabled: bool
+    hits: int
+    misses: int
+    hit_ratio: float
+    invalidations: int
+    evictions: int
+    entries: Optional[int] = None
+
+
+# Live event stream connections and counters since startup, see core/events.py
+class EventStatsPublic(SQLModel):
+    connections: int
+    connections_by_topic: Dict[str, int] = {}
+    published: int
+    dropped: int
+
+
+# Password hashing workers and timings since startup, see core/security.py
+class PasswordHashStatsPublic(SQLModel):
+    executor: str
+    workers: int
+    operations: int
+    rejected: int
+    rehashed: int
+    avg_ms: float
+    max_ms: float
+    avg_queue_ms: float
+    max_queue_ms: float
+
+
 # JSON payload containing access token
 class Token(SQLModel):
     access_token: str
@@ -138,7 +225,13 @@ class ApartmentInfoUpdate(ApartmentInfoBase):
 
 class ApartmentInfo(ApartmentInfoBase, table=True):
     __tablename__ = "apartment_info"
+    __table_args__ = (
+        Index("ix_apartment_info_building_floor", "building", "floor"),
+    )
     id: int = Field(default=None, primary_key=True, index=True)
+    # Maintained on every write, see core/versions.py
+    version: int = Field(default=1, sa_column_kwargs={"server_default": text("1")})
+    updated_at: Optional[datetime] = Field(default=None, index=True)
     clients: List["ClientInfo"] = Relationship(back_populates="apartment")
 
 
@@ -146,6 +239,12 @@ class ApartmentInfoPublic(ApartmentInfoBase):
     id: int
 
 
+# Batch reads return the found rows in request order and the missing ids
+class ApartmentsBatchPublic(SQLModel):
+    data: List[ApartmentInfoPublic]
+    missing: List[int]
+
+
 # Client related models
 class ClientInfoBase(SQLModel):
     name: str
@@ -166,7 +265,7 @@ class ClientInfoBase(SQLModel):
     alt_z: int
     alt_d: int
     created_at: date = Field(default=date.today())
-    apt_id: int = Field(foreign_key="apartment_info.id")
+    apt_id: int = Field(foreign_key="apartment_info.id", index=True)
 
 
 class ClientInfoCreate(ClientInfoBase):
@@ -198,6 +297,9 @@ class ClientInfoUpdate(ClientInfoBase):
 class ClientInfo(ClientInfoBase, table=True):
     __tablename__ = "client_info"
     id: int = Field(default=None, primary_key=True, index=True)
+    # Maintained on every write, see core/versions.py
+    version: int = Field(default=1, sa_column_kwargs={"server_default": text("1")})
+    updated_at: Optional[datetime] = Field(default=None, index=True)
     apartment: ApartmentInfo = Relationship(back_populates="clients")
     payments: List["Payment"] = Relationship(back_populates="client")
 
@@ -206,6 +308,11 @@ class ClientInfoPublic(ClientInfoBase):
     id: int
 
 
+class ClientsBatchPublic(SQLModel):
+    data: List[ClientInfoPublic]
+    missing: List[int]
+
+
 # Payment Type models
 class PaymentTypeBase(SQLModel):
     name: str
@@ -231,10 +338,10 @@ class PaymentTypePublic(PaymentTypeBase):
 
 # Payment models
 class PaymentBase(SQLModel):
-    date_of_payment: datetime
-    payment_type_id: int = Field(foreign_key="payment_type.id")
+    date_of_payment: datetime = Field(index=True)
+    payment_type_id: int = Field(foreign_key="payment_type.id", index=True)
     amount: int
-    client_id: int = Field(foreign_key="client_info.id")
+    client_id: int = Field(foreign_key="client_info.id", index=True)
 
 
 class PaymentCreate(PaymentBase):
@@ -251,6 +358,9 @@ class PaymentUpdate(PaymentBase):
 class Payment(PaymentBase, table=True):
     __tablename__ = "payments"
     id: int = Field(default=None, primary_key=True, index=True)
+    # Maintained on every write, see core/versions.py
+    version: int = Field(default=1, sa_column_kwargs={"server_default": text("1")})
+    updated_at: Optional[datetime] = Field(default=None, index=True)
     payment_type: PaymentType = Relationship(back_populates="payments")
     client: ClientInfo = Relationship(back_populates="payments")
 
@@ -259,6 +369,11 @@ class PaymentPublic(PaymentBase):
     id: int
 
 
+class PaymentsBatchPublic(SQLModel):
+    data: List[PaymentPublic]
+    missing: List[int]
+
+
 # History Type models
 class HistoryTypeBase(SQLModel):
     name: str
@@ -301,9 +416,133 @@ class HistoryUpdate(HistoryBase):
 
 class History(HistoryBase, table=True):
     __tablename__ = "history"
+    __table_args__ = (
+        Index("ix_history_datetime", "datetime"),
+        Index("ix_history_type_id_datetime", "type_id", "datetime"),
+        Index("ix_history_entity_id_datetime", "entity_id", "datetime"),
+    )
     id: int = Field(default=None, primary_key=True, index=True)
     history_type: HistoryType = Relationship(back_populates="histories")
 
 
 class HistoryPublic(HistoryBase):
     id: int
+
+
+class HistoriesPublic(SQLModel):
+    data: List[HistoryPublic]
+    next_cursor: Optional[str] = None
+
+
+# One archived month of history entries, see history_archive.py
+class HistoryArchive(SQLModel, table=True):
+    __tablename__ = "history_archive"
+    month: date = Field(primary_key=True)
+    path: str
+    row_count: int
+    sha256: str
+    archived_at: datetime
+
+
+# Cached number of rows per table and filter, see core/counts.py
+class RowCount(SQLModel, table=True):
+    __tablename__ = "row_count"
+    key: str = Field(primary_key=True, max_length=255)
+    count: int
+
+
+# Row count changes added to row_count.count, spread over a few shards per
+# key so concurrent writers do not all update the same row
+class RowCountDelta(SQLModel, table=True):
+    __tablename__ = "row_count_delta"
+    key: str = Field(primary_key=True, max_length=255)
+    shard: int = Field(primary_key=True)
+    delta: int
+
+
+# Deleted apartment, client and payment ids for /sync, see core/versions.py
+class SyncTombstone(SQLModel, table=True):
+    __tablename__ = "sync_tombstone"
+    id: int = Field(default=None, primary_key=True)
+    table_name: str = Field(max_length=64)
+    row_id: int
+    deleted_at: datetime = Field(index=True)
+
+
+# Compact /sync response, rows are lists of values in columns order
+class SyncTablePublic(SQLModel):
+    columns: List[str]
+    rows: List[List[Any]]
+    deleted: List[int]
+
+
+class SyncPublic(SQLModel):
+    cursor: str
+    apartments: SyncTablePublic
+    clients: SyncTablePublic
+    payments: SyncTablePublic
+
+
+# Report models
+class ClientBalanceBase(SQLModel):
+    client_id: int
+    apt_id: int
+    price: int
+    total_paid: int
+    payment_count: int
+    last_payment_date: Optional[datetime] = None
+    outstanding: int
+
+
+# Summary table kept up to date by balances.py on every flush
+class ClientBalance(ClientBalanceBase, table=True):
+    __tablename__ = "client_balance"
+    client_id: int = Field(primary_key=True)
+    apt_id: int = Field(index=True)
+
+
+class ClientBalancePublic(ClientBalanceBase):
+    pass
+
+
+class BuildingTotalPublic(SQLModel):
+    building: str
+    apartment_count: int
+    total_price: int
+    collected: int
+    outstanding: int
+
+
+class FloorTotalPublic(BuildingTotalPublic):
+    floor: int
+
+
+class PaymentTypeTotalPublic(SQLModel):
+    payment_type_id: int
+    name: str
+    payment_count: int
+    total: int
+
+
+# Collection rollups, closed periods are maintained by rollups.py
+class PaymentRollup(SQLModel, table=True):
+    __tablename__ = "payment_rollup"
+    period: str = Field(primary_key=True, max_length=10)
+    bucket_start: date = Field(primary_key=True)
+    payment_type_id: int = Field(primary_key=True)
+    total: int
+    payment_count: int
+
+
+class PaymentRollupState(SQLModel, table=True):
+    __tablename__ = "payment_rollup_state"
+    period: str = Field(primary_key=True, max_length=10)
+    # Buckets starting before this date are complete in payment_rollup
+    closed_until: date
+
+
+class CollectionBucketPublic(SQLModel):
+    bucket_start: date
+    payment_type_id: int
+    total: int
+    payment_count: int
@@ -0,0 +1,294 @@
+import argparse
+import logging
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import date, datetime, time, timedelta
+from typing import Any, Literal, Optional
+
+from sqlalchemy import Connection, Engine, delete, event, insert, inspect, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as ORMSession
+from sqlmodel import Session, func, select
+
+from models import CollectionBucketPublic, Payment, PaymentRollup, PaymentRollupState
+
+logger = logging.getLogger(__name__)
+
+Period = Literal["day", "week", "month"]
+PERIODS: tuple[Period, ...] = ("day", "week", "month")
+
+
+def bucket_start(period: Period, day: date) -> date:
+    """
+    First day of the bucket containing day (weeks start on Monday).
+    """
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket_start(period: Period, start: date) -> date:
+    if period == "week":
+        return start + timedelta(days=7)
+    if period == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _to_date(value: Any) -> date:
+    # func.date() returns a string on SQLite and a date on PostgreSQL
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+def _daily_totals(
+    connection: Connection,
+    start: Optional[date],
+    end: date,
+    payment_type_id: Optional[int] = None,
+) -> list[tuple[date, int, int, int]]:
+    """
+    Sum and count of payments per day and payment type in [start, end).
+    """
+    day = func.date(Payment.date_of_payment)
+    statement = (
+        select(
+            day,
+            Payment.payment_type_id,
+            func.sum(Payment.amount),
+            func.count(Payment.id),
+        )
+        .where(Payment.date_of_payment < datetime.combine(end, time.min))
+        .group_by(day, Payment.payment_type_id)
+    )
+    if start is not None:
+        statement = statement.where(
+            Payment.date_of_payment >= datetime.combine(start, time.min)
+        )
+    if payment_type_id is not None:
+        statement = statement.where(Payment.payment_type_id == payment_type_id)
+    return [
+        (_to_date(row[0]), row[1], row[2], row[3])
+        for row in connection.execute(statement)
+    ]
+
+
+def _bucket_totals(
+    period: Period, daily: Iterable[tuple[date, int, int, int]]
+) -> dict[tuple[date, int], list[int]]:
+    totals: dict[tuple[date, int], list[int]] = defaultdict(lambda: [0, 0])
+    for day, payment_type_id, total, count in daily:
+        bucket = totals[(bucket_start(period, day), payment_type_id)]
+        bucket[0] += total
+        bucket[1] += count
+    return totals
+
+
+def _insert_buckets(
+    connection: Connection, period: Period, totals: dict[tuple[date, int], list[int]]
+) -> None:
+    if not totals:
+        return
+    connection.execute(
+        insert(PaymentRollup.__table__),
+        [
+            {
+                "period": period,
+                "bucket_start": start,
+                "payment_type_id": payment_type_id,
+                "total": total,
+                "payment_count": count,
+            }
+            for (start, payment_type_id), (total, count) in totals.items()
+        ],
+    )
+
+
+def refresh_closed_buckets(
+    session: Session, period: Period, today: Optional[date] = None
+) -> None:
+    """
+    Roll up the buckets that closed since the last refresh. Only payments
+    after the previous watermark are read.
+    """
+    open_start = bucket_start(period, today or date.today())
+    state = session.get(PaymentRollupState, period)
+    if state is None:
+        # Committed before any bucket is rolled up, so writers of backdated
+        # payments lock it (see _refresh_backdated_buckets)
+        session.add(PaymentRollupState(period=period, closed_until=date.min))
+        try:
+            session.commit()
+        except IntegrityError:
+            # Another worker added it first
+            session.rollback()
+        state = session.get(PaymentRollupState, period)
+    closed_until = state.closed_until
+    if closed_until >= open_start:
+        return
+    # The watermark is advanced before the payments are summed: the update
+    # waits for writers holding the state row, whose payments are then
+    # summed here, and later writers see the new watermark and recompute
+    # their bucket. It matches no row when another refresh advanced it first.
+    connection = session.connection()
+    advanced = connection.execute(
+        update(PaymentRollupState.__table__)
+        .where(
+            PaymentRollupState.period == period,
+            PaymentRollupState.closed_until == closed_until,
+        )
+        .values(closed_until=open_start)
+    )
+    if not advanced.rowcount:
+        session.rollback()
+        return
+    daily = _daily_totals(connection, closed_until, open_start)
+    _insert_buckets(connection, period, _bucket_totals(period, daily))
+    session.commit()
+
+
+def refresh_all(session: Session, today: Optional[date] = None) -> None:
+    for period in PERIODS:
+        refresh_closed_buckets(session, period, today)
+
+
+def refresh_rollups(engine: Engine) -> None:
+    """
+    Roll up the buckets closed since the last refresh, for every period.
+    """
+    with Session(engine) as session:
+        refresh_all(session)
+
+
+def rebuild_rollups(session: Session) -> None:
+    connection = session.connection()
+    connection.execute(delete(PaymentRollup.__table__))
+    connection.execute(delete(PaymentRollupState.__table__))
+    session.commit()
+    refresh_all(session)
+
+
+def recompute_buckets(connection: Connection, period: Period, starts: Iterable[date]) -> None:
+    """
+    Recompute already closed buckets, e.g. after a backdated payment.
+    """
+    for start in starts:
+        connection.execute(
+            delete(PaymentRollup.__table__).where(
+                PaymentRollup.period == period, PaymentRollup.bucket_start == start
+            )
+        )
+        daily = _daily_totals(connection, start, next_bucket_start(period, start))
+        _insert_buckets(connection, period, _bucket_totals(period, daily))
+
+
+def read_collections(
+    session: Session,
+    period: Period,
+    start: date,
+    end: date,
+    payment_type_id: Optional[int] = None,
+    today: Optional[date] = None,
+) -> list[CollectionBucketPublic]:
+    """
+    Collections per bucket and payment type for the buckets overlapping
+    [start, end]. Buckets rolled up by the last refresh come from
+    payment_rollup, the later ones, including the open bucket, are computed
+    live. Nothing is written.
+    """
+    today = today or date.today()
+    open_start = bucket_start(period, today)
+    first = bucket_start(period, start)
+    # Buckets closed since the last refresh are computed live as well
+    state = session.get(PaymentRollupState, period)
+    live_from = min(state.closed_until, open_start) if state else first
+
+    statement = select(PaymentRollup).where(
+        PaymentRollup.period == period,
+        PaymentRollup.bucket_start >= first,
+        PaymentRollup.bucket_start < live_from,
+        PaymentRollup.bucket_start <= end,
+    )
+    if payment_type_id is not None:
+        statement = statement.where(PaymentRollup.payment_type_id == payment_type_id)
+    buckets = [
+        CollectionBucketPublic.model_validate(rollup)
+        for rollup in session.exec(statement)
+    ]
+    if end >= live_from:
+        daily = _daily_totals(
+            session.connection(),
+            max(first, live_from),
+            next_bucket_start(period, bucket_start(period, end)),
+            payment_type_id,
+        )
+        buckets.extend(
+            CollectionBucketPublic(
+                bucket_start=bucket,
+                payment_type_id=type_id,
+                total=total,
+                payment_count=count,
+            )
+            for (bucket, type_id), (total, count) in _bucket_totals(period, daily).items()
+        )
+    return sorted(buckets, key=lambda bucket: (bucket.bucket_start, bucket.payment_type_id))
+
+
+def _payment_dates(obj: Payment) -> set[date]:
+    history = inspect(obj).attrs.date_of_payment.history
+    values = [obj.date_of_payment, *history.deleted]
+    return {_to_date(value) for value in values if value is not None}
+
+
+@event.listens_for(ORMSession, "after_flush")
+def _refresh_backdated_buckets(session: ORMSession, flush_context: Any) -> None:
+    # Closed buckets are only touched again by payments dated inside them
+    days: set[date] = set()
+    for obj in session.new:
+        if isinstance(obj, Payment):
+            days |= _payment_dates(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Payment) and session.is_modified(obj):
+            days |= _payment_dates(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Payment):
+            days |= _payment_dates(obj)
+    if not days:
+        return
+    connection = session.connection()
+    # Shared lock until commit: a refresh advancing a watermark waits for
+    # this payment (see refresh_closed_buckets)
+    states = connection.execute(
+        select(PaymentRollupState.__table__).with_for_update(read=True)
+    ).all()
+    for state in states:
+        starts = {
+            bucket_start(state.period, day) for day in days if day < state.closed_until
+        }
+        recompute_buckets(connection, state.period, starts)
+
+
+def main() -> None:
+    from core.db import engine
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Maintain the payment rollup tables")
+    parser.add_argument("command", choices=["refresh", "rebuild"])
+    args = parser.parse_args()
+    PaymentRollup.__table__.create(engine, checkfirst=True)
+    PaymentRollupState.__table__.create(engine, checkfirst=True)
+    with Session(engine) as session:
+        if args.command == "rebuild":
+            rebuild_rollups(session)
+        else:
+            refresh_all(session)
+    logger.info("Payment rollups are up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Rows for the database tests, with the required fields filled in.
+"""
+from datetime import date
+
+from models import ApartmentInfo, ClientInfo
+
+
+def apartment(apt_no: int, area: int = 100) -> ApartmentInfo:
+    return ApartmentInfo(
+        building="1", floor=1, apt_no=apt_no, area=area, meter_price=1000, apt_type="A1"
+    )
+
+
+def client(no: int, apt_id: int) -> ClientInfo:
+    return ClientInfo(
+        name=f"Client {no}",
+        id_no=no,
+        issue_date=date(2024, 1, 1),
+        no=no,
+        m="Cairo",
+        z="Zone A",
+        d="District 1",
+        phone_number="+20100000000",
+        registry_no="1",
+        newspaper_no="1",
+        job_title="Engineer",
+        alt_name="Alternative",
+        alt_kinship="Spouse",
+        alt_phone="+20100000001",
+        alt_m=1,
+        alt_z=2,
+        alt_d=3,
+        apt_id=apt_id,
+    )
@@ -0,0 +1,91 @@
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy import Engine
+from sqlmodel import Session, select
+
+import audit
+from models import History, HistoryType
+
+RECORDS = [
+    {"type": "Payment Added", "entity_id": 1, "datetime": datetime(2024, 1, 1, 12)},
+    {"type": "Payment Updated", "entity_id": 1, "datetime": datetime(2024, 1, 2, 12)},
+    {"type": "Client Added", "entity_id": 7, "datetime": datetime(2024, 1, 3, 12)},
+]
+
+
+@pytest.fixture
+def writer(
+    engine: Engine, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> audit.HistoryWriter:
+    monkeypatch.setattr(audit, "engine", engine)
+    # Batches are only written by stop(), all records in one batch
+    return audit.HistoryWriter(
+        flush_interval=60,
+        batch_size=10,
+        attempts=3,
+        backoff=0,
+        dead_letter_path=tmp_path / "history-dead-letter.jsonl",
+    )
+
+
+def stored(engine: Engine) -> list[tuple[str, int, datetime]]:
+    with Session(engine) as session:
+        statement = (
+            select(HistoryType.name, History.entity_id, History.datetime)
+            .join(HistoryType)
+            .order_by(History.datetime)
+        )
+        return [tuple(row) for row in session.exec(statement)]
+
+
+def test_records_are_written(engine: Engine, writer: audit.HistoryWriter) -> None:
+    writer.enqueue(RECORDS)
+    writer.stop(timeout=5)
+    assert stored(engine) == [(r["type"], r["entity_id"], r["datetime"]) for r in RECORDS]
+    assert writer.dead_letter_path and not writer.dead_letter_path.exists()
+
+
+def test_failed_batch_is_retried(
+    engine: Engine, writer: audit.HistoryWriter, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    insert = writer._insert
+    calls = []
+
+    def flaky_insert(batch: list[dict[str, Any]]) -> None:
+        calls.append(len(batch))
+        if len(calls) < 3:
+            raise RuntimeError("database is unavailable")
+        insert(batch)
+
+    monkeypatch.setattr(writer, "_insert", flaky_insert)
+    writer.enqueue(RECORDS)
+    writer.stop(timeout=5)
+    assert calls == [3, 3, 3]
+    assert len(stored(engine)) == 3
+    assert writer.dead_letter_path and not writer.dead_letter_path.exists()
+
+
+def test_batch_goes_to_dead_letter_file(
+    engine: Engine, writer: audit.HistoryWriter, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls = []
+
+    def failing_insert(batch: list[dict[str, Any]]) -> None:
+        calls.append(len(batch))
+        raise RuntimeError("database is unavailable")
+
+    monkeypatch.setattr(writer, "_insert", failing_insert)
+    writer.enqueue(RECORDS)
+    writer.stop(timeout=5)
+    assert calls == [3, 3, 3]
+    assert stored(engine) == []
+
+    assert writer.dead_letter_path
+    lines = writer.dead_letter_path.read_text().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {**record, "datetime": record["datetime"].isoformat()} for record in RECORDS
+    ]
@@ -0,0 +1,91 @@
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from sqlalchemy import Engine, func, insert, select, text
+
+import backup
+from core.config import settings
+from models import ApartmentInfo
+
+
+@pytest.fixture
+def database(engine: Engine, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Engine:
+    if engine.dialect.name != "sqlite":
+        pytest.skip("Online backups are only supported on SQLite")
+    monkeypatch.setattr(backup, "database_path", lambda: Path(engine.url.database))
+    monkeypatch.setattr(settings, "BACKUP_DIR", str(tmp_path / "backups"))
+    return engine
+
+
+def add_apartments(engine: Engine, count: int, start: int = 0) -> None:
+    with engine.begin() as connection:
+        connection.execute(
+            insert(ApartmentInfo.__table__),
+            [
+                {
+                    "building": "1",
+                    "floor": 1,
+                    "apt_no": start + i,
+                    "area": 100,
+                    "meter_price": 1000,
+                    "apt_type": "A1",
+                }
+                for i in range(count)
+            ],
+        )
+
+
+def apartment_count(engine: Engine) -> int:
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(ApartmentInfo)).scalar_one()
+
+
+def test_backup_round_trip(database: Engine) -> None:
+    add_apartments(database, 3)
+    created = backup.create_backup(pages=1, sleep=0)
+    path = backup.backup_dir() / created.file
+    assert [b.file for b in backup.list_backups()] == [created.file]
+
+    result = backup.verify_backup(path)
+    assert result.ok, result.detail
+    assert result.tables["apartment_info"] == 3
+
+    with open(path, "ab") as f:
+        f.write(b"\0")
+    assert backup.verify_backup(path).detail == "Checksum does not match"
+    path.with_name(path.name + ".sha256").unlink()
+    assert backup.verify_backup(path).detail == "Checksum file is missing"
+
+
+def test_backup_finishes_while_writing(database: Engine) -> None:
+    add_apartments(database, 3000)
+    done = threading.Event()
+
+    def write() -> None:
+        # Stops on its own, an online backup that restarts on every write
+        # would otherwise wait for it forever
+        deadline = time.monotonic() + 10
+        apt_no = 100000
+        while not done.is_set() and time.monotonic() < deadline:
+            add_apartments(database, 1, start=apt_no)
+            apt_no += 1
+            time.sleep(0.002)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        time.sleep(0.05)
+        created = backup.create_backup(pages=5, sleep=0.002)
+        assert writer.is_alive()
+    finally:
+        done.set()
+        writer.join()
+
+    result = backup.verify_backup(backup.backup_dir() / created.file)
+    assert result.ok, result.detail
+    # One snapshot, taken after the first writes and before the last ones
+    assert 3000 < result.tables["apartment_info"] < apartment_count(database)
+    with database.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar_one() == "wal"
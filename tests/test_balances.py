@@ -0,0 +1,78 @@
+import sqlite3
+from datetime import datetime
+from typing import Any
+
+import pytest
+from sqlalchemy import Engine, event
+from sqlmodel import Session, select
+
+from balances import check_client_balances, refresh_client_balances
+from factories import apartment, client
+from models import ClientBalance, Payment, PaymentType
+
+
+def assert_consistent(session: Session) -> None:
+    session.commit()
+    assert check_client_balances(session) == []
+
+
+def test_balances_follow_writes(engine: Engine) -> None:
+    with Session(engine) as session:
+        apartments = [apartment(101), apartment(102), apartment(103)]
+        payment_type = PaymentType(name="Cash")
+        session.add_all([*apartments, payment_type])
+        session.flush()
+        clients = [client(i, apartments[i % 2].id) for i in range(4)]
+        session.add_all(clients)
+        session.flush()
+        payments = [
+            Payment(
+                date_of_payment=datetime(2024, 1, i + 1),
+                payment_type_id=payment_type.id,
+                amount=1000 * (i + 1),
+                client_id=clients[i % 4].id,
+            )
+            for i in range(8)
+        ]
+        session.add_all(payments)
+        assert_consistent(session)
+        assert len(session.exec(select(ClientBalance)).all()) == 4
+
+        payments[0].amount = 50
+        payments[1].client_id = clients[0].id
+        payments[2].date_of_payment = datetime(2025, 1, 1)
+        assert_consistent(session)
+
+        clients[1].apt_id = apartments[2].id
+        apartments[0].meter_price = 2000
+        assert_consistent(session)
+
+        session.delete(payments[3])
+        session.delete(payments[7])
+        session.delete(clients[3])
+        assert_consistent(session)
+
+        # An apartment deleted once its clients moved out or were deleted
+        clients[0].apt_id = apartments[1].id
+        for payment in clients[2].payments:
+            session.delete(payment)
+        session.delete(clients[2])
+        session.delete(apartments[0])
+        assert_consistent(session)
+        assert len(session.exec(select(ClientBalance)).all()) == 2
+
+
+def test_refresh_chunks_in_lists(engine: Engine) -> None:
+    if engine.dialect.name != "sqlite":
+        pytest.skip("Lowers SQLite's bound parameter limit")
+
+    @event.listens_for(engine, "connect")
+    def limit_parameters(dbapi_connection: Any, connection_record: Any) -> None:
+        # The default of SQLite builds before 3.32
+        dbapi_connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+
+    engine.dispose()
+    with engine.begin() as connection:
+        refresh_client_balances(
+            connection, client_ids=range(1, 2001), apt_ids=range(1, 2001)
+        )
@@ -0,0 +1,97 @@
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine
+from sqlmodel import Session, func, select
+
+import crud
+from core.config import settings
+from factories import apartment, client
+from models import ClientInfo, ClientInfoCreate
+
+
+@pytest.fixture
+def apt_id(engine: Engine) -> int:
+    with Session(engine) as session:
+        home = apartment(101)
+        session.add(home)
+        session.flush()
+        session.add(client(1, home.id))
+        session.commit()
+        return home.id
+
+
+def client_row(no: int, apt_id: int) -> dict[str, Any]:
+    return client(no, apt_id).model_dump(exclude={"id", "created_at", "version", "updated_at"})
+
+
+def bulk_create(engine: Engine, rows: list[dict[str, Any]], atomic: bool = False) -> Any:
+    with Session(engine) as session:
+        return crud.bulk_create(
+            session=session,
+            model=ClientInfo,
+            create_model=ClientInfoCreate,
+            rows=rows,
+            atomic=atomic,
+        )
+
+
+def client_nos(engine: Engine) -> list[int]:
+    with Session(engine) as session:
+        return sorted(session.exec(select(ClientInfo.no)).all())
+
+
+def test_partial_failure(engine: Engine, apt_id: int) -> None:
+    rows = [
+        client_row(2, apt_id),
+        {**client_row(3, apt_id), "id_no": "not a number"},
+        client_row(1, apt_id),  # no already exists
+        client_row(4, apt_id + 1),  # apartment does not exist
+        client_row(5, apt_id),
+        client_row(5, apt_id),  # no repeated in the batch
+    ]
+    result = bulk_create(engine, rows)
+    assert [id is not None for id in result.ids] == [True, False, False, False, True, False]
+    assert [error.index for error in result.errors] == [1, 2, 3, 5]
+    assert result.errors[1].errors[0]["type"] == "unique"
+    assert result.errors[2].errors[0]["type"] == "foreign_key"
+    assert client_nos(engine) == [1, 2, 5]
+
+    result = bulk_create(engine, [client_row(6, apt_id), client_row(1, apt_id)], atomic=True)
+    assert result.ids == [None, None]
+    assert client_nos(engine) == [1, 2, 5]
+
+
+@pytest.mark.parametrize("atomic", [False, True])
+def test_savepoint_fallback(
+    engine: Engine, apt_id: int, monkeypatch: pytest.MonkeyPatch, atomic: bool
+) -> None:
+    # As if another request inserted no 1 after the checks ran, the batch
+    # insert fails and the rows are written again one savepoint each
+    monkeypatch.setattr(crud, "get_unique_errors", lambda **kwargs: {})
+    rows = [client_row(2, apt_id), client_row(1, apt_id), client_row(3, apt_id)]
+    result = bulk_create(engine, rows, atomic=atomic)
+
+    assert [error.index for error in result.errors] == [1]
+    assert result.errors[0].errors[0]["type"] == "integrity"
+    if atomic:
+        # On SQLite the rows before the rejected one were not committed by
+        # releasing their savepoint
+        assert result.ids == [None, None, None]
+        assert client_nos(engine) == [1]
+    else:
+        assert [id is not None for id in result.ids] == [True, False, True]
+        assert client_nos(engine) == [1, 2, 3]
+    with Session(engine) as session:
+        assert session.exec(select(func.count()).select_from(ClientInfo)).one() == len(
+            client_nos(engine)
+        )
+
+
+def test_batch_size_cap(api: TestClient) -> None:
+    response = api.post("/api/v1/payments/bulk", json=[{}] * (settings.BULK_MAX_ROWS + 1))
+    assert response.status_code == 422
+    response = api.post("/api/v1/payments/bulk", json=[{}] * settings.BULK_MAX_ROWS)
+    assert response.status_code == 200
+    assert len(response.json()["errors"]) == settings.BULK_MAX_ROWS
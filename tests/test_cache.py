@@ -0,0 +1,74 @@
+import asyncio
+import os
+import time
+from typing import Any
+
+import pytest
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core import cache
+from models import PaymentType, User
+
+# e.g. redis://localhost:6379/15, used for the redis backend tests
+REDIS_TEST_URL = os.environ.get("REDIS_TEST_URL")
+
+
+class SlowBackend(cache.MemoryBackend):
+    """
+    Memory backend whose calls block like network round trips.
+    """
+
+    name = "slow"
+    blocking = True
+
+    def bump(self, tables: set[str]) -> None:
+        time.sleep(0.1)
+        super().bump(tables)
+
+
+def make_backend(name: str) -> Any:
+    if name == "redis":
+        return cache.RedisBackend(REDIS_TEST_URL, ttl=60)
+    if name == "slow":
+        return SlowBackend(max_entries=16, ttl=60)
+    return cache.MemoryBackend(max_entries=16, ttl=60)
+
+
+@pytest.mark.parametrize(
+    "backend",
+    [
+        "memory",
+        "slow",
+        pytest.param(
+            "redis",
+            marks=pytest.mark.skipif(not REDIS_TEST_URL, reason="REDIS_TEST_URL is not set"),
+        ),
+    ],
+)
+def test_read_after_async_write_misses(
+    backend: str, async_engine: AsyncEngine, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    response_cache = cache.ResponseCache(make_backend(backend))
+    monkeypatch.setattr(cache, "response_cache", response_cache)
+    request = Request(
+        {"type": "http", "path": "/api/v1/payment-types/", "query_string": b"", "headers": []}
+    )
+    user = User(email="user@example.com", hashed_password="x")
+
+    async def write_then_read() -> None:
+        key = await response_cache.key(request, user, PaymentType)
+        await response_cache.store(key, Response(content=b"[]"))
+        assert await response_cache.get(key)
+
+        async with AsyncSession(async_engine) as session:
+            session.add(PaymentType(name="Cash"))
+            await session.commit()
+
+        # The commit returned, the next read must not be served the old list
+        key = await response_cache.key(request, user, PaymentType)
+        assert await response_cache.get(key) is None
+
+    asyncio.run(write_then_read())
+    assert response_cache.invalidations == 1
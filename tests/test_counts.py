@@ -0,0 +1,87 @@
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import Engine, text
+from sqlmodel import Session, func, select
+
+from core.counts import read_count, reconcile_counts
+from models import Item, User
+
+
+def add_user(engine: Engine, email: str) -> str:
+    with Session(engine) as session:
+        user = User(email=email, hashed_password="x")
+        session.add(user)
+        session.commit()
+        return str(user.id)
+
+
+def cached_count(engine: Engine, **filters: Any) -> int:
+    with Session(engine) as session:
+        count, counted = read_count(session, Item, **filters)
+        assert not counted
+        return count
+
+
+def table_count(engine: Engine) -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.count()).select_from(Item)).one()
+
+
+def test_first_read_during_uncommitted_insert(engine: Engine) -> None:
+    owner_id = add_user(engine, "owner@example.com")
+    writer = Session(engine)
+    writer.add(Item(title="pending", owner_id=owner_id))
+    # The insert and its count delta are flushed but not committed
+    writer.flush()
+
+    def first_read() -> None:
+        with Session(engine) as session:
+            read_count(session, Item)
+
+    reader = threading.Thread(target=first_read)
+    reader.start()
+    time.sleep(0.2)
+    writer.commit()
+    writer.close()
+    reader.join()
+
+    assert cached_count(engine) == table_count(engine) == 1
+
+
+def test_counts_follow_writes(engine: Engine) -> None:
+    owners = [add_user(engine, f"owner{i}@example.com") for i in range(2)]
+    with Session(engine) as session:
+        assert read_count(session, Item) == (0, True)
+        assert read_count(session, Item, owner_id=owners[0]) == (0, True)
+        items = [Item(title=f"item {i}", owner_id=owners[i % 2]) for i in range(10)]
+        session.add_all(items)
+        session.commit()
+        for item in items[:3]:
+            session.delete(item)
+        session.commit()
+        # Moves an item between owners
+        items[5].owner_id = owners[0]
+        session.commit()
+
+    assert cached_count(engine) == 7
+    assert cached_count(engine, owner_id=owners[0]) == 4
+
+
+def test_reconcile_corrects_drift(engine: Engine) -> None:
+    owner_id = add_user(engine, "owner@example.com")
+    with Session(engine) as session:
+        read_count(session, Item)
+        read_count(session, Item, owner_id=owner_id)
+    with engine.begin() as connection:
+        # Written outside the application, no delta is recorded
+        connection.execute(
+            text("INSERT INTO item (id, title, owner_id) VALUES ('a', 'a', :owner_id)"),
+            {"owner_id": owner_id},
+        )
+    assert cached_count(engine) == 0
+
+    assert reconcile_counts(engine) == 2
+    assert cached_count(engine) == cached_count(engine, owner_id=owner_id) == 1
+    assert reconcile_counts(engine) == 0
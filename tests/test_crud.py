@@ -0,0 +1,63 @@
+import asyncio
+
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import crud
+from models import ApartmentInfo, Item, ItemCreate, User, UserCreate, UserUpdate
+
+
+def create_user(engine: Engine, email: str = "user@example.com") -> User:
+    with Session(engine) as session:
+        return crud.create_user(
+            session=session, user_create=UserCreate(email=email, password="password1")
+        )
+
+
+def test_user_crud(engine: Engine) -> None:
+    user = create_user(engine)
+    with Session(engine) as session:
+        assert crud.get_user_by_email(session=session, email=user.email).id == user.id
+        assert crud.authenticate(session=session, email=user.email, password="password1")
+        assert not crud.authenticate(session=session, email=user.email, password="wrong")
+        assert not crud.authenticate(session=session, email="other@example.com", password="x")
+
+        db_user = session.get(User, user.id)
+        crud.update_user(session=session, db_user=db_user, user_in=UserUpdate(password="password2"))
+        assert crud.authenticate(session=session, email=user.email, password="password2")
+
+        item = crud.create_item(
+            session=session, item_in=ItemCreate(title="item"), owner_id=user.id
+        )
+        assert session.exec(select(Item).where(Item.owner_id == user.id)).one().id == item.id
+
+
+def test_authenticate_async(engine: Engine, async_engine: AsyncEngine) -> None:
+    user = create_user(engine)
+
+    async def authenticate(password: str) -> bool:
+        async with AsyncSession(async_engine) as session:
+            return bool(
+                await crud.authenticate_async(session=session, email=user.email, password=password)
+            )
+
+    assert asyncio.run(authenticate("password1"))
+    assert not asyncio.run(authenticate("wrong"))
+
+
+def test_async_session_reads_sync_writes(engine: Engine, async_engine: AsyncEngine) -> None:
+    with Session(engine) as session:
+        apartment = ApartmentInfo(
+            building="1", floor=1, apt_no=101, area=120, meter_price=1500, apt_type="A1"
+        )
+        session.add(apartment)
+        session.commit()
+        apartment_id = apartment.id
+
+    async def read() -> ApartmentInfo:
+        async with AsyncSession(async_engine) as session:
+            return await session.get(ApartmentInfo, apartment_id)
+
+    assert asyncio.run(read()).apt_no == 101
@@ -0,0 +1,45 @@
+from typing import Any
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from core.config import settings
+from core.db import get_engine_options
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+@pytest.mark.parametrize("backend", ["sqlite", "postgresql"])
+def test_engine_options(monkeypatch: pytest.MonkeyPatch, backend: str, is_async: bool) -> None:
+    monkeypatch.setattr(settings, "DATABASE_BACKEND", backend)
+    options = get_engine_options(is_async=is_async)
+    # Creating an engine does not connect, so no server is needed
+    if is_async:
+        engine: Any = create_async_engine(
+            str(settings.SQLALCHEMY_ASYNC_DATABASE_URI), **options
+        ).sync_engine
+    else:
+        engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI), **options)
+    connect_args = options["connect_args"]
+    assert type(engine.pool) is (AsyncAdaptedQueuePool if is_async else QueuePool)
+
+    if backend == "sqlite":
+        assert connect_args == {
+            "check_same_thread": False,
+            "timeout": settings.DB_STATEMENT_TIMEOUT_MS / 1000,
+        }
+        return
+
+    assert engine.dialect.name == "postgresql"
+    assert engine.dialect.driver == ("asyncpg" if is_async else "psycopg")
+    assert engine.pool.size() == settings.DB_POOL_SIZE
+    assert engine.pool._max_overflow == settings.DB_MAX_OVERFLOW
+    assert engine.pool._timeout == settings.DB_POOL_TIMEOUT
+    assert engine.pool._recycle == settings.DB_POOL_RECYCLE
+    assert engine.pool._pre_ping == settings.DB_POOL_PRE_PING
+    timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+    if is_async:
+        assert connect_args == {"server_settings": {"statement_timeout": timeout}}
+    else:
+        assert connect_args == {"options": f"-c statement_timeout={timeout}"}
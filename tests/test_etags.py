@@ -0,0 +1,66 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+from factories import apartment, client
+
+
+def seed(engine: Engine) -> tuple[int, list[int]]:
+    with Session(engine) as session:
+        home = apartment(101)
+        session.add(home)
+        session.flush()
+        clients = [client(i, home.id) for i in range(3)]
+        session.add_all(clients)
+        session.commit()
+        return home.id, [c.id for c in clients]
+
+
+def get(api: TestClient, url: str, if_none_match: str) -> int:
+    response = api.get(url, headers={"If-None-Match": if_none_match})
+    if response.status_code == 304:
+        assert response.content == b""
+        assert response.headers["ETag"] in if_none_match
+    return response.status_code
+
+
+def test_entity_etag(api: TestClient, engine: Engine) -> None:
+    apt_id, _ = seed(engine)
+    url = f"/api/v1/apartments/{apt_id}"
+    response = api.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert get(api, url, etag) == 304
+    assert get(api, url, f'W/{etag}, "other"') == 304
+
+    assert api.put(url, json={"area": 130}).status_code == 200
+    assert get(api, url, etag) == 200
+    assert api.get(url).headers["ETag"] != etag
+
+
+def test_list_etag(api: TestClient, engine: Engine) -> None:
+    _, client_ids = seed(engine)
+    url = "/api/v1/clients/?limit=10"
+    etag = api.get(url).headers["ETag"]
+    assert get(api, url, etag) == 304
+    # Other query parameters are another page
+    assert get(api, url + "&skip=1", etag) == 200
+
+    # The last client reaches the highest version, then another one changes:
+    # max(version) and the count stay the same
+    for name in ("a", "b"):
+        api.put(f"/api/v1/clients/{client_ids[2]}", json={"name": name})
+    etag = api.get(url).headers["ETag"]
+    api.put(f"/api/v1/clients/{client_ids[0]}", json={"name": "c"})
+    assert get(api, url, etag) == 200
+
+    etag = api.get(url).headers["ETag"]
+    assert api.delete(f"/api/v1/clients/{client_ids[1]}").status_code == 200
+    assert get(api, url, etag) == 200
+
+
+def test_expanded_list_has_no_etag(api: TestClient, engine: Engine) -> None:
+    seed(engine)
+    response = api.get("/api/v1/clients/?expand=apartment")
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
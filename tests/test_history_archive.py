@@ -0,0 +1,132 @@
+import asyncio
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import history_archive
+from core.config import settings
+from models import History, HistoryPublic, HistoryType
+
+TODAY = date(2024, 6, 15)
+
+
+@pytest.fixture
+def type_ids(engine: Engine, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> list[int]:
+    monkeypatch.setattr(settings, "HISTORY_ARCHIVE_DIR", str(tmp_path / "archive"))
+    with Session(engine) as session:
+        types = [HistoryType(name="Payment"), HistoryType(name="Client")]
+        session.add_all(types)
+        session.flush()
+        # Two entries a day, January to May
+        session.add_all(
+            History(
+                type_id=types[i % 2].id,
+                datetime=datetime(2024, 1 + i // 20, 1 + i % 20 // 2, 12),
+                entity_id=i,
+            )
+            for i in range(100)
+        )
+        session.commit()
+        return [t.id for t in types]
+
+
+def add_history(engine: Engine, type_id: int, at: datetime) -> None:
+    with Session(engine) as session:
+        session.add(History(type_id=type_id, datetime=at, entity_id=1000))
+        session.commit()
+
+
+def history_count(engine: Engine) -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.count()).select_from(History)).one()
+
+
+def read_range(async_engine: AsyncEngine, **kwargs: Any) -> list[HistoryPublic]:
+    async def read() -> list[HistoryPublic]:
+        async with AsyncSession(async_engine) as session:
+            return await history_archive.read_history_range(session, **kwargs)
+
+    return asyncio.run(read())
+
+
+def test_archive_and_verify(engine: Engine, type_ids: list[int]) -> None:
+    with Session(engine) as session:
+        archives = history_archive.archive_history(session, retention_months=3, today=TODAY)
+        assert [a.month for a in archives] == [date(2024, 1, 1), date(2024, 2, 1)]
+        assert [a.row_count for a in archives] == [20, 20]
+        assert history_archive.verify_archives(session) == []
+    assert history_count(engine) == 60
+
+    # A late entry is merged into the month's file on the next run
+    add_history(engine, type_ids[0], datetime(2024, 1, 31, 23))
+    with Session(engine) as session:
+        [archive] = history_archive.archive_history(session, retention_months=3, today=TODAY)
+        assert (archive.month, archive.row_count) == (date(2024, 1, 1), 21)
+        assert history_archive.verify_archives(session) == []
+
+        path = history_archive.archive_dir() / archive.path
+        path.write_bytes(path.read_bytes()[:-1])
+        assert history_archive.verify_archives(session) == [date(2024, 1, 1)]
+    assert history_count(engine) == 60
+
+
+def test_read_range_across_archives(
+    engine: Engine, async_engine: AsyncEngine, type_ids: list[int]
+) -> None:
+    with Session(engine) as session:
+        history_archive.archive_history(session, retention_months=3, today=TODAY)
+    # Written to an archived month after it was archived, only in the table
+    add_history(engine, type_ids[0], datetime(2024, 1, 31, 23))
+    add_history(engine, type_ids[1], datetime(2024, 2, 5, 13))
+
+    expected = sorted(
+        [
+            *(
+                {
+                    "type_id": type_ids[i % 2],
+                    "datetime": datetime(2024, 1 + i // 20, 1 + i % 20 // 2, 12),
+                }
+                for i in range(100)
+            ),
+            {"type_id": type_ids[0], "datetime": datetime(2024, 1, 31, 23)},
+            {"type_id": type_ids[1], "datetime": datetime(2024, 2, 5, 13)},
+        ],
+        key=lambda row: row["datetime"],
+    )
+
+    def entries(history: list[HistoryPublic]) -> list[dict[str, Any]]:
+        return [{"type_id": h.type_id, "datetime": h.datetime} for h in history]
+
+    def expected_range(
+        start: datetime, end: datetime, type_id: Any = None
+    ) -> list[dict[str, Any]]:
+        return [
+            row
+            for row in expected
+            if start <= row["datetime"] < end and type_id in (None, row["type_id"])
+        ]
+
+    # Fully archived range
+    start, end = datetime(2024, 1, 1), datetime(2024, 3, 1)
+    assert entries(
+        read_range(async_engine, start=start, end=end, limit=1000)
+    ) == expected_range(start, end)
+    assert entries(
+        read_range(async_engine, start=start, end=end, type_id=type_ids[0], limit=1000)
+    ) == expected_range(start, end, type_ids[0])
+
+    # Pages across the archive and table boundary
+    start, end = datetime(2024, 1, 20), datetime(2024, 4, 1)
+    pages = [
+        read_range(async_engine, start=start, end=end, skip=skip, limit=7)
+        for skip in range(0, 70, 7)
+    ]
+    assert entries([h for page in pages for h in page]) == expected_range(start, end)
+    ids = [h.id for page in pages for h in page]
+    assert len(ids) == len(set(ids))
@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Any
+
+import pytest
+from sqlalchemy import Engine
+
+from api.routes.history import search_statement
+
+START = datetime(2024, 1, 1)
+END = datetime(2025, 1, 1)
+AFTER = (datetime(2024, 6, 1), 500)
+
+
+def query_plan(engine: Engine, filters: dict[str, Any]) -> list[str]:
+    statement = search_statement(**filters).limit(101)
+    sql = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as connection:
+        return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+@pytest.mark.parametrize(
+    ("filters", "index"),
+    [
+        ({}, "ix_history_datetime"),
+        ({"start": START, "end": END}, "ix_history_datetime"),
+        ({"type_id": 1}, "ix_history_type_id_datetime"),
+        ({"type_id": 1, "start": START, "end": END, "after": AFTER}, "ix_history_type_id_datetime"),
+        ({"entity_id": 1}, "ix_history_entity_id_datetime"),
+        ({"entity_id": 1, "end": END, "after": AFTER}, "ix_history_entity_id_datetime"),
+    ],
+)
+def test_search_uses_index(engine: Engine, filters: dict[str, Any], index: str) -> None:
+    if engine.dialect.name != "sqlite":
+        pytest.skip("EXPLAIN QUERY PLAN is SQLite's")
+    plan = query_plan(engine, filters)
+    assert any(f"USING INDEX {index}" in step for step in plan), plan
+    assert "SCAN history" not in plan, plan
+    # Pages come out of the index in order, without sorting the matches
+    assert not any("TEMP B-TREE" in step for step in plan), plan
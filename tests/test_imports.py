@@ -0,0 +1,70 @@
+import io
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Engine
+from sqlmodel import Session, func, select
+
+import importer
+from api.routes import imports
+from core.config import settings
+from models import ApartmentInfo, ImportJob, User
+
+CSV = """building,floor,apt_no,area,meter_price,apt_type
+1,1,101,120,1500,A1
+1,1,102,not a number,1500,A1
+1,2,201,90,1500,A2
+"""
+
+
+@pytest.fixture
+def import_engine(
+    engine: Engine, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> Engine:
+    monkeypatch.setattr(importer, "engine", engine)
+    monkeypatch.setattr(settings, "IMPORT_DIR", str(tmp_path))
+    return engine
+
+
+def test_jobs_are_stored(import_engine: Engine) -> None:
+    job = importer.new_job("apartments")
+    with Session(import_engine) as session:
+        importer.run_import(
+            session,
+            "apartments",
+            io.StringIO(CSV),
+            chunk_size=1,
+            error_file_path=importer.error_path(job),
+            job=job,
+        )
+        assert session.exec(select(func.count()).select_from(ApartmentInfo)).one() == 2
+
+    # Read back as another worker process would
+    stored = importer.get_job(job.id)
+    assert stored is not job
+    assert (stored.status, stored.processed, stored.created, stored.failed) == (
+        "finished",
+        3,
+        2,
+        1,
+    )
+    assert stored.error_file == str(importer.error_path(job))
+    assert "not a number" in Path(stored.error_file).read_text()
+
+
+def test_old_jobs_are_dropped(import_engine: Engine, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(importer, "MAX_JOBS", 2)
+    jobs = [importer.new_job("clients") for _ in range(3)]
+    with Session(import_engine) as session:
+        stored = session.exec(select(ImportJob.id)).all()
+    assert sorted(stored) == sorted(job.id for job in jobs[1:])
+
+
+def test_jobs_need_a_superuser(import_engine: Engine) -> None:
+    job = importer.new_job("payments")
+    user = User(email="user@example.com", hashed_password="x", is_superuser=False)
+    for read in (imports.read_import, imports.read_import_errors):
+        with pytest.raises(HTTPException) as excinfo:
+            read(current_user=user, job_id=job.id)
+        assert excinfo.value.status_code == 403
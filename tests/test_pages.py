@@ -0,0 +1,92 @@
+from collections.abc import Generator
+from datetime import date
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine, event, insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.deps import get_async_db
+from main import app
+from models import ApartmentInfo, ClientInfo
+
+APARTMENT_ID = 1
+CLIENT_ID = 1
+
+
+@pytest.fixture
+def statements(engine: Engine, async_engine: AsyncEngine) -> Generator[list[str], None, None]:
+    """
+    Statements sent by the pages routes, which read through a contract
+    database with one apartment and its client.
+    """
+    with engine.begin() as connection:
+        # Core inserts, so no ORM listeners (history, counts) run
+        connection.execute(
+            insert(ApartmentInfo.__table__).values(
+                id=APARTMENT_ID,
+                building="1",
+                floor=1,
+                apt_no=101,
+                area=120,
+                meter_price=1500,
+                apt_type="A1",
+            )
+        )
+        connection.execute(
+            insert(ClientInfo.__table__).values(
+                id=CLIENT_ID,
+                name="Client",
+                id_no=1234567,
+                issue_date=date(2024, 1, 1),
+                no=1,
+                m="Cairo",
+                z="Zone A",
+                d="District 1",
+                phone_number="+20100000000",
+                registry_no="1",
+                newspaper_no="1",
+                job_title="Engineer",
+                alt_name="Alternative",
+                alt_kinship="Spouse",
+                alt_phone="+20100000001",
+                alt_m=1,
+                alt_z=2,
+                alt_d=3,
+                created_at=date(2024, 1, 1),
+                apt_id=APARTMENT_ID,
+            )
+        )
+    executed: list[str] = []
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def record(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+        executed.append(statement)
+
+    async def get_test_db() -> Any:
+        async with AsyncSession(async_engine) as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = get_test_db
+    yield executed
+    app.dependency_overrides.pop(get_async_db)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        f"/api/v1/pages/?no=1&apt_id={APARTMENT_ID}",
+        f"/api/v1/pages/page2?client_id={CLIENT_ID}",
+        f"/api/v1/pages/page3?apt_id={APARTMENT_ID}",
+        f"/api/v1/pages/page8?apt_id={APARTMENT_ID}",
+        f"/api/v1/pages/page9?apt_id={APARTMENT_ID}",
+        f"/api/v1/pages/page10?apt_id={APARTMENT_ID}",
+    ],
+)
+def test_contract_page_reads_once(statements: list[str], url: str) -> None:
+    response = TestClient(app).get(url)
+    assert response.status_code == 200, response.text
+    assert len(statements) == 1, statements
+    assert statements[0].lstrip().upper().startswith("SELECT")
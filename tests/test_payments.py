@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine, insert
+from sqlmodel import Session
+
+from factories import apartment, client
+from models import Payment, PaymentType
+
+
+@pytest.fixture
+def ids(engine: Engine) -> dict[str, int]:
+    with Session(engine) as session:
+        home = apartment(101)
+        payment_type = PaymentType(name="Cash")
+        session.add_all([home, payment_type])
+        session.flush()
+        owner = client(1, home.id)
+        session.add(owner)
+        session.flush()
+        session.add_all(
+            Payment(
+                date_of_payment=datetime(2024, 1, 1 + i),
+                payment_type_id=payment_type.id,
+                amount=100 * (i + 1),
+                client_id=owner.id,
+            )
+            for i in range(2)
+        )
+        session.commit()
+        return {"apartment": home.id, "client": owner.id, "payment_type": payment_type.id}
+
+
+def test_fields(api: TestClient, ids: dict[str, int]) -> None:
+    response = api.get("/api/v1/payments/?fields=amount,id")
+    assert response.status_code == 200, response.text
+    assert sorted(response.json(), key=lambda row: row["id"]) == [
+        {"amount": 100, "id": 1},
+        {"amount": 200, "id": 2},
+    ]
+
+    response = api.get("/api/v1/payments/?fields=amount,secret")
+    assert response.status_code == 400
+
+
+def test_expand(api: TestClient, ids: dict[str, int]) -> None:
+    response = api.get(
+        f"/api/v1/payments/by-client/{ids['client']}",
+        params={"fields": "id", "expand": "client,payment_type,apartment"},
+    )
+    assert response.status_code == 200, response.text
+    rows = response.json()
+    assert len(rows) == 2
+    for row in rows:
+        assert set(row) == {"id", "client", "payment_type", "apartment"}
+        assert row["client"]["id"] == ids["client"]
+        assert row["client"]["apt_id"] == ids["apartment"]
+        assert row["payment_type"] == {"id": ids["payment_type"], "name": "Cash"}
+        assert row["apartment"]["id"] == ids["apartment"]
+        assert row["apartment"]["apt_no"] == 101
+
+    response = api.get("/api/v1/payments/?expand=owner")
+    assert response.status_code == 400
+
+
+def test_expand_without_client(api: TestClient, engine: Engine, ids: dict[str, int]) -> None:
+    if engine.dialect.name != "sqlite":
+        pytest.skip("Needs a payment whose client does not exist")
+    with engine.begin() as connection:
+        # SQLite does not enforce foreign keys here
+        connection.execute(
+            insert(Payment.__table__).values(
+                id=3,
+                date_of_payment=datetime(2024, 2, 1),
+                payment_type_id=ids["payment_type"],
+                amount=300,
+                client_id=999,
+            )
+        )
+
+    response = api.get("/api/v1/payments/by-client/999?expand=client,apartment")
+    assert response.status_code == 200, response.text
+    [row] = response.json()
+    assert (row["id"], row["client"], row["apartment"]) == (3, None, None)
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import Engine
+from sqlmodel import Session, select
+
+import rollups
+from factories import apartment, client
+from models import Payment, PaymentRollup, PaymentRollupState, PaymentType
+
+TODAY = date(2024, 4, 15)
+
+
+def seed(engine: Engine) -> tuple[int, list[int]]:
+    with Session(engine) as session:
+        home = apartment(101)
+        payment_types = [PaymentType(name="Cash"), PaymentType(name="Transfer")]
+        session.add_all([home, *payment_types])
+        session.flush()
+        owner = client(1, home.id)
+        session.add(owner)
+        session.flush()
+        session.add_all(
+            Payment(
+                date_of_payment=datetime(2024, 1 + i % 4, 1 + i),
+                payment_type_id=payment_types[i % 2].id,
+                amount=100 * (i + 1),
+                client_id=owner.id,
+            )
+            for i in range(12)
+        )
+        session.commit()
+        return owner.id, [payment_type.id for payment_type in payment_types]
+
+
+def expected(session: Session, period: rollups.Period) -> dict[tuple[date, int], tuple[int, int]]:
+    totals: dict[tuple[date, int], list[int]] = defaultdict(lambda: [0, 0])
+    for payment in session.exec(select(Payment)):
+        bucket = totals[
+            (rollups.bucket_start(period, payment.date_of_payment.date()), payment.payment_type_id)
+        ]
+        bucket[0] += payment.amount
+        bucket[1] += 1
+    return {key: (total, count) for key, (total, count) in totals.items()}
+
+
+def collections(session: Session, period: rollups.Period) -> dict[tuple[date, int], tuple[int, int]]:
+    buckets = rollups.read_collections(
+        session, period, date(2024, 1, 1), TODAY, today=TODAY
+    )
+    return {
+        (bucket.bucket_start, bucket.payment_type_id): (bucket.total, bucket.payment_count)
+        for bucket in buckets
+    }
+
+
+def rolled_up(session: Session, period: rollups.Period) -> dict[tuple[date, int], tuple[int, int]]:
+    statement = select(PaymentRollup).where(PaymentRollup.period == period)
+    return {
+        (rollup.bucket_start, rollup.payment_type_id): (rollup.total, rollup.payment_count)
+        for rollup in session.exec(statement)
+    }
+
+
+def closed(totals: dict[tuple[date, int], tuple[int, int]], period: rollups.Period) -> dict:
+    open_start = rollups.bucket_start(period, TODAY)
+    return {key: value for key, value in totals.items() if key[0] < open_start}
+
+
+def test_backdated_payments_update_closed_buckets(engine: Engine) -> None:
+    client_id, payment_type_ids = seed(engine)
+    with Session(engine) as session:
+        rollups.refresh_all(session, today=TODAY)
+        for period in rollups.PERIODS:
+            state = session.get(PaymentRollupState, period)
+            assert state.closed_until == rollups.bucket_start(period, TODAY)
+
+        payments = session.exec(select(Payment).order_by(Payment.id)).all()
+        session.add(
+            Payment(
+                date_of_payment=datetime(2024, 1, 20),
+                payment_type_id=payment_type_ids[0],
+                amount=5000,
+                client_id=client_id,
+            )
+        )
+        payments[1].amount = 1
+        # Moved out of a closed bucket, into the open one
+        payments[2].date_of_payment = datetime(2024, 4, 14)
+        payments[4].payment_type_id = payment_type_ids[1]
+        session.delete(payments[5])
+        session.commit()
+
+        for period in rollups.PERIODS:
+            assert rolled_up(session, period) == closed(expected(session, period), period)
+            assert collections(session, period) == expected(session, period)
+
+
+def test_read_collections_does_not_write(engine: Engine) -> None:
+    seed(engine)
+    with Session(engine) as session:
+        assert collections(session, "month") == expected(session, "month")
+        assert session.exec(select(PaymentRollupState)).all() == []
+        assert session.exec(select(PaymentRollup)).all() == []
+
+        # February and March closed since this refresh
+        rollups.refresh_closed_buckets(session, "month", today=date(2024, 2, 10))
+        assert collections(session, "month") == expected(session, "month")
+        assert set(rolled_up(session, "month")) == {
+            key for key in expected(session, "month") if key[0] < date(2024, 2, 1)
+        }
+
+        rollups.refresh_closed_buckets(session, "month", today=TODAY)
+        rollups.refresh_closed_buckets(session, "month", today=TODAY)
+        assert rolled_up(session, "month") == closed(expected(session, "month"), "month")
+
+
+def test_refresh_waits_for_backdated_writer(engine: Engine) -> None:
+    client_id, payment_type_ids = seed(engine)
+    with Session(engine) as session:
+        rollups.refresh_closed_buckets(session, "month", today=date(2024, 2, 10))
+
+    writer = Session(engine)
+    # After the February watermark, so not recomputed by the writer itself
+    writer.add(
+        Payment(
+            date_of_payment=datetime(2024, 2, 20),
+            payment_type_id=payment_type_ids[0],
+            amount=5000,
+            client_id=client_id,
+        )
+    )
+    writer.flush()
+
+    def refresh() -> None:
+        with Session(engine) as session:
+            rollups.refresh_closed_buckets(session, "month", today=TODAY)
+
+    refresher = threading.Thread(target=refresh)
+    refresher.start()
+    time.sleep(0.2)
+    writer.commit()
+    writer.close()
+    refresher.join()
+
+    with Session(engine) as session:
+        assert rolled_up(session, "month") == closed(expected(session, "month"), "month")